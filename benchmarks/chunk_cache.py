@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分块缓存和文件驱动的基准测试
+
+创建一个较宽的gzip压缩数据集，像表格滚动一样按行块读取全部列，
+比较HDF5默认的分块缓存（1MB，HDF5 2.0起为8MB）、open_hdf5()
+按文件设置的分块缓存和core驱动的耗时。默认的数据集中一行分块约16MB，
+超过默认的缓存大小。
+
+用法:
+  python benchmarks/chunk_cache.py
+  python benchmarks/chunk_cache.py --rows 1000 --columns 80000 --block-rows 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.file_signature import get_file_info
+from src.models.file_access import chunk_cache_settings, open_hdf5
+from src.models.tree_index import get_index_path, save_tree_index
+from src.models.tree_scanner import TreeScanner
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="分块缓存和文件驱动的基准测试")
+    parser.add_argument("--rows", type=int, default=500, help="数据集行数")
+    parser.add_argument("--columns", type=int, default=40000, help="数据集列数")
+    parser.add_argument("--chunk", type=int, default=100, help="分块边长")
+    parser.add_argument("--block-rows", type=int, default=20, help="每次读取的行数")
+    return parser.parse_args()
+
+
+def create_file(path, rows, columns, chunk):
+    """创建测试文件，并像TreeScanner一样为它保存结构索引。"""
+    rng = np.random.default_rng(0)
+    with h5py.File(path, "w") as f:
+        f.create_dataset(
+            "data",
+            data=rng.random((rows, columns), dtype=np.float32).round(2),
+            chunks=(chunk, chunk),
+            compression="gzip",
+        )
+    with h5py.File(path, "r") as f:
+        records = [TreeScanner._scan_member(f["/"], b"data")]
+    save_tree_index(path, get_file_info(path), {"/": records})
+
+
+def read_rows(hdf, block_rows):
+    """按行块读取整个数据集，返回耗时（秒）。"""
+    dataset = hdf["data"]
+    start = time.perf_counter()
+    for row in range(0, dataset.shape[0], block_rows):
+        dataset[row:row + block_rows, :]
+    return time.perf_counter() - start
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    path = os.path.join(tempfile.mkdtemp(), "chunk_cache.h5")
+    create_file(path, args.rows, args.columns, args.chunk)
+
+    nbytes, nslots, w0 = chunk_cache_settings(path)
+    print(f"文件大小: {os.path.getsize(path) / 2**20:.1f} MB")
+    print(f"分块缓存: {nbytes / 2**20:.1f} MB, {nslots}个槽, w0={w0}")
+
+    cases = [
+        ("默认分块缓存", lambda: h5py.File(path, "r")),
+        ("按文件设置的分块缓存", lambda: open_hdf5(path)),
+        ("core驱动", lambda: open_hdf5(path, "core")),
+    ]
+    baseline = None
+    try:
+        for name, open_file in cases:
+            with open_file() as hdf:
+                elapsed = read_rows(hdf, args.block_rows)
+            baseline = baseline or elapsed
+            print(f"{name}: {elapsed:.2f} s ({baseline / elapsed:.1f}x)")
+    finally:
+        os.remove(path)
+        os.remove(get_index_path(path))
+        os.rmdir(os.path.dirname(path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
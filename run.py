@@ -13,9 +13,24 @@ import sys
 import os
 import argparse
 import glob
+import importlib.util
+import multiprocessing
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 并行验证文件的线程数（共享文件系统上主要是等待I/O）
+VALIDATION_WORKERS = 16
+# 启动时导入的模块，--profile-startup报告它们的导入耗时
+STARTUP_MODULES = ["PySide6.QtWidgets", "src.mainwindow"]
+# 导入耗时报告中列出的模块数
+PROFILE_TOP_MODULES = 25
 
 def check_dependencies():
-    """检查依赖项是否已安装"""
+    """检查依赖项是否已安装
+    
+    只查找模块而不导入，不增加启动时间。
+    """
     required_packages = [
         ('PySide6', 'PySide6'),
         ('h5py', 'h5py'),
@@ -26,9 +41,7 @@ def check_dependencies():
     missing_packages = []
     
     for package_name, import_name in required_packages:
-        try:
-            __import__(import_name)
-        except ImportError:
+        if importlib.util.find_spec(import_name) is None:
             missing_packages.append(package_name)
     
     if missing_packages:
@@ -41,6 +54,43 @@ def check_dependencies():
     
     return True
 
+def profile_startup(limit=PROFILE_TOP_MODULES):
+    """报告启动时导入各模块的耗时
+    
+    在新的解释器中以-X importtime导入STARTUP_MODULES，
+    按累计耗时列出最慢的limit个模块。
+    """
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    code = f"import sys; sys.path.insert(0, {project_root!r}); " + "; ".join(
+        f"import {module}" for module in STARTUP_MODULES
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=project_root
+    )
+    
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except (ValueError, IndexError):
+            # 表头
+            continue
+        records.append((cumulative_us, self_us, fields[2].strip()))
+    if not records:
+        print("无法获取导入耗时:")
+        print(result.stderr)
+        return
+    
+    total_us = sum(self_us for _, self_us, _ in records)
+    print(f"启动导入耗时: {total_us / 1000:.0f} ms（{len(records)} 个模块）")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for cumulative_us, self_us, module in sorted(records, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}  {module}")
+
 def check_file_exists(file_path):
     """检查文件是否存在"""
     if not os.path.exists(file_path):
@@ -48,17 +98,36 @@ def check_file_exists(file_path):
     return file_path
 
 def check_h5_file(file_path):
-    """检查文件是否为有效的HDF5文件"""
+    """检查文件是否为有效的HDF5文件，返回文件信息
+    
+    只读取超级块签名，不打开HDF5库，返回的文件信息交给主窗口使用。
+    """
     try:
-        import h5py
-        with h5py.File(file_path, 'r') as f:
-            # 简单的文件格式检查
-            if not hasattr(f, 'file'):
-                raise ValueError(f"文件格式不正确: {file_path}")
-    except Exception as e:
-        raise ValueError(f"无法读取HDF5文件 {file_path}: {str(e)}")
+        from src.file_signature import get_file_info
+    except ImportError:
+        # 包安装模式
+        from .src.file_signature import get_file_info
     
-    return file_path
+    try:
+        file_info = get_file_info(file_path)
+    except OSError as e:
+        raise ValueError(f"无法读取HDF5文件 {file_path}: {str(e)}")
+    if file_info["superblock_offset"] is None:
+        raise ValueError(f"无法读取HDF5文件 {file_path}: 没有找到HDF5超级块签名")
+    return file_info
+
+def validate_file(file_path, skip_format_check=False):
+    """验证单个文件，返回 (文件路径, 文件信息, 错误信息)"""
+    try:
+        check_file_exists(file_path)
+        file_info = None
+        if not skip_format_check:
+            file_info = check_h5_file(file_path)
+        return file_path, file_info, None
+    except (FileNotFoundError, ValueError) as e:
+        return file_path, None, f"[ERROR] 文件验证失败: {str(e)}"
+    except Exception as e:
+        return file_path, None, f"[ERROR] 文件验证出错: {str(e)}"
 
 def parse_arguments():
     """解析命令行参数"""
@@ -72,6 +141,9 @@ def parse_arguments():
   hdf5tool -f file1.h5 -f file2.h5 -f file3.h5  # 打开多个文件
   hdf5tool -f *.h5                # 使用通配符打开所有h5文件
   hdf5tool -f file.h5 --no-format-check  # 跳过文件格式检查
+  hdf5tool -f file.h5 --driver core      # 打开时将整个文件读入内存
+  hdf5tool -f file.h5 --page-buffer 64   # 使用64MB页缓冲
+  hdf5tool --profile-startup             # 报告启动时的导入耗时
   
 备用用法（直接运行源码）:
   python run.py                   # 启动应用程序但不打开文件
@@ -92,10 +164,33 @@ def parse_arguments():
         help="跳过HDF5文件格式检查"
     )
     
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="报告启动时各模块的导入耗时和各启动阶段的耗时"
+    )
+    
+    parser.add_argument(
+        "--driver",
+        choices=["sec2", "core"],
+        help="HDF5文件驱动：sec2按需读取，core打开时将整个文件读入内存（默认使用首选项中的设置）"
+    )
+    
+    parser.add_argument(
+        "--page-buffer",
+        type=int,
+        metavar="MB",
+        help="页缓冲大小（MB），只对以分页存储策略创建的文件有效（默认使用首选项中的设置）"
+    )
+    
     return parser.parse_args()
 
 def process_file_list(file_patterns, skip_format_check=False):
-    """处理文件列表，支持通配符和格式检查"""
+    """处理文件列表，支持通配符和格式检查
+    
+    文件在线程池中并行验证，返回按命令行顺序排列的 (文件路径, 文件信息) 列表，
+    跳过格式检查时文件信息为None。
+    """
     if not file_patterns:
         return []
     
@@ -115,30 +210,39 @@ def process_file_list(file_patterns, skip_format_check=False):
         print("警告: 没有找到任何有效的文件")
         return []
     
-    # 去重文件列表
-    expanded_files = list(set(expanded_files))
+    # 去重文件列表，保持原有顺序
+    expanded_files = list(dict.fromkeys(expanded_files))
+    
+    # 并行验证文件
+    workers = min(VALIDATION_WORKERS, len(expanded_files))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda file_path: validate_file(file_path, skip_format_check),
+            expanded_files
+        ))
     
-    # 验证文件
     valid_files = []
-    for file_path in expanded_files:
-        try:
-            check_file_exists(file_path)
-            if not skip_format_check:
-                check_h5_file(file_path)
-            valid_files.append(file_path)
+    for file_path, file_info, error in results:
+        if error is None:
+            valid_files.append((file_path, file_info))
             print(f"[OK] 文件验证通过: {file_path}")
-        except (FileNotFoundError, ValueError) as e:
-            print(f"[ERROR] 文件验证失败: {str(e)}")
-        except Exception as e:
-            print(f"[ERROR] 文件验证出错: {str(e)}")
+        else:
+            print(error)
     
     return valid_files
 
 def main():
     """主函数"""
+    # 打包后的程序中，并行读取的工作进程（见parallel_reader）以同一个
+    # 可执行文件启动，必须在这里转入工作进程的入口而不是再次启动界面
+    multiprocessing.freeze_support()
+
     # 解析命令行参数
     args = parse_arguments()
     
+    # 各启动阶段结束的时刻，--profile-startup时报告
+    phases = [("开始", time.perf_counter())]
+    
     # print("hd5ftool_cn - HDF5数据可视化工具（中文版）")
     # print("=" * 50)
     
@@ -146,9 +250,11 @@ def main():
     if not check_dependencies():
         input("按任意键退出...")
         return 1
+    phases.append(("检查依赖项", time.perf_counter()))
     
     # 处理文件参数
     valid_files = process_file_list(args.files, args.no_format_check)
+    phases.append(("验证文件", time.perf_counter()))
     
     if args.files and not valid_files:
         print("\n错误: 没有有效的HDF5文件可以打开")
@@ -164,6 +270,7 @@ def main():
         except ImportError:
             # 包安装模式
             from .src.mainwindow import MainWindow
+        phases.append(("导入模块", time.perf_counter()))
         
         # 创建QApplication实例
         app = QApplication(sys.argv)
@@ -174,18 +281,30 @@ def main():
         app.setOrganizationName("hdf5tool")
         
         # 创建并显示主窗口
-        window = MainWindow(app)
+        page_buffer_size = None
+        if args.page_buffer is not None:
+            page_buffer_size = args.page_buffer * 1024 * 1024
+        window = MainWindow(app, args.driver, page_buffer_size)
         window.show()
+        phases.append(("创建主窗口", time.perf_counter()))
         
         # 打开命令行指定的文件
         if valid_files:
             print(f"\n正在打开 {len(valid_files)} 个文件:")
-            for file_path in valid_files:
+            for file_path, file_info in valid_files:
                 print(f"  - {file_path}")
                 try:
-                    window.open_file(file_path)
+                    window.open_file(file_path, file_info)
                 except Exception as e:
                     print(f"[ERROR] 打开文件失败 {file_path}: {str(e)}")
+            phases.append(("打开文件", time.perf_counter()))
+        
+        if args.profile_startup:
+            print("\n启动阶段耗时:")
+            for (_, start), (name, stop) in zip(phases, phases[1:]):
+                print(f"  {name}: {(stop - start) * 1000:.0f} ms")
+            print()
+            profile_startup()
         
         # 启动事件循环
         return app.exec()
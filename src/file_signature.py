@@ -0,0 +1,65 @@
+"""
+包含HDF5文件签名检查工具。
+
+此模块只依赖标准库，可以在导入PySide6和h5py之前使用。
+"""
+
+import os
+
+# HDF5超级块签名
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+def find_superblock(path):
+    """
+    查找HDF5超级块。
+
+    超级块只能位于文件偏移0、512、1024、2048……处（用户块之后），
+    因此只需读取这些位置的8字节签名，无需打开HDF5库。
+
+    参数
+    ----------
+    path : STR
+        文件路径。
+
+    返回
+    -------
+    元组或None
+        (超级块偏移量, 超级块版本)，如果不是HDF5文件则返回None。
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset + len(HDF5_SIGNATURE) < size:
+            f.seek(offset)
+            head = f.read(len(HDF5_SIGNATURE) + 1)
+            if head[: len(HDF5_SIGNATURE)] == HDF5_SIGNATURE:
+                return offset, head[-1]
+            offset = 512 if offset == 0 else offset * 2
+    return None
+
+
+def get_file_info(path):
+    """
+    返回用于识别文件及其当前版本的信息。
+
+    参数
+    ----------
+    path : STR
+        文件路径。
+
+    返回
+    -------
+    字典
+        包含绝对路径、大小、修改时间以及超级块偏移量和版本。
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    superblock = find_superblock(path) or (None, None)
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "superblock_offset": superblock[0],
+        "superblock_version": superblock[1],
+    }
@@ -18,7 +18,9 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from __init__ import __version__
-from src.views import HDF5Widget
+from src.models.file_access import open_hdf5
+from src.views import HDF5Widget, PreferencesDialog
+from src.views.preferences_dialog import load_file_access_settings
 from src.resources import get_icon
 
 WINDOW_TITLE = "HDF5Tool"
@@ -26,9 +28,12 @@ MAX_RECENT_FILES = 10
 
 
 class MainWindow(QMainWindow):
-    """定义hdf5tool应用程序的主窗口。"""
+    """定义hdf5tool应用程序的主窗口。
 
-    def __init__(self, app):
+    driver和page_buffer_size由命令行给出时覆盖首选项中的文件访问设置。
+    """
+
+    def __init__(self, app, driver=None, page_buffer_size=None):
         super().__init__()
 
         self.recent_file_actions = []
@@ -49,6 +54,10 @@ class MainWindow(QMainWindow):
         self.init_central_widget()
 
         self.load_settings()
+        if driver is not None:
+            self.file_driver = driver
+        if page_buffer_size is not None:
+            self.page_buffer_size = page_buffer_size
         self.update_file_menus()
 
     def init_actions(self):
@@ -161,9 +170,9 @@ class MainWindow(QMainWindow):
         self.file_menu.addSeparator()
         self.file_menu.addAction(self.quit_action)
 
-        # 编辑菜单 - 待完成
-        # self.edit_menu = menu.addMenu('&Edit')
-        # self.edit_menu.addAction(self.prefs_action)
+        # 编辑菜单
+        self.edit_menu = menu.addMenu("编辑(&E)")
+        self.edit_menu.addAction(self.prefs_action)
 
         # 视图菜单
         self.view_menu = menu.addMenu("视图(&V)")
@@ -233,10 +242,16 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.tabs)
 
-    def open_file(self, filename):
-        """打开hdf5文件。"""
+    def open_file(self, filename, file_info=None):
+        """打开hdf5文件。
+
+        file_info为启动时验证文件得到的文件信息（见file_signature.get_file_info），
+        给出时恢复结构索引和设置分块缓存不再重新读取文件。
+        """
         try:
-            hdf = h5py.File(filename, "r")
+            hdf = open_hdf5(
+                filename, self.file_driver, self.page_buffer_size, file_info
+            )
         except OSError as e:
             hdf = None
             QMessageBox.critical(
@@ -258,7 +273,7 @@ class MainWindow(QMainWindow):
 
             # 为文件创建新的小部件和选项卡
             # 并选择它。
-            hdf_widget = HDF5Widget(hdf)
+            hdf_widget = HDF5Widget(hdf, file_info)
             hdf_widget.tree_view.selectionModel().selectionChanged.connect(
                 self.handle_tree_selection_changed
             )
@@ -295,6 +310,9 @@ class MainWindow(QMainWindow):
         if isinstance(self.recent_files, str):
             self.recent_files = [self.recent_files]
 
+        # 加载文件访问设置
+        self.file_driver, self.page_buffer_size = load_file_access_settings()
+
     def save_settings(self):
         """将应用程序设置保存到文件。"""
         settings = QSettings()
@@ -376,6 +394,8 @@ class MainWindow(QMainWindow):
 
         widget = self.tabs.widget(index)
         self.tabs.removeTab(index)
+        widget.cancel_background_tasks()
+        widget.release_mapped_file()
 
         # TODO: 清理/关闭文件
         # widget.close_file()
@@ -392,7 +412,9 @@ class MainWindow(QMainWindow):
 
     def handle_open_prefs(self):
         """显示首选项对话框。"""
-        QMessageBox.information(self, "首选项", "<p>待完成...</p>")
+        dialog = PreferencesDialog(self)
+        if dialog.exec() == PreferencesDialog.Accepted:
+            self.file_driver, self.page_buffer_size = load_file_access_settings()
 
     def handle_open_about(self):
         """显示关于对话框。"""
@@ -439,7 +461,7 @@ class MainWindow(QMainWindow):
             return
 
         index = indexes[0]
-        path = hdf5widget.tree_model.itemFromIndex(index).data(Qt.UserRole)
+        path = hdf5widget.tree_model.data(index, Qt.UserRole)
         obj = hdf5widget.hdf[path]
         self.plots_toolbar.setEnabled(isinstance(obj, h5py.Dataset))
 
@@ -0,0 +1,112 @@
+"""
+包含数据块缓存和可复用的数组缓冲池。
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class BlockCache:
+    """
+    按字节数限制大小的LRU数据块缓存。
+
+    键可以是任意可哈希对象，值通常是numpy数组。
+    插入新块时如果超出max_bytes，则从最久未使用的块开始淘汰。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __contains__(self, key):
+        return key in self._blocks
+
+    def get(self, key, default=None):
+        """返回缓存的块并将其标记为最近使用。"""
+        try:
+            block = self._blocks[key]
+        except KeyError:
+            return default
+        self._blocks.move_to_end(key)
+        return block
+
+    def put(self, key, block):
+        """添加块，必要时淘汰最久未使用的块。"""
+        if key in self._blocks:
+            self.nbytes -= self._sizeof(self._blocks.pop(key))
+        self._blocks[key] = block
+        self.nbytes += self._sizeof(block)
+
+        # 至少保留刚插入的块
+        while self.nbytes > self.max_bytes and len(self._blocks) > 1:
+            _key, old = self._blocks.popitem(last=False)
+            self.nbytes -= self._sizeof(old)
+
+    def clear(self):
+        """清空缓存。"""
+        self._blocks.clear()
+        self.nbytes = 0
+
+    @staticmethod
+    def _sizeof(block):
+        return getattr(block, "nbytes", 0)
+
+
+class BufferPool:
+    """
+    按形状和类型复用numpy数组的缓冲池。
+
+    不再使用的数组通过release()放回，之后acquire()请求相同形状和类型时
+    直接返回它而不分配新的数组，因此反复读取相同大小的选区时内存保持不变。
+    最多保留max_buffers个空闲数组，超出时丢弃最久未放回的。
+    可以在多个线程中使用。
+
+    放回的数组之后会被覆盖，调用方必须确保其他地方不再使用它。
+    """
+
+    def __init__(self, max_buffers=2):
+        self.max_buffers = max_buffers
+        self._free = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._free)
+
+    def acquire(self, shape, dtype):
+        """返回形状为shape、类型为dtype的数组，内容未初始化。"""
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            for i, buffer in enumerate(self._free):
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    return self._free.pop(i)
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer):
+        """放回不再使用的数组。
+
+        只接受拥有自己内存的可写数组，其他对象（包括None和视图）被忽略。
+        """
+        if (
+            not isinstance(buffer, np.ndarray)
+            or buffer.base is not None
+            or not buffer.flags.writeable
+            or buffer.dtype.hasobject
+        ):
+            return
+        with self._lock:
+            if any(b is buffer for b in self._free):
+                return
+            self._free.append(buffer)
+            del self._free[:-self.max_buffers]
+
+    def clear(self):
+        """丢弃所有空闲数组。"""
+        with self._lock:
+            self._free.clear()
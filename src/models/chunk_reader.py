@@ -0,0 +1,229 @@
+"""
+包含绕过HDF5过滤器管线、在多个线程中解压分块的读取工具。
+
+对只使用deflate（gzip）、shuffle或lzf过滤器的数据集，原始的压缩分块由
+Dataset.id.read_direct_chunk逐个读出（只有这一步需要h5py的全局锁），
+解压和反shuffle在线程池中进行：zlib和NumPy的复制在执行时释放GIL，
+因此可以同时使用多个CPU核。每个分块解码后直接写入最终返回的数组，
+不需要中间的拷贝。
+"""
+
+import concurrent.futures
+import itertools
+import os
+import zlib
+
+import h5py
+import numpy as np
+
+try:
+    import lzf
+except ImportError:
+    lzf = None
+
+# 解压线程数（只有一个CPU时不使用这条路径）
+DECODE_THREADS = min(8, os.cpu_count() or 1)
+# 选区小于此字节数时由h5py直接读取
+CHUNK_READ_MIN_BYTES = 4 * 1024 * 1024
+# 每个解压线程最多排队的分块数，限制同时驻留内存的压缩数据
+CHUNKS_PER_THREAD = 4
+
+FILTER_LZF = 32000
+
+_executor = None
+
+
+def get_filters(node):
+    """返回数据集的过滤器编号，按写入时的应用顺序排列。"""
+    plist = node.id.get_create_plist()
+    return [plist.get_filter(i)[0] for i in range(plist.get_nfilters())]
+
+
+def can_read_chunks(node, selection_bytes, fields=None):
+    """
+    如果数据集的选区可以由read_chunks读取，则返回True。
+
+    数据集必须是分块的、只使用本模块能解码的过滤器，且类型的大小固定、不是数组类型。
+    """
+    if DECODE_THREADS < 2 or selection_bytes < CHUNK_READ_MIN_BYTES:
+        return False
+    if node.chunks is None or node.dtype.hasobject or node.dtype.subdtype is not None:
+        return False
+    if fields is not None and any(
+        node.dtype.fields[name][0].shape != () for name in fields
+    ):
+        return False
+
+    supported = {h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE}
+    if lzf is not None:
+        supported.add(FILTER_LZF)
+    filters = get_filters(node)
+    return bool(filters) and set(filters) <= supported
+
+
+def read_chunks(node, selection, fields=None, progress=None, cancelled=None, out=None):
+    """直接读取选区涉及的原始分块，并在线程池中解压到结果数组中。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        要读取的数据集，can_read_chunks()必须返回True。
+    selection : tuple
+        与node.ndim等长、由整数和步长为正的切片组成的选区。
+    fields : list, optional
+        复合类型中只读取的字段。
+    progress : callable, optional
+        progress(done, total)，done和total为已解压和总的分块数。
+    cancelled : callable, optional
+        返回True时停止读取并返回None。
+    out : numpy.ndarray, optional
+        存放结果的数组，默认分配新的数组。
+
+    返回
+    -------
+    numpy.ndarray 或 None
+        与node[selection]相同的数据，被取消时为None。
+    """
+    ranges = [range(n)[s] if isinstance(s, slice) else s for n, s in zip(node.shape, selection)]
+    shape = tuple(len(r) for r in ranges if isinstance(r, range))
+    if fields is None:
+        dtype = node.dtype
+    else:
+        dtype = np.dtype([(name, node.dtype.fields[name][0]) for name in fields])
+    data = np.empty(shape, dtype=dtype) if out is None else out
+    if data.size == 0:
+        return data
+
+    # 解压线程不调用h5py，需要的信息事先取出
+    layout = (node.chunks, node.dtype, node.fillvalue, get_filters(node))
+    pieces = list(iter_pieces(node.chunks, ranges))
+    executor = _get_executor()
+    max_pending = DECODE_THREADS * CHUNKS_PER_THREAD
+    pending = set()
+    done = 0
+    try:
+        for offset, data_sel, chunk_sel in pieces:
+            if cancelled is not None and cancelled():
+                return None
+            while len(pending) >= max_pending:
+                finished, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                done += _collect(finished, progress, done, len(pieces))
+
+            try:
+                filter_mask, raw = node.id.read_direct_chunk(offset)
+            except RuntimeError:
+                if node.id.get_chunk_info_by_coord(offset).byte_offset is not None:
+                    raise
+                # 未写入的分块由填充值组成
+                filter_mask, raw = None, None
+            pending.add(executor.submit(
+                _decode_chunk, layout, raw, filter_mask, fields,
+                data, data_sel, chunk_sel,
+            ))
+
+        while pending:
+            finished, pending = concurrent.futures.wait(
+                pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if cancelled is not None and cancelled():
+                return None
+            done += _collect(finished, progress, done, len(pieces))
+    finally:
+        # 正在执行的解压任务不能取消，等它们写完后才返回，
+        # 调用方随后可以安全地把out放回缓冲池
+        running = {future for future in pending if not future.cancel()}
+        if running:
+            concurrent.futures.wait(running)
+    return data
+
+
+def _collect(finished, progress, done, total):
+    """检查已完成的分块，返回其数量。"""
+    for future in finished:
+        # 解压线程中的异常在这里重新抛出
+        future.result()
+    if progress is not None:
+        progress(done + len(finished), total)
+    return len(finished)
+
+
+def iter_pieces(chunks, ranges):
+    """
+    产生选区涉及的每个分块的 (分块偏移, 结果中的位置, 分块中的位置)。
+
+    ranges中每项是整数索引或选中的下标range（步长为正）。
+    """
+    per_axis = []
+    for size, r in zip(chunks, ranges):
+        if not isinstance(r, range):
+            start = r - r % size
+            per_axis.append([(start, None, r - start)])
+            continue
+
+        items = []
+        first = r.start - r.start % size
+        for start in range(first, r[-1] + 1, size):
+            # r中落在[start, start + size)内的部分
+            k0 = max(0, -(-(start - r.start) // r.step))
+            k1 = min(len(r), -(-(start + size - r.start) // r.step))
+            if k0 < k1:
+                local = slice(r[k0] - start, r[k1 - 1] - start + 1, r.step)
+                items.append((start, slice(k0, k1), local))
+        per_axis.append(items)
+
+    for combination in itertools.product(*per_axis):
+        offset = tuple(item[0] for item in combination)
+        # 整数索引的轴在结果中被去掉
+        data_sel = tuple(item[1] for item in combination if item[1] is not None)
+        chunk_sel = tuple(item[2] for item in combination)
+        yield offset, data_sel, chunk_sel
+
+
+def _decode_chunk(layout, raw, filter_mask, fields, data, data_sel, chunk_sel):
+    """在解压线程中解码一个分块，写入data[data_sel]。"""
+    chunks, dtype, fillvalue, filters = layout
+    if raw is None:
+        chunk = np.full(chunks, fillvalue, dtype=dtype)
+    else:
+        size = int(np.prod(chunks, dtype=np.int64)) * dtype.itemsize
+        # 按与写入相反的顺序撤销过滤器，filter_mask中置位的过滤器被跳过
+        for i in reversed(range(len(filters))):
+            if filter_mask & (1 << i):
+                continue
+            if filters[i] == h5py.h5z.FILTER_DEFLATE:
+                raw = zlib.decompress(raw)
+            elif filters[i] == FILTER_LZF:
+                raw = lzf.decompress(raw, size)
+            elif filters[i] == h5py.h5z.FILTER_SHUFFLE:
+                raw = _unshuffle(raw, dtype.itemsize)
+        chunk = np.frombuffer(raw, dtype=dtype, count=size // dtype.itemsize)
+        chunk = chunk.reshape(chunks)
+
+    if fields is not None:
+        chunk = chunk[list(fields)]
+    data[data_sel] = chunk[chunk_sel]
+
+
+def _unshuffle(raw, itemsize):
+    """撤销shuffle过滤器：将按字节位置分组的数据恢复为逐个元素排列。"""
+    if itemsize == 1:
+        return raw
+    buffer = np.frombuffer(raw, dtype=np.uint8)
+    count = len(buffer) // itemsize
+    data = np.empty(len(buffer), dtype=np.uint8)
+    data[:count * itemsize] = buffer[:count * itemsize].reshape(itemsize, count).T.ravel()
+    # 不足一个元素的剩余字节没有被shuffle
+    data[count * itemsize:] = buffer[count * itemsize:]
+    return data
+
+
+def _get_executor():
+    """返回共用的解压线程池，第一次调用时创建。"""
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=DECODE_THREADS, thread_name_prefix="chunk-decode"
+        )
+    return _executor
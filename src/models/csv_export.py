@@ -0,0 +1,120 @@
+"""
+包含流式CSV导出。
+"""
+
+import csv
+import os
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .readers import ReadCancelled
+
+# 每次读取和写入的目标单元格数
+EXPORT_BLOCK_CELLS = 1 << 18
+
+
+def write_csv(table, path, progress=None, cancelled=None):
+    """将表格快照中的数据流式写入CSV文件。
+
+    数据按与分块对齐的行块读取，每块用模型的格式化函数整体转换为文本后
+    立即写出，内存占用与数据集大小无关。文件使用utf-8-sig编码，
+    以便Excel正确识别中文。
+
+    参数
+    ----------
+    table : TableSnapshot
+        由DataTableModel.snapshot()得到的表格快照。
+    path : STR
+        CSV文件路径。
+    progress : callable, optional
+        progress(done, total)，done和total为已写入和总的行数。
+    cancelled : callable, optional
+        返回True时停止写入并抛出ReadCancelled。
+    """
+    rows = table.row_count
+    columns = table.column_count
+
+    # 行块取模型数据块（已与分块对齐）的整数倍
+    block_rows = table.block_rows
+    block_rows *= max(1, EXPORT_BLOCK_CELLS // max(1, block_rows * columns))
+
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.header)
+        for start in range(0, rows, block_rows):
+            if cancelled is not None and cancelled():
+                raise ReadCancelled()
+
+            stop = min(start + block_rows, rows)
+            text = table.read_rows_text(start, stop)
+            writer.writerows(text.reshape(stop - start, -1).tolist())
+
+            if progress is not None:
+                progress(stop, rows)
+
+
+class CsvExportSignals(QObject):
+    """CsvExportTask发出的信号。
+
+    progress(percent)
+        已写入的百分比。
+    finished()
+        导出完成。
+    failed(message)
+        导出出错。
+    """
+
+    progress = Signal(int)
+    finished = Signal()
+    failed = Signal(str)
+
+
+class CsvExportTask(QRunnable):
+    """
+    在QThreadPool中执行write_csv的任务。
+
+    任务在创建时（GUI线程中）保存表格模型当前选择的快照，
+    此后用户改变表格的选择不影响导出。
+    被取消或出错时删除未写完的文件；被取消的任务不发出finished信号。
+    任何异常都以failed信号报告，进度对话框总能关闭。
+    """
+
+    def __init__(self, data_model, path):
+        super().__init__()
+        self.table = data_model.snapshot()
+        self.path = path
+        self.signals = CsvExportSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止导出。"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """如果已请求停止导出，则返回True。"""
+        return self._cancelled
+
+    def run(self):
+        """写入CSV文件并发出结果。"""
+        try:
+            write_csv(
+                self.table, self.path, self._report_progress, self.is_cancelled
+            )
+        except ReadCancelled:
+            self._remove_partial_file()
+            return
+        except Exception as e:
+            self._remove_partial_file()
+            self.signals.failed.emit(str(e))
+            return
+
+        self.signals.finished.emit()
+
+    def _report_progress(self, done, total):
+        self.signals.progress.emit(100 * done // max(total, 1))
+
+    def _remove_partial_file(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
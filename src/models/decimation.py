@@ -0,0 +1,257 @@
+"""
+包含用于绘图的保留极值的降采样函数。
+"""
+
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+
+def minmax_indices(y, start, stop, buckets):
+    """
+    返回y[start:stop]降采样后要保留的点的下标。
+
+    区间被分成buckets个桶，每个桶保留最小值和最大值所在的点（按原顺序），
+    因此无论放大到何种程度，尖峰都不会丢失。
+    区间的第一个和最后一个点总是被保留。
+
+    参数
+    ----------
+    y : numpy.ndarray
+        一维数据。
+    start, stop : 整数
+        要降采样的下标区间 [start, stop)。
+    buckets : 整数
+        桶数，通常为绘图区域的像素宽度。
+
+    返回
+    -------
+    numpy.ndarray
+        升序排列的下标，长度不超过 2 * buckets + 2。
+    """
+    count = stop - start
+    if count <= 2 * buckets:
+        return np.arange(start, stop)
+
+    size = -(-count // buckets)
+    full = count // size
+    segment = np.asarray(y[start:start + full * size]).reshape(full, size)
+    offsets = np.arange(full) * size + start
+    lows = offsets + segment.argmin(axis=1)
+    highs = offsets + segment.argmax(axis=1)
+
+    indices = [np.stack([np.minimum(lows, highs), np.maximum(lows, highs)], axis=1).ravel()]
+    rest = start + full * size
+    if rest < stop:
+        tail = np.asarray(y[rest:stop])
+        indices.append(rest + np.sort([tail.argmin(), tail.argmax()]))
+    indices = np.concatenate([[start]] + indices + [[stop - 1]])
+    return np.unique(indices)
+
+
+def minmax_reduce(data, bucket):
+    """
+    沿第0轴把data每bucket个元素缩减为两个：先出现的极值和后出现的极值。
+
+    与按固定间隔抽取不同，尖峰总是被保留。多列数据和复合类型的
+    各字段分别缩减，非数值字段保留每个桶的第一个和最后一个元素。
+
+    参数
+    ----------
+    data : numpy.ndarray
+        至少一维的数据。
+    bucket : 整数
+        每个桶的长度。
+
+    返回
+    -------
+    numpy.ndarray
+        第0轴长度为 2 * ceil(len(data) / bucket) 的数组，
+        第2k和2k+1个元素来自第k个桶。
+    """
+    count = -(-len(data) // bucket)
+    out = np.empty((2 * count,) + data.shape[1:], dtype=data.dtype)
+    if data.dtype.names:
+        for name in data.dtype.names:
+            out[name] = minmax_reduce(data[name], bucket)
+        return out
+
+    full = len(data) // bucket
+    if full:
+        segment = np.asarray(data[:full * bucket]).reshape((full, bucket) + data.shape[1:])
+        out[:2 * full:2], out[1:2 * full:2] = _bucket_extremes(segment)
+    if full < count:
+        tail = np.asarray(data[full * bucket:])[np.newaxis]
+        out[-2:-1], out[-1:] = _bucket_extremes(tail)
+    return out
+
+
+def _bucket_extremes(segment):
+    """返回每个桶 (第1轴) 中按原顺序排列的两个极值。"""
+    if segment.dtype.kind not in "biuf":
+        return segment[:, 0], segment[:, -1]
+    lows = segment.argmin(axis=1)
+    highs = segment.argmax(axis=1)
+    first = np.take_along_axis(segment, np.minimum(lows, highs)[:, np.newaxis], axis=1)
+    second = np.take_along_axis(segment, np.maximum(lows, highs)[:, np.newaxis], axis=1)
+    return first[:, 0], second[:, 0]
+
+
+def visible_range(x, length, x_min, x_max):
+    """
+    返回x坐标落在[x_min, x_max]中的点的下标区间，两端各多留一个点，
+    使线段能延伸到视图边缘。
+
+    参数
+    ----------
+    x : numpy.ndarray 或 None
+        单调递增的x坐标；为None时x就是下标。
+    length : 整数
+        数据的长度。
+    x_min, x_max : 浮点数
+        视图的x范围。
+
+    返回
+    -------
+    tuple
+        (start, stop)。
+    """
+    if x is None:
+        start = int(np.floor(x_min))
+        stop = int(np.ceil(x_max)) + 1
+    else:
+        start = int(np.searchsorted(x, x_min, side="left"))
+        stop = int(np.searchsorted(x, x_max, side="right"))
+    start = min(max(start - 1, 0), length)
+    stop = max(min(stop + 1, length), start)
+    return start, stop
+
+
+def is_monotonic(x):
+    """如果x单调不减，则返回True。"""
+    x = np.asarray(x)
+    if x.ndim != 1 or x.dtype.kind not in "biuf":
+        return False
+    return bool(np.all(x[1:] >= x[:-1]))
+
+
+class MinMaxPyramid:
+    """
+    一维序列的多分辨率最小/最大值金字塔。
+
+    第k层把序列分成长度为 2**(FIRST_LEVEL + k) 的桶，保存每个桶中
+    最小值和最大值所在的下标。每一层由上一层两两合并得到，
+    整个金字塔的建立是O(n)的，之后任意区间的降采样都只需从合适的层中
+    取出与桶数同量级的点，而不再扫描原始数据。
+
+    最细的一层从8倍降采样开始：更短的区间直接用minmax_indices扫描，
+    其工作量仍与像素数同量级，而金字塔的内存占用小得多。
+    金字塔只保存下标，不引用原始数据，查询时需要再传入同一序列。
+    """
+
+    FIRST_LEVEL = 3
+
+    def __init__(self, y):
+        self.length = len(y)
+        index_type = np.int32 if self.length < 2 ** 31 else np.int64
+
+        # 第一层直接从原始数据计算
+        size = 1 << self.FIRST_LEVEL
+        full = self.length // size
+        segment = np.asarray(y[:full * size]).reshape(full, size)
+        offsets = np.arange(full, dtype=index_type) * size
+        lows = offsets + segment.argmin(axis=1).astype(index_type)
+        highs = offsets + segment.argmax(axis=1).astype(index_type)
+        if full * size < self.length:
+            tail = np.asarray(y[full * size:])
+            lows = np.append(lows, full * size + tail.argmin()).astype(index_type)
+            highs = np.append(highs, full * size + tail.argmax()).astype(index_type)
+
+        self.lows = [lows]
+        self.highs = [highs]
+        while len(lows) > 1:
+            lows, highs = self._merge(y, lows, highs)
+            self.lows.append(lows)
+            self.highs.append(highs)
+
+    @staticmethod
+    def _merge(y, lows, highs):
+        """两两合并相邻的桶，返回上一层的下标。"""
+        if len(lows) % 2:
+            # 奇数个桶时重复最后一个桶
+            lows = np.append(lows, lows[-1])
+            highs = np.append(highs, highs[-1])
+        lows = lows.reshape(-1, 2)
+        highs = highs.reshape(-1, 2)
+        rows = np.arange(len(lows))
+        low_pick = np.asarray(y[lows[:, 1]]) < np.asarray(y[lows[:, 0]])
+        high_pick = np.asarray(y[highs[:, 1]]) > np.asarray(y[highs[:, 0]])
+        return lows[rows, low_pick.astype(np.intp)], highs[rows, high_pick.astype(np.intp)]
+
+    @property
+    def nbytes(self):
+        """金字塔占用的字节数。"""
+        return sum(a.nbytes for a in self.lows) + sum(a.nbytes for a in self.highs)
+
+    def indices(self, y, start, stop, buckets):
+        """
+        返回y[start:stop]降采样到约buckets个桶后要保留的点的下标。
+
+        选择桶数不少于buckets的最粗一层，工作量与buckets同量级。
+        边缘的桶可能包含区间外的点，它们位于视图之外，不影响显示。
+
+        参数
+        ----------
+        y : numpy.ndarray
+            建立金字塔时使用的序列。
+        start, stop : 整数
+            下标区间 [start, stop)。
+        buckets : 整数
+            桶数，通常为绘图区域的像素宽度。
+
+        返回
+        -------
+        numpy.ndarray
+            升序排列的下标。
+        """
+        count = stop - start
+        if count <= 0:
+            return np.arange(0)
+
+        level = (count // max(buckets, 1)).bit_length() - 1
+        if level < self.FIRST_LEVEL:
+            return minmax_indices(y, start, stop, buckets)
+
+        k = min(level - self.FIRST_LEVEL, len(self.lows) - 1)
+        level = k + self.FIRST_LEVEL
+        first = start >> level
+        last = ((stop - 1) >> level) + 1
+        return np.unique(np.concatenate([
+            [start],
+            self.lows[k][first:last],
+            self.highs[k][first:last],
+            [stop - 1],
+        ]))
+
+
+class PyramidBuilderSignals(QObject):
+    """PyramidBuilder发出的信号。
+
+    finished(key, pyramid)
+        金字塔建立完成。
+    """
+
+    finished = Signal(object, object)
+
+
+class PyramidBuilder(QRunnable):
+    """在QThreadPool中建立MinMaxPyramid的任务。"""
+
+    def __init__(self, key, y):
+        super().__init__()
+        self.key = key
+        self.y = y
+        self.signals = PyramidBuilderSignals()
+
+    def run(self):
+        """建立金字塔并发出结果。"""
+        self.signals.finished.emit(self.key, MinMaxPyramid(self.y))
@@ -0,0 +1,158 @@
+"""
+包含打开HDF5文件时使用的文件访问属性。
+
+HDF5默认的分块缓存只有1MB（HDF5 2.0起为8MB），按行块滚动较宽的压缩数据集时，
+同一个分块会被反复读取和解压。打开文件时按文件中分块的大小
+（来自结构索引，见tree_index）和可用内存设置分块缓存，
+并可以选择文件驱动和页缓冲。
+"""
+
+import ast
+import math
+import os
+
+import h5py
+import numpy as np
+import psutil
+
+from .memory import governor
+from .tree_index import load_tree_index
+
+# 可以选择的文件驱动：sec2为默认的按需读取，core在打开时将整个文件读入内存
+FILE_DRIVERS = ("sec2", "core")
+DEFAULT_DRIVER = "sec2"
+# 分块缓存最多占用的可用内存比例
+CHUNK_CACHE_FRACTION = 0.05
+# 分块缓存大小的上下限（下限为HDF5的默认值）
+CHUNK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+CHUNK_CACHE_MIN_BYTES = 1024 * 1024
+# 没有结构索引时的分块缓存大小和假定的分块字节数
+CHUNK_CACHE_DEFAULT_BYTES = 32 * 1024 * 1024
+TYPICAL_CHUNK_BYTES = 64 * 1024
+# 哈希表槽数与缓存可容纳的分块数之比（HDF5建议10到100倍）
+CHUNK_CACHE_SLOTS_PER_CHUNK = 100
+CHUNK_CACHE_MAX_SLOTS = 1000003
+# 优先淘汰已完整读取的分块：文件只读，完整读取的分块已由读取缓存保存
+CHUNK_CACHE_W0 = 1.0
+
+
+def chunk_cache_settings(filename, file_info=None):
+    """
+    返回文件的分块缓存设置。
+
+    缓存大小足以容纳最宽的分块数据集中一整行分块（第0轴上的一个分块
+    与其他轴上的所有分块），按行块读取时每个分块只解压一次；
+    大小受可用内存限制。文件还没有结构索引时使用默认大小。
+
+    参数
+    ----------
+    filename : STR
+        HDF5文件路径。
+    file_info : 字典, optional
+        刚由get_file_info()得到的文件信息，见load_tree_index()。
+
+    返回
+    -------
+    元组
+        (rdcc_nbytes, rdcc_nslots, rdcc_w0)。
+    """
+    limit = max(
+        min(
+            int(psutil.virtual_memory().available * CHUNK_CACHE_FRACTION),
+            CHUNK_CACHE_MAX_BYTES,
+        ),
+        CHUNK_CACHE_MIN_BYTES,
+    )
+    nbytes = min(CHUNK_CACHE_DEFAULT_BYTES, limit)
+    chunk_bytes = TYPICAL_CHUNK_BYTES
+
+    layouts = list(_iter_chunk_layouts(filename, file_info))
+    if layouts:
+        slab = max(_slab_bytes(shape, chunks, itemsize) for shape, chunks, itemsize in layouts)
+        nbytes = min(max(slab, CHUNK_CACHE_MIN_BYTES), limit)
+        chunk_bytes = min(math.prod(chunks) * itemsize for _, chunks, itemsize in layouts)
+
+    count = max(nbytes // max(chunk_bytes, 1), 1)
+    nslots = _next_prime(min(count * CHUNK_CACHE_SLOTS_PER_CHUNK, CHUNK_CACHE_MAX_SLOTS))
+    return nbytes, nslots, CHUNK_CACHE_W0
+
+
+def open_hdf5(filename, driver=DEFAULT_DRIVER, page_buffer_size=0, file_info=None):
+    """
+    以只读方式打开HDF5文件，并设置分块缓存、文件驱动和页缓冲。
+
+    core驱动只在文件小于内存预算时使用，否则仍按需读取。
+    页缓冲只对以分页存储策略创建的文件有效。
+
+    参数
+    ----------
+    filename : STR
+        HDF5文件路径。
+    driver : STR
+        FILE_DRIVERS中的一个。
+    page_buffer_size : 整数
+        页缓冲的字节数，0表示不使用。
+    file_info : 字典, optional
+        刚由get_file_info()得到的文件信息，见load_tree_index()。
+
+    返回
+    -------
+    h5py.File
+        打开的文件。
+    """
+    if driver not in FILE_DRIVERS:
+        raise ValueError(f"不支持的文件驱动: {driver}")
+
+    nbytes, nslots, w0 = chunk_cache_settings(filename, file_info)
+    kwargs = {"rdcc_nbytes": nbytes, "rdcc_nslots": nslots, "rdcc_w0": w0}
+    if driver == "core" and os.path.getsize(filename) <= governor.budget():
+        kwargs.update(driver="core", backing_store=False)
+    elif page_buffer_size:
+        try:
+            return h5py.File(filename, "r", page_buf_size=page_buffer_size, **kwargs)
+        except (OSError, ValueError):
+            # 较早的HDF5版本拒绝为未分页的文件设置页缓冲
+            pass
+    return h5py.File(filename, "r", **kwargs)
+
+
+def _iter_chunk_layouts(filename, file_info=None):
+    """从结构索引中依次产生分块数据集的 (形状, 分块形状, 元素字节数)。"""
+    groups = load_tree_index(filename, file_info)
+    if not groups:
+        return
+    for records in groups.values():
+        for record in records:
+            chunks = record[6]
+            if not chunks:
+                continue
+            try:
+                shape = ast.literal_eval(record[3])
+                itemsize = _parse_dtype(record[5]).itemsize
+            except (ValueError, TypeError, SyntaxError):
+                continue
+            if len(shape) == len(chunks):
+                yield tuple(shape), tuple(chunks), itemsize
+
+
+def _parse_dtype(text):
+    """将str(dtype)的结果转换回numpy.dtype。"""
+    try:
+        return np.dtype(text)
+    except TypeError:
+        # 复合类型的文本是字段列表
+        return np.dtype(ast.literal_eval(text))
+
+
+def _slab_bytes(shape, chunks, itemsize):
+    """返回第0轴上一行分块的总字节数。"""
+    count = math.prod(-(-n // c) for n, c in zip(shape[1:], chunks[1:]))
+    return count * math.prod(chunks) * itemsize
+
+
+def _next_prime(n):
+    """返回不小于n的最小素数。"""
+    n = max(n, 2)
+    while any(n % d == 0 for d in range(2, math.isqrt(n) + 1)):
+        n += 1
+    return n
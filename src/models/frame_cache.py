@@ -0,0 +1,200 @@
+"""
+包含图像栈的帧缓存和后台预读。
+"""
+
+import threading
+
+import numpy as np
+from PySide6.QtCore import QRunnable
+
+from .readers import READ_BLOCK_BYTES, ReadCancelled, read_selection
+
+
+class FrameCache:
+    """
+    图像栈中已读取帧的环形缓冲区。
+
+    所有帧存放在一块预先分配的数组中，第i帧放在第 i % capacity 个槽位，
+    因此任意连续capacity帧的窗口都不会互相覆盖，插入和查找都是O(1)的。
+    帧可以在后台线程中写入，在GUI线程中读取。
+
+    参数
+    ----------
+    max_bytes : 整数
+        缓冲区的最大字节数。
+    """
+
+    # 缓冲区中落后于当前帧的比例，其余用于沿滚动方向预读
+    BEHIND_FRACTION = 4
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.key = None
+        self.capacity = 0
+        self._frames = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def reset(self, key, frame_shape, dtype, count):
+        """为key对应的图像栈准备缓冲区，key改变时丢弃已缓存的帧。
+
+        参数
+        ----------
+        key : 可哈希对象
+            图像栈的标识（数据集路径和除帧轴外的选区）。
+        frame_shape : tuple
+            每帧的形状。
+        dtype : numpy.dtype
+            帧的数据类型。
+        count : 整数
+            图像栈的帧数。
+        """
+        if key == self.key:
+            return
+        with self._lock:
+            self.key = key
+            frame_bytes = max(int(np.prod(frame_shape, dtype=np.int64)) * dtype.itemsize, 1)
+            # 帧数太少或单帧超出预算时不缓存
+            self.capacity = min(self.max_bytes // frame_bytes, count)
+            if self.capacity < 2:
+                self.capacity = 0
+                self._frames = None
+                self._slots = None
+                return
+            self._frames = np.empty((self.capacity,) + tuple(frame_shape), dtype=dtype)
+            self._slots = np.full(self.capacity, -1, dtype=np.int64)
+
+    def clear(self):
+        """丢弃缓冲区。"""
+        with self._lock:
+            self.key = None
+            self.capacity = 0
+            self._frames = None
+            self._slots = None
+
+    @property
+    def nbytes(self):
+        """缓冲区占用的字节数。"""
+        return 0 if self._frames is None else self._frames.nbytes
+
+    def __contains__(self, index):
+        slots = self._slots
+        return slots is not None and slots[index % len(slots)] == index
+
+    def get(self, index, out=None):
+        """返回第index帧的副本，没有缓存时返回None。
+
+        返回副本是因为槽位之后可能被预读的其他帧覆盖。
+        给出out时副本写入其中（形状和类型必须与帧相同）。
+        """
+        with self._lock:
+            if self._slots is None or self._slots[index % self.capacity] != index:
+                return None
+            frame = self._frames[index % self.capacity]
+            if out is None:
+                return frame.copy()
+            np.copyto(out, frame)
+            return out
+
+    def put(self, index, frame, key=None):
+        """缓存第index帧。
+
+        key不为None且与当前的图像栈不同时（缓冲区已被重置）忽略该帧。
+        """
+        with self._lock:
+            if self._slots is None or (key is not None and key != self.key):
+                return
+            slot = index % self.capacity
+            if self._frames[slot].shape != np.shape(frame):
+                return
+            self._frames[slot] = frame
+            self._slots[slot] = index
+
+    def window(self, current, count, direction):
+        """返回当前帧周围应缓存的帧，按预读的先后排序（不含当前帧）。
+
+        沿滚动方向预读约3/4的缓冲区，反方向保留其余部分。
+        所有帧与当前帧构成不超过capacity帧的连续区间，不会占用相同的槽位。
+        """
+        if self.capacity == 0:
+            return []
+        behind = self.capacity // self.BEHIND_FRACTION
+        ahead = self.capacity - behind - 1
+        order = [current + direction * i for i in range(1, ahead + 1)]
+        order += [current - direction * i for i in range(1, behind + 1)]
+        return [i for i in order if 0 <= i < count]
+
+
+class FramePrefetcher(QRunnable):
+    """
+    在QThreadPool中预读图像栈帧的任务。
+
+    按给定的顺序读取尚未缓存的帧并放入FrameCache。同一个分块中的帧
+    合并为一次读取，使每个分块只解压一次。预读是尽力而为的，出错时静默停止。
+
+    参数
+    ----------
+    cache : FrameCache
+        存放帧的缓存。
+    node : h5py.Dataset
+        图像栈数据集，帧沿第0轴排列。
+    selection : tuple
+        一帧的选区，第0项（帧号）被忽略。
+    frames : list
+        要预读的帧号，按优先级排序。
+    """
+
+    def __init__(self, cache, node, selection, frames):
+        super().__init__()
+        self.cache = cache
+        self.key = cache.key
+        self.node = node
+        self.selection = tuple(selection)
+        self.frames = list(frames)
+        self.finished = False
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止预读。"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """如果已请求停止预读或缓冲区已被重置，则返回True。"""
+        return self._cancelled or self.cache.key != self.key
+
+    def run(self):
+        """读取帧并放入缓存。"""
+        if self.node.chunks is not None:
+            run_length = self.node.chunks[0]
+        else:
+            frame_bytes = max(self.cache.nbytes // max(self.cache.capacity, 1), 1)
+            run_length = max(READ_BLOCK_BYTES // frame_bytes, 1)
+
+        frames = [i for i in self.frames if i not in self.cache]
+        try:
+            self._read_frames(frames, run_length)
+        except ReadCancelled:
+            pass
+        except (OSError, KeyError, ValueError, TypeError, RuntimeError):
+            pass
+        finally:
+            self.finished = True
+
+    def _read_frames(self, frames, run_length):
+        """按分块分组读取frames，同一组中的帧一起读取。"""
+        while frames:
+            if self.is_cancelled():
+                return
+            # 与第一帧在同一分块（或同一读取块）中的帧一起读取
+            block = frames[0] // run_length
+            group = [i for i in frames if i // run_length == block]
+            frames = [i for i in frames if i // run_length != block]
+
+            start, stop = min(group), max(group) + 1
+            data = read_selection(
+                self.node,
+                (slice(start, stop),) + self.selection[1:],
+                cancelled=self.is_cancelled,
+            )
+            for i in group:
+                self.cache.put(i, data[i - start], self.key)
@@ -0,0 +1,173 @@
+"""
+包含大图像的多分辨率分块显示工具。
+"""
+
+import math
+
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .readers import ReadCancelled, read_selection, selection_layout
+from .utils import get_selection_shape, range_to_slice
+
+# 超过此字节数的图像按分块方式显示
+LARGE_IMAGE_BYTES = 64 * 1024 * 1024
+# 概览图长边的最大像素数
+OVERVIEW_SIZE = 2048
+# 每个分块在其所在层中的边长（像素）
+TILE_SIZE = 512
+
+
+class TiledImage:
+    """
+    大图像的多分辨率分块金字塔。
+
+    第k层是原图每隔 2**k 个像素取一个点得到的图像，按需逐块读取，
+    不需要事先计算；最粗的一层（概览图）的长边不超过OVERVIEW_SIZE。
+    所有坐标都以原图像素为单位。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        图像数据集。
+    selection : tuple
+        图像的选区，前两个切片轴是图像的行和列。
+    max_bytes : 整数, optional
+        概览图的最大字节数，内存不足时使用更粗的概览图。
+    """
+
+    def __init__(self, node, selection, max_bytes=None):
+        self.node = node
+        self.selection = tuple(selection)
+        self.axes = [i for i, s in enumerate(self.selection) if isinstance(s, slice)][:2]
+        self.ranges = [range(node.shape[i])[self.selection[i]] for i in self.axes]
+        self.shape = tuple(len(r) for r in self.ranges)
+        longest = max(self.shape)
+        self.overview_level = max(0, math.ceil(math.log2(max(longest / OVERVIEW_SIZE, 1))))
+        if max_bytes is not None:
+            shape = get_selection_shape(node.shape, self.selection)
+            nbytes = math.prod(shape) * node.dtype.itemsize
+            # 每升高一层，像素数减为四分之一
+            while (
+                nbytes >> (2 * self.overview_level) > max_bytes
+                and longest >> self.overview_level > 1
+            ):
+                self.overview_level += 1
+
+    @property
+    def key(self):
+        """图像的标识（数据集路径和选区）。"""
+        return (self.node.name, str(self.selection))
+
+    def level_selection(self, level, rows=None, columns=None):
+        """返回第level层中[rows, columns]像素范围对应的原数据选区。
+
+        rows和columns是原图像素的 (start, stop)，默认为整幅图像。
+        """
+        selection = list(self.selection)
+        step = 1 << level
+        for axis, r, span in zip(self.axes, self.ranges, (rows, columns)):
+            start, stop = span if span is not None else (0, len(r))
+            selection[axis] = range_to_slice(r[start:stop:step])
+        return tuple(selection)
+
+    @property
+    def overview_selection(self):
+        """概览图的选区。"""
+        return self.level_selection(self.overview_level)
+
+    def level_for(self, pixels_per_screen_pixel):
+        """返回以给定缩放显示时应使用的层。
+
+        选择分辨率不低于屏幕分辨率的最粗一层。
+        """
+        if pixels_per_screen_pixel <= 1:
+            return 0
+        level = int(math.floor(math.log2(pixels_per_screen_pixel)))
+        return min(level, self.overview_level)
+
+    def tile_rect(self, level, row, column):
+        """返回分块在原图中的像素范围 (y0, x0, y1, x1)。"""
+        size = TILE_SIZE << level
+        y0 = row * size
+        x0 = column * size
+        return y0, x0, min(y0 + size, self.shape[0]), min(x0 + size, self.shape[1])
+
+    def tiles_in_rect(self, level, y0, x0, y1, x1):
+        """返回与原图像素范围[y0, y1) x [x0, x1)相交的第level层分块。"""
+        size = TILE_SIZE << level
+        y0 = max(int(y0), 0)
+        x0 = max(int(x0), 0)
+        y1 = min(int(math.ceil(y1)), self.shape[0])
+        x1 = min(int(math.ceil(x1)), self.shape[1])
+        if y0 >= y1 or x0 >= x1:
+            return []
+        return [
+            (level, row, column)
+            for row in range(y0 // size, (y1 - 1) // size + 1)
+            for column in range(x0 // size, (x1 - 1) // size + 1)
+        ]
+
+    def tile_selection(self, level, row, column):
+        """返回分块的原数据选区。"""
+        y0, x0, y1, x1 = self.tile_rect(level, row, column)
+        return self.level_selection(level, (y0, y1), (x0, x1))
+
+
+class TileLoaderSignals(QObject):
+    """TileLoader发出的信号。
+
+    loaded(key, data)
+        一个分块读取完成。
+    finished(keys)
+        任务结束，keys是未读取的分块。
+    """
+
+    loaded = Signal(object, object)
+    finished = Signal(object)
+
+
+class TileLoader(QRunnable):
+    """在QThreadPool中按顺序读取图像分块的任务。
+
+    给出cache（ReadCache）时原分辨率的分块通过文件的共享缓存读取。
+    分块总是读入新的数组，映射到内存的数据集也在后台线程中读取磁盘。
+    """
+
+    def __init__(self, tiled, tiles, cache=None):
+        super().__init__()
+        self.tiled = tiled
+        self.tiles = list(tiles)
+        self.cache = cache
+        self.signals = TileLoaderSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止读取。"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """如果已请求停止读取，则返回True。"""
+        return self._cancelled
+
+    def run(self):
+        """读取分块并逐个发出结果。"""
+        tiles = list(self.tiles)
+        try:
+            while tiles and not self._cancelled:
+                tile = tiles[0]
+                selection = self.tiled.tile_selection(*tile)
+                data = read_selection(
+                    self.tiled.node,
+                    selection,
+                    cancelled=self.is_cancelled,
+                    out=np.empty(*selection_layout(self.tiled.node, selection)),
+                    cache=self.cache,
+                )
+                tiles.pop(0)
+                self.signals.loaded.emit(self.tiled.key + tile, data)
+        except ReadCancelled:
+            pass
+        except (OSError, KeyError, ValueError, TypeError, RuntimeError):
+            pass
+        self.signals.finished.emit([self.tiled.key + tile for tile in tiles])
@@ -0,0 +1,89 @@
+"""
+包含图像显示范围的快速计算和8位转换。
+"""
+
+import numpy as np
+
+# 计算显示范围时抽样的元素数
+LEVEL_SAMPLE_SIZE = 1 << 16
+# 浮点数转换时每块处理的元素数，限制临时数组的大小
+CONVERT_BLOCK_SIZE = 1 << 20
+
+
+def sample_levels(data, sample_size=LEVEL_SAMPLE_SIZE):
+    """按固定步长抽样，返回图像的显示范围 (最小值, 最大值)。
+
+    只访问约sample_size个元素，与图像大小无关；NaN和无穷大被忽略。
+    没有有限值时返回 (0, 1)。
+    """
+    flat = np.asarray(data).reshape(-1)
+    step = max(1, flat.size // sample_size)
+    sample = flat[::step]
+    if sample.dtype.kind == "b":
+        return 0.0, 1.0
+    if sample.dtype.kind == "f":
+        sample = sample[np.isfinite(sample)]
+    if sample.size == 0:
+        return 0.0, 1.0
+    low = float(sample.min())
+    high = float(sample.max())
+    if high <= low:
+        high = low + 1
+    return low, high
+
+
+def to_uint8(data, levels, out=None):
+    """将图像按显示范围levels线性映射到0-255的uint8。
+
+    8位和16位整数通过查找表一次转换；其他类型分块缩放，
+    临时数组不超过CONVERT_BLOCK_SIZE个元素。NaN被映射为0。
+
+    参数
+    ----------
+    data : numpy.ndarray
+        图像数据（灰度或rgb(a)）。
+    levels : tuple
+        (最小值, 最大值)，分别映射为0和255。
+    out : numpy.ndarray, optional
+        存放结果的uint8数组，默认分配新的数组。
+
+    返回
+    -------
+    numpy.ndarray
+        与data形状相同的uint8数组。
+    """
+    data = np.asarray(data)
+    low, high = levels
+    if data.dtype.kind == "b":
+        data = data.view(np.uint8)
+
+    if data.dtype.kind in "iu" and data.dtype.itemsize <= 2:
+        # 查找表覆盖该类型的所有取值，有符号数按相同位模式的无符号数索引
+        data = data.astype(data.dtype.newbyteorder("="), copy=False)
+        index = data.view(f"u{data.dtype.itemsize}")
+        values = np.arange(1 << (8 * data.dtype.itemsize), dtype=index.dtype)
+        lut = _scale(values.view(data.dtype), low, high)
+        # 下标总在查找表范围内，mode="clip"避免out被额外缓冲
+        return np.take(lut, index, out=out, mode="clip")
+
+    if out is None:
+        out = np.empty(data.shape, dtype=np.uint8)
+    flat = data.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat.size, CONVERT_BLOCK_SIZE):
+        stop = start + CONVERT_BLOCK_SIZE
+        flat_out[start:stop] = _scale(flat[start:stop], low, high)
+    return out
+
+
+def _scale(values, low, high):
+    """将values中的[low, high]线性映射到0-255。"""
+    # 双精度数据和超过16位的整数用双精度计算：float32只有24位尾数，
+    # 大偏移量下会丢失精度
+    source = np.asarray(values).dtype
+    wide = source == np.float64 or (source.kind in "iu" and source.itemsize > 2)
+    dtype = np.float64 if wide else np.float32
+    scaled = (np.asarray(values, dtype=dtype) - dtype(low)) * dtype(255.0 / (high - low))
+    np.clip(scaled, 0, 255, out=scaled)
+    np.nan_to_num(scaled, copy=False, nan=0.0)
+    return scaled.astype(np.uint8)
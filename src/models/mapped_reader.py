@@ -0,0 +1,164 @@
+"""
+包含连续存储、未压缩数据集的内存映射读取工具。
+
+这类数据集在文件中就是一段按C顺序排列的原始数组，可以把文件映射到内存，
+直接在映射上建立NumPy视图：读取选区不经过HDF5的超平面选择和复制，
+数据在被访问时由操作系统从页缓存中读取，预读也交给操作系统。
+"""
+
+import math
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+import h5py
+import numpy as np
+
+# 可以映射的文件驱动（文件在磁盘上就是一个普通文件）
+MAPPED_DRIVERS = ("sec2", "stdio")
+# 同时保持映射的最大文件数
+MAX_MAPPED_FILES = 16
+
+_files = OrderedDict()
+_arrays = {}
+_lock = threading.Lock()
+
+
+def can_map(node):
+    """如果数据集可以直接映射到内存，则返回True。
+
+    数据集必须是连续存储、没有过滤器和外部存储、已经分配了空间的，
+    类型大小固定且与文件中的大小一致，文件以只读方式打开。
+    """
+    return get_mapped(node) is not None
+
+
+def get_mapped(node):
+    """返回映射在文件上的只读数组，数据集不能映射时返回None。"""
+    try:
+        stat = os.stat(node.file.filename)
+    except OSError:
+        return None
+    file_key = (node.file.filename, stat.st_size, stat.st_mtime_ns)
+    key = file_key + (node.name,)
+    with _lock:
+        if key in _arrays:
+            return _arrays[key]
+
+    array = None
+    offset = _get_offset(node)
+    if offset is not None:
+        buffer = _get_file(file_key)
+        if buffer is not None and offset + node.size * node.dtype.itemsize <= len(buffer):
+            # 与h5py一样，数组类型的元素展开为末尾的轴
+            dtype = node.dtype.base
+            shape = node.shape + node.dtype.shape
+            try:
+                array = np.frombuffer(
+                    buffer, dtype=dtype, count=math.prod(shape), offset=offset
+                ).reshape(shape)
+            except (ValueError, TypeError):
+                # 无法映射的数据仍由h5py读取
+                array = None
+    with _lock:
+        _arrays[key] = array
+    return array
+
+
+def is_mapped(array):
+    """如果array是文件映射上的视图（不占用进程的内存），则返回True。"""
+    return _get_buffer(array) is not None
+
+
+def will_need(node, start, stop):
+    """提示操作系统预读数据集第0轴上[start, stop)的部分。"""
+    array = get_mapped(node)
+    if array is None or not hasattr(mmap, "MADV_WILLNEED") or node.ndim == 0:
+        return
+    start = max(start, 0)
+    stop = min(stop, node.shape[0])
+    if start >= stop:
+        return
+    row_bytes = array[0].nbytes
+    buffer = _get_buffer(array)
+    offset = _get_offset(node) + start * row_bytes
+    # madvise的起点必须与页对齐
+    aligned = offset - offset % mmap.PAGESIZE
+    length = min((stop - start) * row_bytes + offset - aligned, len(buffer) - aligned)
+    buffer.madvise(mmap.MADV_WILLNEED, aligned, length)
+
+
+def release_file(filename):
+    """丢弃文件的映射和映射上的数组，关闭文件时调用。
+
+    没有数组再引用映射时立即关闭它；否则由垃圾回收在数组释放后关闭。
+    在Windows上，映射关闭之前文件不能被删除或改写。
+    """
+    with _lock:
+        buffers = [_files.pop(key) for key in [k for k in _files if k[0] == filename]]
+        for key in [k for k in _arrays if k[0] == filename]:
+            del _arrays[key]
+    for buffer in buffers:
+        try:
+            buffer.close()
+        except BufferError:
+            # 仍有数组引用映射
+            pass
+
+
+def _get_buffer(array):
+    """返回数组所在的mmap，不在映射上时返回None。"""
+    base = getattr(array, "base", None)
+    while isinstance(base, np.ndarray):
+        base = base.base
+    if isinstance(base, memoryview):
+        base = base.obj
+    return base if isinstance(base, mmap.mmap) else None
+
+
+def _get_offset(node):
+    """返回数据集在文件中的偏移，不能映射时返回None。"""
+    if node.file.driver not in MAPPED_DRIVERS or node.file.mode != "r":
+        return None
+    if node.dtype.hasobject or node.size == 0:
+        return None
+    plist = node.id.get_create_plist()
+    if (
+        plist.get_layout() != h5py.h5d.CONTIGUOUS
+        or plist.get_nfilters() > 0
+        or plist.get_external_count() > 0
+    ):
+        return None
+    if node.id.get_type().get_size() != node.dtype.itemsize:
+        return None
+    # 尚未写入数据的数据集没有分配空间，文件有用户块时偏移也不可用
+    if node.id.get_storage_size() != node.size * node.dtype.itemsize:
+        return None
+    return node.id.get_offset()
+
+
+def _get_file(file_key):
+    """返回文件的只读映射，文件被修改后重新映射。
+
+    不再使用的映射不显式关闭：仍有数组引用它时由垃圾回收关闭。
+    """
+    with _lock:
+        buffer = _files.get(file_key)
+        if buffer is not None:
+            _files.move_to_end(file_key)
+            return buffer
+
+    try:
+        with open(file_key[0], "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    with _lock:
+        _files[file_key] = buffer
+        while len(_files) > MAX_MAPPED_FILES:
+            old_key, _ = _files.popitem(last=False)
+            for key in [k for k in _arrays if k[:3] == old_key]:
+                del _arrays[key]
+    return buffer
@@ -0,0 +1,94 @@
+"""
+包含估计和跟踪视图内存占用的内存管理器。
+"""
+
+import math
+import threading
+import weakref
+
+import psutil
+
+from .readers import selection_layout
+
+# 单个视图的数据最多占用的可用内存比例
+MEMORY_FRACTION = 0.3
+
+
+class MemoryGovernor:
+    """
+    跟踪各模型和缓存占用的内存，并决定视图能否整体读取选区。
+
+    选区的开销只由形状和类型计算，不读取数据。模型和缓存通过register()
+    登记，登记的对象需要提供nbytes属性；还提供trim()方法的（如共享读取缓存）
+    在内存不足时会被清空以腾出空间。超出预算的视图自行降级（表格分页、
+    绘图降采样、图像分块显示），不需要询问用户。
+
+    参数
+    ----------
+    fraction : 浮点数
+        单个视图的数据最多占用的可用内存比例。
+    """
+
+    def __init__(self, fraction=MEMORY_FRACTION):
+        self.fraction = fraction
+        self._holders = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def register(self, holder, name):
+        """登记占用内存的对象，对象被回收后自动注销。"""
+        with self._lock:
+            self._holders[holder] = name
+
+    def usage(self):
+        """返回 {名称: 字节数}，同名对象的占用相加。"""
+        with self._lock:
+            holders = list(self._holders.items())
+        usage = {}
+        for holder, name in holders:
+            usage[name] = usage.get(name, 0) + holder.nbytes
+        return usage
+
+    @property
+    def used(self):
+        """登记的对象占用的总字节数。"""
+        return sum(self.usage().values())
+
+    def budget(self):
+        """返回单个视图当前可以使用的字节数。
+
+        登记的对象已经占用的内存计入份额：所有视图和缓存合计最多使用
+        (可用内存 + 已占用) * fraction，新的选区只能使用剩余的部分。
+        """
+        used = self.used
+        available = psutil.virtual_memory().available
+        return max(int((available + used) * self.fraction) - used, 0)
+
+    @staticmethod
+    def selection_cost(node, selection, fields=None):
+        """返回整体读取选区所需的字节数，不读取数据。"""
+        shape, dtype = selection_layout(node, selection, fields)
+        return math.prod(shape) * dtype.itemsize
+
+    def fits(self, cost):
+        """如果cost字节可以分配，则返回True。
+
+        超出预算时先清空可以丢弃的缓存再重新判断。
+        """
+        if cost <= self.budget():
+            return True
+        with self._lock:
+            holders = list(self._holders)
+        for holder in holders:
+            trim = getattr(holder, "trim", None)
+            if trim is not None:
+                trim()
+        return cost <= self.budget()
+
+    def reduction(self, cost):
+        """返回使cost降到预算以内所需的降采样倍数（不超出时为1）。"""
+        if self.fits(cost):
+            return 1
+        return math.ceil(cost / max(self.budget(), 1))
+
+
+governor = MemoryGovernor()
@@ -0,0 +1,187 @@
+"""
+包含在多个进程中并行读取和解压数据集选区的工具。
+
+h5py用一把全局锁串行化所有调用，同一进程中的多个线程无法同时解压，
+因此读取在独立的工作进程中进行：每个进程打开自己的文件句柄，
+把分到的片段直接读入父进程分配的共享内存。
+"""
+
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import h5py
+import numpy as np
+
+from .utils import range_to_slice
+
+# 工作进程数（只有一个CPU时不并行读取）
+PARALLEL_WORKERS = min(8, os.cpu_count() or 1)
+# 选区小于此字节数时串行读取更快
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+# 每个工作进程分到的片段数，用于平衡负载
+PIECES_PER_WORKER = 4
+# 每个工作进程保持打开的最大文件数
+MAX_OPEN_FILES = 4
+
+_executor = None
+_open_files = OrderedDict()
+
+
+def can_read_parallel(node, selection_bytes, fields=None):
+    """
+    如果数据集的选区值得在工作进程中并行读取，则返回True。
+
+    只有带过滤器（压缩等）的分块数据集才会受益：未压缩的数据受限于磁盘，
+    串行读取已经足够快。可变长度类型无法放入共享内存，
+    其他驱动（如内存文件）打开的文件无法在其他进程中重新打开。
+    """
+    if PARALLEL_WORKERS < 2 or selection_bytes < PARALLEL_MIN_BYTES:
+        return False
+    if node.chunks is None or not (node.compression or node.shuffle or node.scaleoffset):
+        return False
+    if node.dtype.hasobject or node.file.driver not in ("sec2", "stdio"):
+        return False
+    if fields is not None:
+        return all(node.dtype.fields[name][0].shape == () for name in fields)
+    return node.dtype.subdtype is None
+
+
+def read_parallel(node, selection, axis, indices, length, fields=None,
+                  progress=None, cancelled=None, out=None):
+    """在工作进程中并行读取数据集的选区。
+
+    选区沿第一个切片轴被分成与分块对齐的片段，每个片段由一个工作进程
+    读取并解压后直接写入共享内存中对应的位置，最后复制到普通数组中返回。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        要读取的数据集。
+    selection : tuple
+        与node.ndim等长、由整数和切片组成的选区。
+    axis : 整数
+        第一个切片轴。
+    indices : range
+        axis上选中的下标。
+    length : 整数
+        每个片段沿axis的长度，应为分块长度的整数倍。
+    fields : list, optional
+        复合类型中只读取的字段。
+    progress : callable, optional
+        progress(done, total)，done和total为已读取和总的行数（第0轴）。
+    cancelled : callable, optional
+        返回True时停止读取并返回None。
+    out : numpy.ndarray, optional
+        存放结果的数组，默认分配新的数组。
+
+    返回
+    -------
+    numpy.ndarray 或 None
+        读取的数据，被取消时为None。
+    """
+    shape = tuple(
+        len(range(n)[s]) for n, s in zip(node.shape, selection) if isinstance(s, slice)
+    )
+    dtype = _get_dtype(node.dtype, fields)
+    nbytes = max(int(np.prod(shape, dtype=np.int64)) * dtype.itemsize, 1)
+
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        pieces = {}
+        executor = _get_executor()
+        for start in range(0, len(indices), length):
+            stop = min(start + length, len(indices))
+            piece_sel = list(selection)
+            piece_sel[axis] = range_to_slice(indices[start:stop])
+            future = executor.submit(
+                _read_piece, node.file.filename, node.name, tuple(piece_sel),
+                fields, shm.name, shape, dtype, start, stop,
+            )
+            pieces[future] = stop - start
+
+        done = 0
+        pending = set(pieces)
+        while pending:
+            finished, pending = concurrent.futures.wait(
+                pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if cancelled is not None and cancelled():
+                for future in pending:
+                    future.cancel()
+                return None
+            for future in finished:
+                # 工作进程中的异常在这里重新抛出
+                future.result()
+                done += pieces[future]
+                if progress is not None:
+                    progress(done, len(indices))
+
+        data = np.empty(shape, dtype=dtype) if out is None else out
+        data[...] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return data
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _get_dtype(dtype, fields):
+    """返回只读取fields时结果的类型。"""
+    if fields is None:
+        return dtype
+    return np.dtype([(name, dtype.fields[name][0]) for name in fields])
+
+
+def _get_executor():
+    """返回共用的进程池，第一次调用时创建。
+
+    使用spawn而不是fork：Qt程序的其他线程持有的锁不能被复制到子进程中。
+    """
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=PARALLEL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        atexit.register(shutdown)
+    return _executor
+
+
+def shutdown():
+    """关闭进程池。"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _get_file(filename):
+    """返回工作进程中打开的文件，文件被修改后重新打开。"""
+    stat = os.stat(filename)
+    key = (filename, stat.st_size, stat.st_mtime_ns)
+    hdf = _open_files.get(key)
+    if hdf is None:
+        hdf = h5py.File(filename, "r")
+        _open_files[key] = hdf
+        while len(_open_files) > MAX_OPEN_FILES:
+            _open_files.popitem(last=False)[1].close()
+    _open_files.move_to_end(key)
+    return hdf
+
+
+def _read_piece(filename, path, selection, fields, shm_name, shape, dtype, start, stop):
+    """在工作进程中读取一个片段，写入共享内存中结果的[start, stop)行。"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        node = _get_file(filename)[path]
+        if fields is None:
+            node.read_direct(data, selection, np.s_[start:stop])
+        else:
+            data[start:stop] = node.fields(list(fields))[selection]
+        del data
+    finally:
+        shm.close()
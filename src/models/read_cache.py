@@ -0,0 +1,168 @@
+"""
+包含同一文件的所有视图共用的读取缓存。
+"""
+
+import threading
+
+import numpy as np
+import psutil
+
+from .cache import BlockCache
+from .chunk_reader import iter_pieces
+from .memory import governor
+from .readers import read_selection, selection_layout
+
+# 缓存最多占用的可用内存比例
+READ_CACHE_FRACTION = 0.1
+# 缓存大小的上限
+READ_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# 每个缓存块的目标字节数
+CACHE_BLOCK_BYTES = 1024 * 1024
+
+
+def default_budget():
+    """返回按当前可用内存计算的缓存大小。"""
+    available = psutil.virtual_memory().available
+    return min(int(available * READ_CACHE_FRACTION), READ_CACHE_MAX_BYTES)
+
+
+class ReadCache:
+    """
+    一个打开的文件中已读取数据的共享缓存。
+
+    数据按缓存块保存：每块由若干个完整的HDF5分块组成（连续存储的数据集
+    按相邻的元素组成），约CACHE_BLOCK_BYTES字节，键为 (数据集路径, 块的起点)。
+    表格、绘图和图像视图都通过它读取，切换选项卡或不同视图读取重叠的区域时
+    直接从内存中组装，不再访问磁盘。缓存按LRU淘汰，大小受可用内存限制，
+    内存不足时由MemoryGovernor清空。可以在多个线程中使用。
+
+    参数
+    ----------
+    max_bytes : 整数, optional
+        缓存的最大字节数，默认由default_budget()计算。
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = default_budget()
+        self.blocks = BlockCache(max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._shapes = {}
+        self._lock = threading.Lock()
+        governor.register(self, "读取缓存")
+
+    @property
+    def max_bytes(self):
+        """缓存的最大字节数。"""
+        return self.blocks.max_bytes
+
+    @property
+    def nbytes(self):
+        """缓存占用的字节数。"""
+        return self.blocks.nbytes
+
+    def clear(self):
+        """清空缓存。"""
+        with self._lock:
+            self.blocks.clear()
+
+    def trim(self):
+        """内存不足时释放缓存的数据。"""
+        self.clear()
+
+    def block_shape(self, node):
+        """返回数据集的缓存块形状。
+
+        从一个分块（连续存储时从一个元素）开始，依次沿最后一轴、倒数第二轴……
+        合并整数个分块，直到达到CACHE_BLOCK_BYTES。
+        """
+        shape = self._shapes.get(node.name)
+        if shape is not None:
+            return shape
+        shape = list(node.chunks or (1,) * node.ndim)
+        for axis in reversed(range(node.ndim)):
+            size = int(np.prod(shape, dtype=np.int64)) * node.dtype.itemsize
+            if size >= CACHE_BLOCK_BYTES:
+                break
+            count = -(-node.shape[axis] // shape[axis])
+            shape[axis] *= max(1, min(count, CACHE_BLOCK_BYTES // max(size, 1)))
+        shape = tuple(shape)
+        self._shapes[node.name] = shape
+        return shape
+
+    def can_cache(self, node, selection):
+        """如果完整的选区可以通过缓存读取，则返回True。
+
+        带步长的选区（降采样的概览图等）只用到每块中的一小部分，
+        超过缓存四分之一的选区（导出等）会挤掉其他数据，二者都直接读取。
+        """
+        if node.ndim == 0 or node.dtype.hasobject:
+            return False
+        slices = [(n, s) for n, s in zip(node.shape, selection) if isinstance(s, slice)]
+        if any(range(n)[s].step != 1 or len(range(n)[s]) == 0 for n, s in slices):
+            return False
+        return self._hull_bytes(node, selection) <= self.max_bytes // 4
+
+    def read(self, node, selection, fields=None, out=None, progress=None, cancelled=None):
+        """通过缓存读取数据集的选区，参数与read_selection()相同。
+
+        选区涉及的缓存块都已缓存时不读取文件；否则一次读取覆盖这些块的区域
+        （可以使用并行解压等方式），拆分成块放入缓存后再组装。
+        """
+        shape = self.block_shape(node)
+        pieces = list(iter_pieces(shape, _get_ranges(node, selection)))
+        keys = [(node.name, offset) for offset, _, _ in pieces]
+        with self._lock:
+            blocks = [self.blocks.get(key) for key in keys]
+
+        if any(block is None for block in blocks):
+            self.misses += 1
+            blocks = self._read_blocks(node, shape, pieces, keys, progress, cancelled)
+        else:
+            self.hits += 1
+
+        if out is None:
+            out = np.empty(*selection_layout(node, selection, fields))
+        for (_, data_sel, block_sel), block in zip(pieces, blocks):
+            if fields is not None:
+                block = block[list(fields)]
+            out[data_sel] = block[block_sel]
+        return out
+
+    def _read_blocks(self, node, shape, pieces, keys, progress, cancelled):
+        """读取覆盖pieces中所有块的区域，返回这些块并放入缓存。"""
+        offsets = [offset for offset, _, _ in pieces]
+        hull = tuple(
+            slice(min(o[axis] for o in offsets),
+                  min(max(o[axis] for o in offsets) + shape[axis], n))
+            for axis, n in enumerate(node.shape)
+        )
+        data = read_selection(node, hull, progress, cancelled)
+
+        blocks = []
+        for offset, key in zip(offsets, keys):
+            region = tuple(
+                slice(o - h.start, min(o + size, n) - h.start)
+                for o, h, size, n in zip(offset, hull, shape, node.shape)
+            )
+            # 复制出独立的块，使整个区域可以被释放
+            block = data[region].copy()
+            blocks.append(block)
+            with self._lock:
+                self.blocks.put(key, block)
+        return blocks
+
+    def _hull_bytes(self, node, selection):
+        """返回覆盖选区的缓存块区域的字节数。"""
+        shape = self.block_shape(node)
+        count = 1
+        for r, n, size in zip(_get_ranges(node, selection), node.shape, shape):
+            first, last = (r[0], r[-1]) if isinstance(r, range) else (r, r)
+            count *= min(last - last % size + size, n) - (first - first % size)
+        return count * node.dtype.itemsize
+
+
+def _get_ranges(node, selection):
+    """返回选区每个轴选中的下标：切片为range，整数索引为非负整数。"""
+    return [range(n)[s] for n, s in zip(node.shape, selection)]
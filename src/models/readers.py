@@ -0,0 +1,436 @@
+"""
+包含在后台线程中读取数据集选区的工具。
+"""
+
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .chunk_reader import DECODE_THREADS, can_read_chunks, read_chunks
+from .decimation import minmax_reduce
+from .mapped_reader import get_mapped
+from .parallel_reader import (
+    PARALLEL_WORKERS,
+    PIECES_PER_WORKER,
+    can_read_parallel,
+    read_parallel,
+)
+from .utils import get_selection_shape, range_to_slice
+
+# 每次读取的目标字节数
+READ_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+class ReadCancelled(Exception):
+    """读取在完成前被取消。"""
+
+
+def iter_blocks(node, selection=(), fields=None, cancelled=None):
+    """沿第一个切片轴按块迭代数据集的选区。
+
+    块长度与数据集分块对齐，每块大约READ_BLOCK_BYTES字节，
+    因此可以处理比内存大的数据集。值得并行读取的压缩数据集
+    每块的字节数再乘以解压线程数或工作进程数，并由它们并行解压。
+    可以映射到内存的数据集（见mapped_reader）产生映射上的只读视图。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        要读取的数据集。
+    selection : tuple
+        由整数和切片组成的选区，可以比node.ndim短。
+    fields : list, optional
+        复合类型中只读取的字段。
+    cancelled : callable, optional
+        返回True时停止读取并抛出ReadCancelled。
+
+    返回
+    -------
+    生成器
+        依次产生 (start, stop, total, block)：block是结果第0轴上
+        [start, stop)的部分，total是第0轴的总长度。
+        选区中没有切片轴时只产生一个 (0, 1, 1, 数据)。
+    """
+    source = node if fields is None else node.fields(list(fields))
+    selection, axis, indices = _normalize_selection(node, selection)
+    mapped = get_mapped(node)
+    if mapped is not None:
+        source = mapped if fields is None else _FieldsView(mapped, fields)
+    if axis is None:
+        yield 0, 1, 1, source[selection]
+        return
+
+    method, workers = (None, 1) if mapped is not None else _get_read_method(
+        node, selection, fields
+    )
+    length = _block_length(node, selection, axis, indices, READ_BLOCK_BYTES * workers)
+    if length >= len(indices) and method is None:
+        yield 0, len(indices), len(indices), source[selection]
+        return
+
+    for start in range(0, len(indices), length):
+        if cancelled is not None and cancelled():
+            raise ReadCancelled()
+
+        stop = min(start + length, len(indices))
+        block_sel = list(selection)
+        block_sel[axis] = range_to_slice(indices[start:stop])
+        if method is not None:
+            block = _read_concurrently(
+                method, node, tuple(block_sel), axis, indices[start:stop], fields,
+                cancelled=cancelled,
+            )
+        else:
+            block = source[tuple(block_sel)]
+        # 整数索引的轴被去掉，第一个切片轴就是结果的第0轴
+        yield start, stop, len(indices), block
+
+
+def read_selection(node, selection, progress=None, cancelled=None, fields=None,
+                   out=None, cache=None):
+    """读取数据集的选区。
+
+    所有模型都通过这个函数读取数据。较大的gzip/shuffle/lzf压缩数据集的选区
+    直接读取原始分块并在线程池中解压（见chunk_reader），使用其他过滤器的
+    由工作进程并行读取（见parallel_reader），其他情况由iter_blocks分成
+    若干块串行读取。每读完一块调用一次progress，并通过cancelled检查是否应停止。
+    结果与node[selection]相同。
+
+    给出out时数据用Dataset.read_direct直接读入其中，不分配新的数组，
+    模型可以用BufferPool反复使用同一个数组。给出cache（ReadCache）时
+    可以缓存的选区通过它读取，与其他视图共用已读取的数据。
+
+    连续存储、未压缩的数据集直接映射到内存（见mapped_reader），不经过缓存：
+    没有给出out时返回映射上的只读视图，不复制数据；给出out时分块复制，
+    由调用的线程承担读取磁盘的开销。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        要读取的数据集。
+    selection : tuple
+        由整数和切片组成的选区，可以比node.ndim短。
+    progress : callable, optional
+        progress(done, total)，done和total为已读取和总的行数（第0轴）。
+    cancelled : callable, optional
+        返回True时停止读取并抛出ReadCancelled。
+    fields : list, optional
+        复合类型中只读取的字段。
+    out : numpy.ndarray, optional
+        存放结果的C连续数组，形状和类型见selection_layout()。
+    cache : ReadCache, optional
+        文件的共享读取缓存。
+
+    返回
+    -------
+    numpy.ndarray
+        读取的数据，给出out时就是out。
+    """
+    full_selection, axis, indices = _normalize_selection(node, selection)
+    if out is not None:
+        shape, _ = selection_layout(node, full_selection, fields)
+        if out.shape != shape or not out.flags.c_contiguous:
+            raise ValueError(f"输出数组的形状应为{shape}且C连续")
+    mapped = get_mapped(node)
+    if mapped is not None:
+        if out is None and fields is None:
+            return mapped[full_selection]
+        if out is None:
+            out = np.empty(*selection_layout(node, full_selection, fields))
+        _copy_mapped(mapped, full_selection, axis, indices, fields, out, progress, cancelled)
+        return out
+    if cache is not None and cache.can_cache(node, full_selection):
+        return cache.read(node, full_selection, fields, out, progress, cancelled)
+    if axis is not None:
+        method, _ = _get_read_method(node, full_selection, fields)
+        if method is not None:
+            return _read_concurrently(
+                method, node, full_selection, axis, indices, fields, progress, cancelled,
+                out,
+            )
+    if out is not None:
+        _read_into(node, full_selection, axis, indices, fields, out, progress, cancelled)
+        return out
+
+    data = None
+    for start, stop, total, block in iter_blocks(
+        node, selection, fields=fields, cancelled=cancelled
+    ):
+        if start == 0 and stop == total:
+            return block
+        if data is None:
+            data = np.empty((total,) + block.shape[1:], dtype=block.dtype)
+        data[start:stop] = block
+
+        if progress is not None:
+            progress(stop, total)
+
+    return data
+
+
+def read_minmax(node, selection, bucket, progress=None, cancelled=None, fields=None):
+    """读取选区并沿第一个切片轴把每bucket个元素缩减为最小值和最大值。
+
+    数据由iter_blocks逐块读取并立即缩减，整个选区不必放入内存，
+    结果与minmax_reduce(node[selection], bucket)相同。参数见read_selection()。
+    """
+    parts = []
+    rest = None
+    for start, stop, total, block in iter_blocks(
+        node, selection, fields=fields, cancelled=cancelled
+    ):
+        if stop == total and start == 0 and np.ndim(block) == 0:
+            # 选区中没有切片轴
+            return block
+        if rest is not None and len(rest):
+            block = np.concatenate([rest, block])
+        # 不足一个桶的部分与下一块合并，最后一块除外
+        full = len(block) if stop == total else len(block) // bucket * bucket
+        parts.append(minmax_reduce(block[:full], bucket))
+        rest = block[full:]
+
+        if progress is not None:
+            progress(stop, total)
+
+    return np.concatenate(parts)
+
+
+def selection_layout(node, selection, fields=None):
+    """返回read_selection()结果的 (形状, 类型)，不读取数据。"""
+    shape = get_selection_shape(node.shape, selection)
+    if fields is None:
+        # 与h5py一样，数组类型的元素展开为末尾的轴
+        return shape + node.dtype.shape, node.dtype.base
+    return shape, np.dtype([(name, node.dtype.fields[name][0]) for name in fields])
+
+
+def _read_into(node, selection, axis, indices, fields, out, progress=None, cancelled=None):
+    """按iter_blocks的分块方式将完整的选区串行读入out。"""
+    if fields is not None or node.dtype.hasobject or node.dtype.subdtype is not None:
+        # read_direct不支持字段选择、可变长度类型和数组类型，逐块复制
+        for start, stop, total, block in iter_blocks(
+            node, selection, fields=fields, cancelled=cancelled
+        ):
+            if axis is None:
+                out[...] = block
+            else:
+                out[start:stop] = block
+            if progress is not None:
+                progress(stop, total)
+        return
+
+    if out.size == 0:
+        return
+    if axis is None:
+        node.read_direct(out, selection)
+        return
+
+    length = _block_length(node, selection, axis, indices, READ_BLOCK_BYTES)
+    for start in range(0, len(indices), length):
+        if cancelled is not None and cancelled():
+            raise ReadCancelled()
+
+        stop = min(start + length, len(indices))
+        block_sel = list(selection)
+        block_sel[axis] = range_to_slice(indices[start:stop])
+        node.read_direct(out, tuple(block_sel), np.s_[start:stop])
+
+        if progress is not None:
+            progress(stop, len(indices))
+
+
+def _copy_mapped(mapped, selection, axis, indices, fields, out, progress=None,
+                 cancelled=None):
+    """按iter_blocks的分块方式将映射上的选区复制到out。"""
+    source = mapped if fields is None else _FieldsView(mapped, fields)
+    if axis is None:
+        out[...] = source[selection]
+        return
+
+    length = max(READ_BLOCK_BYTES // max(out[:1].nbytes, 1), 1)
+    for start in range(0, len(indices), length):
+        if cancelled is not None and cancelled():
+            raise ReadCancelled()
+
+        stop = min(start + length, len(indices))
+        block_sel = list(selection)
+        block_sel[axis] = range_to_slice(indices[start:stop])
+        out[start:stop] = source[tuple(block_sel)]
+
+        if progress is not None:
+            progress(stop, len(indices))
+
+
+class _FieldsView:
+    """只取复合类型部分字段的数组视图，与Dataset.fields()对应。"""
+
+    def __init__(self, array, fields):
+        self.array = array
+        self.fields = list(fields)
+
+    def __getitem__(self, selection):
+        # 与h5py一样返回紧凑排列的字段
+        return repack_fields(self.array[selection][self.fields])
+
+
+def _normalize_selection(node, selection):
+    """补全选区，返回 (选区, 第一个切片轴, 该轴上选中的下标)。
+
+    选区中没有切片轴时后两项为None。
+    """
+    selection = tuple(selection)
+    selection += (slice(None),) * (node.ndim - len(selection))
+    axes = [i for i, s in enumerate(selection) if isinstance(s, slice)]
+    if not axes:
+        return selection, None, None
+    return selection, axes[0], range(node.shape[axes[0]])[selection[axes[0]]]
+
+
+def _selection_bytes(node, selection):
+    """返回完整选区的字节数。"""
+    count = 1
+    for n, s in zip(node.shape, selection):
+        if isinstance(s, slice):
+            count *= len(range(n)[s])
+    return count * node.dtype.itemsize
+
+
+def _get_read_method(node, selection, fields):
+    """返回 (读取方式, 并行数)。
+
+    读取方式为read_chunks、read_parallel或None（串行读取）。
+    """
+    selection_bytes = _selection_bytes(node, selection)
+    positive = all(
+        range(n)[s].step > 0 for n, s in zip(node.shape, selection) if isinstance(s, slice)
+    )
+    if positive and can_read_chunks(node, selection_bytes, fields):
+        return read_chunks, DECODE_THREADS
+    if can_read_parallel(node, selection_bytes, fields):
+        return read_parallel, PARALLEL_WORKERS
+    return None, 1
+
+
+def _read_concurrently(method, node, selection, axis, indices, fields,
+                       progress=None, cancelled=None, out=None):
+    """用_get_read_method()选择的方式读取完整的选区。"""
+    report = None
+    if progress is not None:
+        # 两种方式报告的进度单位不同，统一换算为第0轴的行数
+        def report(done, total):
+            progress(len(indices) * done // total, len(indices))
+
+    if method is read_chunks:
+        data = read_chunks(node, selection, fields, report, cancelled, out)
+    else:
+        # 每个工作进程分到PIECES_PER_WORKER个片段
+        piece_bytes = _selection_bytes(node, selection) // (PARALLEL_WORKERS * PIECES_PER_WORKER)
+        length = _block_length(node, selection, axis, indices, piece_bytes)
+        data = read_parallel(
+            node, selection, axis, indices, length, fields, report, cancelled, out
+        )
+    if data is None:
+        raise ReadCancelled()
+    return data
+
+
+def _block_length(node, selection, axis, indices, block_bytes=READ_BLOCK_BYTES):
+    """返回沿axis每块读取的元素数，每块大约block_bytes字节。"""
+    item_count = 1
+    for i, s in enumerate(selection):
+        if i != axis and isinstance(s, slice):
+            item_count *= len(range(node.shape[i])[s])
+    row_bytes = max(item_count * node.dtype.itemsize, 1)
+    length = max(block_bytes // row_bytes, 1)
+
+    # 对齐到分块边界，使每个分块只解压一次
+    if node.chunks is not None and abs(indices.step) == 1:
+        chunk = node.chunks[axis]
+        length = max(length // chunk, 1) * chunk
+    return length
+
+
+class DatasetLoaderSignals(QObject):
+    """DatasetLoader发出的信号。
+
+    progress(percent)
+        已读取的百分比。
+    loaded(data)
+        读取完成。
+    failed(message)
+        读取出错。
+    """
+
+    progress = Signal(int)
+    loaded = Signal(object)
+    failed = Signal(str)
+
+
+class DatasetLoader(QRunnable):
+    """
+    在QThreadPool中读取数据集选区的任务。
+
+    被取消的任务不发出loaded或failed信号，
+    因此接收方不会收到过期的数据。
+
+    给出buffers（BufferPool）时数据读入从中取得的数组，
+    任务被取消或出错时数组在读取真正停止后才被放回。
+    给出cache（ReadCache）时通过文件的共享缓存读取。
+    bucket大于1时用read_minmax()逐块读取并缩减，不使用缓冲池和缓存。
+    """
+
+    def __init__(self, node, selection, buffers=None, cache=None, bucket=1):
+        super().__init__()
+        self.node = node
+        self.selection = selection
+        self.buffers = buffers
+        self.cache = cache
+        self.bucket = bucket
+        self.signals = DatasetLoaderSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止读取。"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """如果已请求停止读取，则返回True。"""
+        return self._cancelled
+
+    def run(self):
+        """读取选区并发出结果。"""
+        out = None
+        try:
+            if self.bucket > 1:
+                data = read_minmax(
+                    self.node, self.selection, self.bucket, self._report_progress,
+                    self.is_cancelled,
+                )
+            else:
+                if self.buffers is not None:
+                    out = self.buffers.acquire(*selection_layout(self.node, self.selection))
+                data = read_selection(
+                    self.node, self.selection, self._report_progress, self.is_cancelled,
+                    out=out, cache=self.cache,
+                )
+        except ReadCancelled:
+            self._release(out)
+            return
+        except (OSError, KeyError, ValueError, TypeError, RuntimeError) as e:
+            self._release(out)
+            if not self._cancelled:
+                self.signals.failed.emit(str(e))
+            return
+
+        if not self._cancelled:
+            self.signals.loaded.emit(data)
+        else:
+            self._release(out)
+
+    def _release(self, out):
+        """将未使用的数组放回缓冲池。"""
+        if self.buffers is not None:
+            self.buffers.release(out)
+
+    def _report_progress(self, done, total):
+        self.signals.progress.emit(100 * done // total)
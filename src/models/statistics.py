@@ -0,0 +1,314 @@
+"""
+包含单遍流式的列统计。
+"""
+
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .readers import ReadCancelled, iter_blocks
+
+# 每列直方图的桶数（必须为偶数，以便两两合并）
+HISTOGRAM_BINS = 64
+
+
+class ColumnStatistics:
+    """
+    按块累积多列数据的统计量。
+
+    每次update()接收形状为(行数, 列数)的一块数据，一次性向量化地更新
+    所有列的最小值、最大值及其行号、均值和方差（Chan等人的并行合并公式）、
+    NaN计数以及直方图。直方图的范围随数据自适应扩展：超出范围时桶宽加倍，
+    相邻的桶两两合并，已累积的计数不会丢失。
+
+    参数
+    ----------
+    names : list
+        列名。
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        columns = len(self.names)
+        self.rows = 0
+        self.count = np.zeros(columns, dtype=np.int64)
+        self.nan_count = np.zeros(columns, dtype=np.int64)
+        self.min = np.full(columns, np.inf)
+        self.max = np.full(columns, -np.inf)
+        self.argmin = np.full(columns, -1, dtype=np.int64)
+        self.argmax = np.full(columns, -1, dtype=np.int64)
+        self.mean = np.zeros(columns)
+        self._m2 = np.zeros(columns)
+        self.histogram = np.zeros((columns, HISTOGRAM_BINS), dtype=np.int64)
+        self.histogram_low = np.full(columns, np.nan)
+        self.histogram_width = np.full(columns, np.nan)
+
+    def update(self, block, row_offset, values_per_row=1):
+        """累积一块数据。
+
+        参数
+        ----------
+        block : numpy.ndarray
+            形状为(值数, 列数)的数值数据。
+        row_offset : 整数
+            块的第一行在整个数据中的行号。
+        values_per_row : 整数
+            每行包含的值数，多维数据的其余轴被合并到第0轴时大于1。
+        """
+        block = np.asarray(block, dtype=np.float64)
+        rows = len(block)
+        if rows == 0:
+            return
+        self.rows += rows // values_per_row
+
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        self.nan_count += rows - count
+        has_data = count > 0
+
+        # 最小值和最大值（NaN被忽略）
+        low = np.where(valid, block, np.inf)
+        high = np.where(valid, block, -np.inf)
+        low_row = low.argmin(axis=0)
+        high_row = high.argmax(axis=0)
+        columns = np.arange(block.shape[1])
+        block_min = low[low_row, columns]
+        block_max = high[high_row, columns]
+        update = has_data & ((block_min < self.min) | (self.argmin < 0))
+        self.min[update] = block_min[update]
+        self.argmin[update] = row_offset + low_row[update] // values_per_row
+        update = has_data & ((block_max > self.max) | (self.argmax < 0))
+        self.max[update] = block_max[update]
+        self.argmax[update] = row_offset + high_row[update] // values_per_row
+
+        # 均值和方差：合并本块的统计量
+        safe_count = np.maximum(count, 1)
+        block_mean = np.where(valid, block, 0.0).sum(axis=0) / safe_count
+        block_m2 = (np.where(valid, block - block_mean, 0.0) ** 2).sum(axis=0)
+        total = self.count + count
+        safe_total = np.maximum(total, 1)
+        delta = block_mean - self.mean
+        self.mean = np.where(has_data, self.mean + delta * count / safe_total, self.mean)
+        self._m2 = np.where(
+            has_data,
+            self._m2 + block_m2 + delta ** 2 * self.count * count / safe_total,
+            self._m2,
+        )
+        self.count = total
+
+        self._update_histogram(block)
+
+    def _update_histogram(self, block):
+        """将一块数据中的有限值计入直方图。"""
+        finite = np.isfinite(block)
+        if not finite.any():
+            return
+        low = np.where(finite, block, np.inf).min(axis=0)
+        high = np.where(finite, block, -np.inf).max(axis=0)
+
+        # 只有尚未初始化或超出范围的列需要调整
+        stop = self.histogram_low + self.histogram_width * HISTOGRAM_BINS
+        outside = np.isfinite(low) & ~((self.histogram_low <= low) & (high < stop))
+        for column in np.flatnonzero(outside):
+            self._cover(column, low[column], high[column])
+
+        index = np.floor((block - self.histogram_low) / self.histogram_width)
+        index = np.clip(np.nan_to_num(index), 0, HISTOGRAM_BINS - 1).astype(np.int64)
+        index += np.arange(block.shape[1]) * HISTOGRAM_BINS
+        self.histogram += np.bincount(
+            index[finite], minlength=self.histogram.size
+        ).reshape(self.histogram.shape)
+
+    def _cover(self, column, low, high):
+        """扩展一列直方图的范围，使其包含[low, high]。"""
+        if np.isnan(self.histogram_low[column]):
+            self.histogram_low[column] = low
+            span = high - low
+            self.histogram_width[column] = span / HISTOGRAM_BINS if span > 0 else 1.0
+            # 确保最大值落在最后一个桶内
+            while low + self.histogram_width[column] * HISTOGRAM_BINS <= high:
+                self.histogram_width[column] *= 2
+            return
+
+        counts = self.histogram[column]
+        half = HISTOGRAM_BINS // 2
+        while True:
+            start = self.histogram_low[column]
+            width = self.histogram_width[column]
+            stop = start + width * HISTOGRAM_BINS
+            if start <= low and high < stop:
+                return
+
+            merged = counts.reshape(half, 2).sum(axis=1)
+            counts[:] = 0
+            if low < start:
+                # 向下扩展：原有的桶合并后放到上半部分
+                counts[half:] = merged
+                self.histogram_low[column] = start - width * HISTOGRAM_BINS
+            else:
+                counts[:half] = merged
+            self.histogram_width[column] = width * 2
+
+    @property
+    def std(self):
+        """每列的总体标准差。"""
+        return np.sqrt(self._m2 / np.maximum(self.count, 1))
+
+    # 用于保存和恢复的数组属性
+    _ARRAYS = (
+        "count", "nan_count", "min", "max", "argmin", "argmax",
+        "mean", "_m2", "histogram", "histogram_low", "histogram_width",
+    )
+
+    def to_dict(self):
+        """返回可以保存为JSON的字典。"""
+        state = {"names": self.names, "rows": self.rows}
+        for name in self._ARRAYS:
+            state[name] = getattr(self, name).tolist()
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """从to_dict()返回的字典恢复统计结果。"""
+        statistics = cls(state["names"])
+        statistics.rows = state["rows"]
+        for name in cls._ARRAYS:
+            array = getattr(statistics, name)
+            setattr(statistics, name, np.asarray(state[name], dtype=array.dtype))
+        return statistics
+
+    def histogram_edges(self, column):
+        """返回一列直方图的桶边界。"""
+        return self.histogram_low[column] + self.histogram_width[column] * np.arange(
+            HISTOGRAM_BINS + 1
+        )
+
+
+def get_column_names(node):
+    """返回数据集在统计中的列名。
+
+    复合类型的每个字段是一列，一维数据是一列，
+    更高维数据的第1轴是列（其余轴在统计时合并）。
+    """
+    if node.dtype.names:
+        return list(node.dtype.names)
+    if node.ndim <= 1:
+        return ["数据"]
+    return [f"列{i+1}" for i in range(node.shape[1])]
+
+
+def compute_column_statistics(node, progress=None, cancelled=None):
+    """单遍流式计算数据集每一列的统计量。
+
+    数据集沿第0轴按与分块对齐的块读取，每块向量化地更新所有列，
+    只需要读取一次文件，内存占用与数据集大小无关。
+
+    参数
+    ----------
+    node : h5py.Dataset
+        要统计的数据集。
+    progress : callable, optional
+        progress(done, total)，done和total为已处理和总的行数。
+    cancelled : callable, optional
+        返回True时停止并抛出ReadCancelled。
+
+    返回
+    -------
+    ColumnStatistics
+        统计结果。复合类型中的非数值字段的count为0。
+    """
+    names = get_column_names(node)
+    statistics = ColumnStatistics(names)
+
+    fields = None
+    if node.dtype.names:
+        fields = [
+            name for name in names if node.dtype.fields[name][0].kind in "biuf"
+        ]
+        if not fields:
+            return statistics
+        columns = [names.index(name) for name in fields]
+        skipped = [i for i in range(len(names)) if i not in columns]
+
+    for start, stop, total, block in iter_blocks(node, fields=fields, cancelled=cancelled):
+        if node.ndim == 0:
+            # 标量数据集作为一行
+            block = np.asarray(block).reshape(1)
+
+        if fields is not None:
+            values = np.full((len(block), len(names)), np.nan)
+            for column, name in zip(columns, fields):
+                # 只读取一个字段时h5py返回普通数组
+                values[:, column] = block if len(fields) == 1 else block[name]
+            statistics.update(values, start)
+            # 非数值字段没有数据，不计入NaN
+            statistics.nan_count[skipped] = 0
+        elif block.ndim == 1:
+            statistics.update(block[:, np.newaxis], start)
+        else:
+            # (行, 列, 其余) -> (行*其余, 列)，行号仍按第0轴计算
+            rows, count = block.shape[:2]
+            rest = int(np.prod(block.shape[2:], dtype=np.int64))
+            values = np.moveaxis(block.reshape(rows, count, rest), 1, 2)
+            statistics.update(values.reshape(-1, count), start, rest)
+
+        if progress is not None:
+            progress(stop, total)
+
+    return statistics
+
+
+class StatisticsSignals(QObject):
+    """StatisticsTask发出的信号。
+
+    progress(percent)
+        已处理的百分比。
+    finished(statistics)
+        统计完成。
+    failed(message)
+        统计出错。
+    """
+
+    progress = Signal(int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class StatisticsTask(QRunnable):
+    """在QThreadPool中执行compute_column_statistics的任务。
+
+    任务保存创建时给出的数据集，不再读取模型的状态。
+    任何异常都以failed信号报告，进度对话框总能关闭。
+    """
+
+    def __init__(self, node):
+        super().__init__()
+        self.node = node
+        self.signals = StatisticsSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止统计。"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """如果已请求停止统计，则返回True。"""
+        return self._cancelled
+
+    def run(self):
+        """计算统计量并发出结果。"""
+        try:
+            statistics = compute_column_statistics(
+                self.node, self._report_progress, self.is_cancelled
+            )
+        except ReadCancelled:
+            return
+        except Exception as e:
+            if not self._cancelled:
+                self.signals.failed.emit(str(e))
+            return
+
+        if not self._cancelled:
+            self.signals.finished.emit(statistics)
+
+    def _report_progress(self, done, total):
+        self.signals.progress.emit(100 * done // max(total, 1))
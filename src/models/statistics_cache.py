@@ -0,0 +1,158 @@
+"""
+包含数据集统计结果的缓存。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from .statistics import ColumnStatistics
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.file_signature import get_file_info
+from src.models.utils import get_cache_dir
+
+STATISTICS_FORMAT = 1
+
+
+class StatisticsCache:
+    """
+    数据集统计结果的LRU缓存。
+
+    键由文件标识（路径、大小、修改时间和超级块信息）、数据集路径和选区
+    组成，文件被修改后旧的结果自然失效。结果同时保存在用户缓存目录中
+    每个文件一个的附属文件里，重新打开同一文件后不需要重新统计。
+
+    get()在每次选择数据集时调用：文件标识按os.stat的结果缓存，
+    附属文件每个文件版本只读取一次并保存在内存中，查不到的结果也不再访问磁盘。
+
+    参数
+    ----------
+    max_entries : 整数
+        内存中保存的最大结果数。
+    persist : 布尔值
+        是否读写附属文件。
+    """
+
+    def __init__(self, max_entries=64, persist=True):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()
+        # (路径, 大小, 修改时间) -> 文件标识
+        self._file_infos = {}
+        # 文件标识 -> 附属文件中的结果
+        self._sidecars = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, node, selection=()):
+        """返回数据集选区的统计结果，没有或已过期时返回None。"""
+        try:
+            file_info = self._get_file_info(node.file.filename)
+        except OSError:
+            return None
+        key = self._key(file_info, node.name, selection)
+
+        statistics = self._entries.get(key)
+        if statistics is not None:
+            self._entries.move_to_end(key)
+            return statistics
+
+        if self.persist:
+            state = self._get_sidecar(file_info).get(self._dataset_key(node.name, selection))
+            if state is not None:
+                statistics = ColumnStatistics.from_dict(state)
+                self._remember(key, statistics)
+        return statistics
+
+    def put(self, node, statistics, selection=()):
+        """保存数据集选区的统计结果。"""
+        try:
+            file_info = self._get_file_info(node.file.filename)
+        except OSError:
+            return
+        self._remember(self._key(file_info, node.name, selection), statistics)
+
+        if self.persist:
+            datasets = self._get_sidecar(file_info)
+            datasets[self._dataset_key(node.name, selection)] = statistics.to_dict()
+            self._save(file_info, datasets)
+
+    def clear(self):
+        """清空内存中的结果。"""
+        self._entries.clear()
+        self._file_infos.clear()
+        self._sidecars.clear()
+
+    def _get_file_info(self, filename):
+        """返回文件标识，文件没有变化时不重新读取超级块。"""
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        file_info = self._file_infos.get(key)
+        if file_info is None:
+            file_info = get_file_info(filename)
+            self._file_infos[key] = file_info
+        return file_info
+
+    def _get_sidecar(self, file_info):
+        """返回文件的附属文件中的结果，每个文件版本只读取一次。"""
+        key = tuple(sorted(file_info.items()))
+        datasets = self._sidecars.get(key)
+        if datasets is None:
+            datasets = self._load(file_info)
+            self._sidecars[key] = datasets
+        return datasets
+
+    def _remember(self, key, statistics):
+        self._entries[key] = statistics
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _key(file_info, path, selection):
+        return (tuple(sorted(file_info.items())), path, str(tuple(selection)))
+
+    @staticmethod
+    def _dataset_key(path, selection):
+        return f"{path}|{tuple(selection)}"
+
+    @staticmethod
+    def _sidecar_path(filename):
+        key = hashlib.sha1(filename.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(get_cache_dir("statistics"), f"{key}.json.gz")
+
+    def _load(self, file_info):
+        """读取附属文件中的结果，文件已变化时返回空字典。"""
+        try:
+            with gzip.open(self._sidecar_path(file_info["path"]), "rt", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            if sidecar.get("format") != STATISTICS_FORMAT:
+                return {}
+            if sidecar.get("file") != file_info:
+                return {}
+            return sidecar["datasets"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save(self, file_info, datasets):
+        """原子地写入附属文件。"""
+        path = self._sidecar_path(file_info["path"])
+        tmp_path = f"{path}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+                json.dump(
+                    {"format": STATISTICS_FORMAT, "file": file_info, "datasets": datasets},
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
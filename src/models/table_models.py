@@ -3,11 +3,18 @@
 """
 
 import h5py
+import numpy as np
 from PySide6.QtCore import (
     QAbstractItemModel, QAbstractTableModel, QModelIndex, Qt
 )
 from PySide6.QtGui import QBrush, QColor
 
+from .cache import BlockCache, BufferPool
+from .mapped_reader import can_map
+from .memory import governor
+from .readers import read_selection, selection_layout
+from .utils import get_cell_formatter, join_trailing_cells, range_to_slice
+
 INVALID_QModelIndex = QModelIndex()
 
 
@@ -78,17 +85,23 @@ class DatasetTableModel(QAbstractTableModel):
     'name', 'dtype', 'ndim', 'shape', 'maxshape',
     'chunks', 'compression', 'shuffle', 'fletcher32'
     和 'scaleoffset'。
+    如果统计缓存中已有该数据集的列统计结果，还显示每列的
+    'min'、'max' 和 'mean'，不需要再次扫描数据。
     """
 
     HEADERS = ("名称", "值")
 
-    def __init__(self, hdf):
+    # 统计值最多显示的列数
+    MAX_STATISTICS_COLUMNS = 8
+
+    def __init__(self, hdf, statistics_cache=None):
         super().__init__()
 
         self.hdf = hdf
         self.node = None
         self.column_count = 2
         self.row_count = 0
+        self.statistics_cache = statistics_cache
 
     def update_node(self, path):
         """更新当前节点路径。"""
@@ -145,9 +158,32 @@ class DatasetTableModel(QAbstractTableModel):
                 str(self.node.scaleoffset),
             )
 
+        statistics = None
+        if self.statistics_cache is not None:
+            statistics = self.statistics_cache.get(self.node)
+        if statistics is not None:
+            self.keys += ("min", "max", "mean")
+            self.values += (
+                self._format_statistic(statistics.min, statistics.count),
+                self._format_statistic(statistics.max, statistics.count),
+                self._format_statistic(statistics.mean, statistics.count),
+            )
+
         self.row_count = len(self.keys)
         self.endResetModel()
 
+    def _format_statistic(self, values, count):
+        """将每列的统计值格式化为一个单元格文本。"""
+        text = [
+            f"{value:.6g}" if n > 0 else "-"
+            for value, n in zip(values[:self.MAX_STATISTICS_COLUMNS], count)
+        ]
+        if len(values) == 1:
+            return text[0]
+        if len(values) > self.MAX_STATISTICS_COLUMNS:
+            text.append("...")
+        return "[" + ", ".join(text) + "]"
+
     def rowCount(self, parent=INVALID_QModelIndex):
         """返回行数。"""
         return self.row_count
@@ -187,19 +223,58 @@ class DatasetTableModel(QAbstractTableModel):
 
 
 class DataTableModel(QAbstractTableModel):
-    """包含HDF5文件中数据集数据的模型。"""
+    """包含HDF5文件中数据集数据的模型。
 
-    def __init__(self, hdf):
+    数据按块分页读取：data()只读取视口附近的行/列块，块大小与
+    数据集的HDF5分块布局对齐，最近使用的块保存在有界的LRU缓存中。
+    因此无论数据集多大，打开表格的开销都是恒定的。
+
+    每个块读取后立即用按dtype预先选定的格式化函数整体转换为字符串，
+    缓存中保存的是格式化后的文本，重绘和滚动时不再逐个单元格格式化。
+
+    参数
+    ----------
+    hdf : h5py.File
+        HDF5文件。
+    read_cache : ReadCache, optional
+        文件的共享读取缓存，原始数据通过它读取。
+    """
+
+    # 每个数据块的目标行数和列数（视图单位）
+    BLOCK_ROWS = 256
+    BLOCK_COLUMNS = 64
+
+    def __init__(self, hdf, read_cache=None):
         super().__init__()
 
         self.hdf = hdf
+        self.read_cache = read_cache
         self.node = None
         self.row_count = 0
         self.column_count = 0
         self.ndim = 0
         self.dims = ()
-        self.data_view = None
         self.compound_names = None
+        self.block_cache = BlockCache()
+        self.buffers = BufferPool()
+        self.block_rows = self.BLOCK_ROWS
+        self.block_columns = self.BLOCK_COLUMNS
+        self._scalar = None
+        self._scalar_text = None
+        self._formatter = None
+        self._row_axis = None
+        self._column_axis = None
+        self._row_range = range(0)
+        self._column_range = range(0)
+        self._row_labels = None
+        self._column_labels = None
+
+        governor.register(self, "表格")
+
+    @property
+    def nbytes(self):
+        """已格式化的数据块占用的字节数。"""
+        return self.block_cache.nbytes
 
     def update_node(self, path):
         """更新当前节点路径。"""
@@ -211,6 +286,7 @@ class DataTableModel(QAbstractTableModel):
         self.column_count = 0
 
         self.dims = ()
+        self.block_cache.clear()
 
         self.node = self.hdf[path]
 
@@ -224,38 +300,194 @@ class DataTableModel(QAbstractTableModel):
 
         self.compound_names = self.node.dtype.names
 
-        if self.ndim == 0:
-            self.row_count = 1
-            self.column_count = 1
-
-        elif self.ndim == 1:
-            self.row_count = shape[0]
-            if self.compound_names:
-                self.column_count = len(self.compound_names)
-            else:
-                self.column_count = 1
+        if self.ndim == 1:
             self.dims = tuple([slice(None)])
 
         elif self.ndim == 2:
-            self.row_count = shape[-2]
-            self.column_count = shape[-1]
             self.dims = tuple([slice(None), slice(None)])
 
         elif self.ndim > 2 and shape[-1] in [3, 4]:
-            self.row_count = shape[-3]
-            self.column_count = shape[-2]
             self.dims = tuple(
                 ([0] * (self.ndim - 3)) + [slice(None), slice(None), slice(None)]
             )
 
-        else:
-            self.row_count = shape[-2]
-            self.column_count = shape[-1]
+        elif self.ndim > 2:
             self.dims = tuple(([0] * (self.ndim - 2)) + [slice(None), slice(None)])
 
-        self.data_view = self.node[self.dims]
+        self._init_selection()
         self.endResetModel()
 
+    def _init_selection(self):
+        """根据self.dims计算表格行/列到数据集轴的映射以及数据块大小。"""
+        self.block_cache.clear()
+        self._scalar = None
+        self._row_axis = None
+        self._column_axis = None
+        self._row_range = range(1)
+        self._column_range = range(1)
+
+        s_loc = [i for i, j in enumerate(self.dims) if isinstance(j, slice)]
+
+        dtype = self.node.dtype
+        if self.compound_names:
+            # 只读取所选字段，格式化函数也只针对这些字段
+            dtype = np.dtype(
+                {
+                    "names": list(self.compound_names),
+                    "formats": [dtype.fields[n][0] for n in self.compound_names],
+                }
+            )
+        self._formatter = get_cell_formatter(dtype)
+
+        if self.ndim == 0 or not s_loc:
+            # 标量选择：只有一个单元格，直接读取
+            self._scalar = self.node[self.dims]
+
+        elif self.compound_names:
+            self._row_axis = 0
+            self._row_range = range(self.node.shape[0])[self.dims[0]]
+            self._column_range = range(len(self.compound_names))
+
+        else:
+            self._row_axis = s_loc[0]
+            self._row_range = range(self.node.shape[s_loc[0]])[self.dims[s_loc[0]]]
+            if len(s_loc) >= 2:
+                self._column_axis = s_loc[1]
+                self._column_range = range(
+                    self.node.shape[s_loc[1]]
+                )[self.dims[s_loc[1]]]
+
+        self.row_count = len(self._row_range)
+        self.column_count = len(self._column_range)
+
+        self.block_rows = self._block_length(
+            self._row_axis, self._row_range, self.BLOCK_ROWS
+        )
+        if self.compound_names:
+            # 复合类型的所有字段属于同一行记录，按整行读取
+            self.block_columns = max(1, self.column_count)
+        else:
+            self.block_columns = self._block_length(
+                self._column_axis, self._column_range, self.BLOCK_COLUMNS
+            )
+
+        if self._row_axis is None:
+            self._scalar_text = self._format(self._scalar)
+
+        # 表头标签：一维和二维数据集总是显示第0/1轴的索引，
+        # 更高维数据集显示前两个切片轴的索引
+        self._row_labels = None
+        self._column_labels = None
+        if self.ndim in [1, 2]:
+            self._row_labels = self._axis_labels(0)
+        elif self.ndim > 2 and self._row_axis is not None:
+            self._row_labels = self._row_range
+        if self.ndim == 2:
+            self._column_labels = self._axis_labels(1)
+        elif self.ndim > 2 and self._column_axis is not None:
+            self._column_labels = self._column_range
+
+    def _axis_labels(self, axis):
+        """返回数据集第axis轴在当前维度选择下的索引range。"""
+        dim = self.dims[axis]
+        if isinstance(dim, slice):
+            return range(self.node.shape[axis])[dim]
+        return range(dim, dim + 1)
+
+    def _block_length(self, axis, view_range, target):
+        """返回沿axis方向的数据块长度（视图单位）。
+
+        如果数据集是分块存储的，块长度取HDF5分块在视图中所占长度的
+        整数倍，这样每次读取都覆盖完整的分块，不会重复解压同一分块。
+        """
+        per_chunk = 1
+        if axis is not None and self.node.chunks:
+            per_chunk = max(1, self.node.chunks[axis] // abs(view_range.step))
+        length = max(1, target // per_chunk) * per_chunk
+        return min(length, target * 16)
+
+    def _format(self, block):
+        """使用预先选定的格式化函数将数据块整体转换为单元格文本。"""
+        text = self._formatter(np.asarray(block))
+        if not self.compound_names:
+            cell_ndim = (self._row_axis is not None) + (self._column_axis is not None)
+            if text.ndim > cell_ndim:
+                text = join_trailing_cells(text, cell_ndim)
+        return text
+
+    def _get_block(self, block_row, block_column):
+        """返回缓存中已格式化的数据块，不存在时从文件读取并格式化。
+
+        原始数据读入从缓冲池取得的数组，格式化后放回，
+        因此滚动时读取相同大小的块不分配新的内存。
+        映射到内存的数据集直接格式化映射上的视图。
+        """
+        key = (block_row, block_column)
+        text = self.block_cache.get(key)
+        if text is None:
+            row_start = block_row * self.block_rows
+            column_start = block_column * self.block_columns
+            selection, fields = self._block_selection(
+                row_start,
+                min(row_start + self.block_rows, self.row_count),
+                column_start,
+                min(column_start + self.block_columns, self.column_count),
+            )
+            buffer = None
+            if not can_map(self.node):
+                buffer = self.buffers.acquire(*selection_layout(self.node, selection, fields))
+            block = read_selection(
+                self.node, selection, fields=fields, out=buffer, cache=self.read_cache
+            )
+            text = self._format(block)
+            if buffer is not None and text is not block:
+                self.buffers.release(buffer)
+            self.block_cache.put(key, text)
+        return text
+
+    def _block_selection(self, row_start, row_stop, column_start, column_stop):
+        """返回读取表格中一个区域所用的 (选区, 字段)。"""
+        row_sel = range_to_slice(self._row_range[row_start:row_stop])
+
+        if self.compound_names:
+            return (row_sel,), list(self.compound_names)
+
+        dims = list(self.dims)
+        dims[self._row_axis] = row_sel
+        if self._column_axis is not None:
+            dims[self._column_axis] = range_to_slice(
+                self._column_range[column_start:column_stop]
+            )
+        return tuple(dims), None
+
+    def read_block(self, row_start, row_stop, column_start=0, column_stop=None):
+        """读取表格中[row_start, row_stop)行、[column_start, column_stop)列的原始数据。
+
+        复合类型总是返回所选字段的整行记录。
+        """
+        if self._row_axis is None:
+            return self._scalar
+
+        if column_stop is None:
+            column_stop = self.column_count
+
+        selection, fields = self._block_selection(
+            row_start, row_stop, column_start, column_stop
+        )
+        return read_selection(self.node, selection, fields=fields)
+
+    def read_rows(self, row_start, row_stop):
+        """读取表格中[row_start, row_stop)行的全部列。"""
+        return self.read_block(row_start, row_stop)
+
+    def read_rows_text(self, row_start, row_stop):
+        """读取[row_start, row_stop)行的全部列并格式化为单元格文本。"""
+        return self._format(self.read_rows(row_start, row_stop))
+
+    def snapshot(self):
+        """返回当前选择的快照，见TableSnapshot。"""
+        return TableSnapshot(self)
+
     def rowCount(self, parent=INVALID_QModelIndex):
         """返回行数。"""
         return self.row_count
@@ -265,99 +497,44 @@ class DataTableModel(QAbstractTableModel):
         return self.column_count
 
     def headerData(self, section, orientation, role):
-        """返回有关表头的数据。"""
+        """返回有关表头的数据。
+
+        表头标签是切片中对应的数据集索引，直接从set_dims中预先计算的
+        range对象算出（start + section*step），与数据集长度无关。
+        """
         if role == Qt.DisplayRole:
             if orientation == Qt.Horizontal:
                 if self.compound_names:
                     return self.compound_names[section]
-                else:
-                    if self.ndim in [0, 1]:
-                        return None
-
-                    if self.ndim == 2:
-                        w = list(range(self.node.shape[1]))
-                        w_e = w[self.dims[1]]
-                        if isinstance(w_e, int):
-                            w_e = [w_e]
-                        return str(w_e[section])
-
-                    s_loc = [i for i, j in enumerate(self.dims) if isinstance(j, slice)]
-                    if self.ndim > 2:
-                        if len(s_loc) >= 2:
-                            idx = 1
-                            w = list(range(self.node.shape[s_loc[idx]]))
-                            w_e = w[self.dims[s_loc[idx]]]
-                            if isinstance(w_e, int):
-                                w_e = [w_e]
-                            return str(w_e[section])
-                        return None
-
-            elif orientation == Qt.Vertical:
-                if self.ndim == 0:
-                    return None
-
-                if self.ndim in [1, 2]:
-                    w = list(range(self.node.shape[0]))
-                    w_e = w[self.dims[0]]
-                    if isinstance(w_e, int):
-                        w_e = [w_e]
-
-                    return str(w_e[section])
-
-                s_loc = [i for i, j in enumerate(self.dims) if isinstance(j, slice)]
-                if self.ndim > 2:
-                    if len(s_loc) >= 1:
-                        idx = 0
-                        w = list(range(self.node.shape[s_loc[idx]]))
-                        w_e = w[self.dims[s_loc[idx]]]
-                        if isinstance(w_e, int):
-                            w_e = [w_e]
-                        return str(w_e[section])
-                    return None
+                labels = self._column_labels
+            else:
+                labels = self._row_labels
+
+            if labels is None or section >= len(labels):
+                return None
+            return str(labels[section])
 
         super().headerData(section, orientation, role)
 
     def data(self, index, role=Qt.DisplayRole):
         """返回用于显示的表数据。"""
         if index.isValid() and role in (Qt.DisplayRole, Qt.ToolTipRole):
-            if self.compound_names:
-                name = self.compound_names[index.column()]
-                if self.data_view.ndim == 0:
-                    try:
-                        q = self.data_view[name].decode()
-                    except AttributeError:
-                        q = str(self.data_view[name])
-                else:
-                    try:
-                        q = self.data_view[index.row()][name].decode()
-                    except AttributeError:
-                        q = str(self.data_view[index.row()][name])
-
-                return q
+            row = index.row()
+            column = index.column()
 
-            if self.ndim == 0:
-                try:
-                    q = self.data_view.decode()
-                except (AttributeError, TypeError):
-                    q = str(self.data_view)
-            else:
-                if self.data_view.ndim == 0:
-                    try:
-                        q = self.data_view.decode()
-                    except AttributeError:
-                        q = str(self.data_view)
-                elif self.data_view.ndim == 1:
-                    try:
-                        q = self.data_view[index.row()].decode()
-                    except AttributeError:
-                        q = str(self.data_view[index.row()])
-                elif self.data_view.ndim >= 2:
-                    try:
-                        q = self.data_view[index.row(), index.column()].decode()
-                    except AttributeError:
-                        q = str(self.data_view[index.row(), index.column()])
+            if self._row_axis is None:
+                text = self._scalar_text
+                if self.compound_names:
+                    return str(text[column])
+                return str(text[()])
 
-            return q
+            text = self._get_block(row // self.block_rows, column // self.block_columns)
+            row = row % self.block_rows
+            if self.compound_names:
+                return str(text[row, column])
+            if self._column_axis is None:
+                return str(text[row])
+            return str(text[row, column % self.block_columns])
 
     def set_dims(self, dims):
         """设置模型的维度。
@@ -367,9 +544,6 @@ class DataTableModel(QAbstractTableModel):
         """
         self.beginResetModel()
 
-        self.row_count = None
-        self.column_count = None
-
         self.dims = []
         self.shape = self.node.shape
 
@@ -381,38 +555,61 @@ class DataTableModel(QAbstractTableModel):
                 self.compound_names = tuple([self.node.dtype.names[self.dims[1]]])
             else:
                 self.compound_names = self.node.dtype.names[self.dims[1]]
-            self.column_count = len(self.compound_names)
             if isinstance(self.dims[0], int):
                 dims = list(self.dims)
                 dims[0] = slice(dims[0], dims[0] + 1, None)
                 self.dims = tuple(dims)
-            self.data_view = self.node[self.dims[0]][list(self.compound_names)]
-            if self.data_view.ndim == 0:
-                self.row_count = 1
-            else:
-                self.row_count = self.data_view.shape[0]
 
-            self.endResetModel()
-            return
-
-        if self.ndim == 2 and isinstance(self.dims[0], int):
+        elif self.ndim == 2 and isinstance(self.dims[0], int):
             dims = list(self.dims)
             dims[0] = slice(dims[0], dims[0] + 1, None)
             self.dims = tuple(dims)
 
-        self.data_view = self.node[self.dims]
+        self._init_selection()
+        self.endResetModel()
 
-        try:
-            self.row_count = self.data_view.shape[0]
-        except IndexError:
-            self.row_count = 1
 
-        try:
-            self.column_count = self.data_view.shape[1]
-        except IndexError:
-            self.column_count = 1
+class TableSnapshot:
+    """
+    DataTableModel当前选择的只读快照。
 
-        self.endResetModel()
+    后台任务（如CSV导出）通过快照读取数据：快照在GUI线程中创建，
+    此后模型的节点或维度被改变也不影响正在进行的读取。
+    读取和格式化使用与DataTableModel相同的方法。
+
+    参数
+    ----------
+    model : DataTableModel
+        要读取的表格模型。
+    """
+
+    def __init__(self, model):
+        self.node = model.node
+        self.dims = model.dims
+        self.compound_names = model.compound_names
+        self.row_count = model.row_count
+        self.column_count = model.column_count
+        self.block_rows = model.block_rows
+        self._scalar = model._scalar
+        self._formatter = model._formatter
+        self._row_axis = model._row_axis
+        self._column_axis = model._column_axis
+        self._row_range = model._row_range
+        self._column_range = model._column_range
+
+        if self.compound_names:
+            self.header = list(self.compound_names)
+        else:
+            self.header = []
+            for column in range(self.column_count):
+                label = model.headerData(column, Qt.Horizontal, Qt.DisplayRole)
+                self.header.append(str(column) if label is None else label)
+
+    _format = DataTableModel._format
+    _block_selection = DataTableModel._block_selection
+    read_block = DataTableModel.read_block
+    read_rows = DataTableModel.read_rows
+    read_rows_text = DataTableModel.read_rows_text
 
 
 class DimsTableModel(QAbstractTableModel):
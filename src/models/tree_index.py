@@ -0,0 +1,89 @@
+"""
+包含HDF5文件结构的持久化索引。
+
+索引保存在用户缓存目录中，以文件路径、大小、修改时间和超级块信息为键，
+记录所有组的成员及其类型、形状、数据类型、分块和属性数。
+再次打开同一文件时，树形模型可以直接从索引恢复。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.file_signature import get_file_info
+from src.models.utils import get_cache_dir
+
+INDEX_FORMAT = 1
+
+
+def get_index_path(filename):
+    """返回文件对应的索引文件路径。"""
+    key = hashlib.sha1(
+        os.path.abspath(filename).encode("utf-8", "surrogateescape")
+    ).hexdigest()
+    return os.path.join(get_cache_dir("tree_index"), f"{key}.json.gz")
+
+
+def load_tree_index(filename, file_info=None):
+    """
+    加载文件的结构索引。
+
+    参数
+    ----------
+    filename : STR
+        HDF5文件路径。
+    file_info : 字典, optional
+        刚由get_file_info()得到的文件信息（如启动时验证文件的结果），
+        给出时不再读取文件。
+
+    返回
+    -------
+    字典或None
+        组路径 -> 成员记录列表。如果没有索引，或者文件在建立索引后
+        发生了变化（大小、修改时间或超级块不同），则返回None。
+    """
+    try:
+        with gzip.open(get_index_path(filename), "rt", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != INDEX_FORMAT:
+            return None
+        if file_info is None:
+            file_info = get_file_info(filename)
+        if index.get("file") != file_info:
+            return None
+        return index["groups"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_tree_index(filename, file_info, groups):
+    """
+    保存文件的结构索引。
+
+    参数
+    ----------
+    filename : STR
+        HDF5文件路径。
+    file_info : 字典
+        开始扫描前由get_file_info()得到的文件信息。
+    groups : 字典
+        组路径 -> 成员记录列表。
+    """
+    path = get_index_path(filename)
+    tmp_path = f"{path}.tmp"
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(
+                {"format": INDEX_FORMAT, "file": file_info, "groups": groups},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, path)
+    except (OSError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
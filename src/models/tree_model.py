@@ -2,9 +2,11 @@
 包含HDF5文件结构树形模型。
 """
 
+from array import array
+
 import h5py
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QIcon, QStandardItem, QStandardItemModel, QBrush
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PySide6.QtGui import QBrush
 
 import sys
 import os
@@ -12,77 +14,390 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from src.resources import get_icon
 
+# 节点类型
+NODE_GROUP = 0
+NODE_DATASET = 1
+NODE_OTHER = 2
+
+
+class TreeModel(QAbstractItemModel):
+    """显示HDF5文件结构的树形模型。
+
+    子节点通过canFetchMore/fetchMore按批次加载，只有滚动到视图中的
+    成员才会被读取。节点保存在紧凑的数组表中（每个节点一个整数id，
+    用作QModelIndex的internalId），属性数和形状在第一次显示时才读取。
 
-class TreeModel(QStandardItemModel):
-    """显示HDF5文件结构的树形模型。"""
+    调用start_scan()后，后台的TreeScanner会逐批送来所有组成员的元数据，
+    此后加载子节点和显示属性数/形状都直接使用这些元数据，
+    扫描进行期间GUI线程不再为尚未到达的元数据访问文件。
+    如果用户缓存中有该文件的最新结构索引，则直接从索引恢复而不再扫描；
+    每个组第一次展开时再核对其成员数，发现索引过期时重新扫描。
+    """
+
+    HEADERS = ("对象", "属性", "数据集")
+
+    # 每次fetchMore加载的子节点数
+    FETCH_BATCH = 1000
 
     def __init__(self, hdf):
         super().__init__()
 
         self.hdf = hdf
-        self.setColumnCount(3)
-        self.setHorizontalHeaderLabels(["对象", "属性", "数据集"])
-
-        # 添加根节点和直接子节点
-        root = self.add_node(self, "/", self.hdf)
-        for name, node in self.hdf.items():
-            self.add_node(root, name, node)
-
-    def add_node(self, parent_item, name, node):
-        """返回描述节点的树项。"""
-        if name != "/":
-            path = f"{parent_item.data(Qt.UserRole)}/{name}"
-        else:
-            path = "/"
 
-        tree_item = QStandardItem(name)
-        tree_item.setData(path, Qt.UserRole)
-        tree_item.setToolTip(path)
+        # 节点表，下标为节点id
+        self._names = []
+        self._parents = array("q")
+        self._rows = array("q")
+        self._kinds = array("b")
+        # -1 表示尚未读取
+        self._num_attrs = array("q")
+        self._num_children = array("q")
 
-        num_attrs = len(node.attrs)
-        if num_attrs > 0:
-            attrs_item = QStandardItem(str(num_attrs))
+        # 组节点id -> 已加载的子节点id
+        self._children = {}
+        # 数据集节点id -> 形状文本
+        self._shapes = {}
+        self._expanded = set()
+
+        # 组路径 -> 组节点id
+        self._group_nodes = {}
+        # 组路径 -> 后台扫描得到的成员元数据记录
+        self._scanned = {}
+        self._scanner = None
+        # 元数据是否来自持久化索引，以及已核对过的组路径
+        self._index_restored = False
+        self._verified = set()
+
+        # 添加根节点，其子节点在展开时加载
+        self._add_node(-1, "/", NODE_GROUP)
+
+    def _add_node(self, parent, name, kind):
+        """向节点表追加一个节点并返回其id。"""
+        node = len(self._names)
+        self._names.append(name)
+        self._parents.append(parent)
+        self._kinds.append(kind)
+        self._num_attrs.append(-1)
+        self._num_children.append(-1)
+        if parent >= 0:
+            children = self._children.setdefault(parent, array("q"))
+            self._rows.append(len(children))
+            children.append(node)
         else:
-            attrs_item = QStandardItem("")
+            self._rows.append(0)
+        if kind == NODE_GROUP:
+            self._group_nodes[self.path(node)] = node
+        return node
 
-        attrs_item.setForeground(QBrush(Qt.darkGray))
+    def path(self, node):
+        """返回节点在文件中的路径。"""
+        names = []
+        while node > 0:
+            names.append(self._names[node])
+            node = self._parents[node]
+        return "/" + "/".join(reversed(names))
 
-        if isinstance(node, h5py.Dataset):
-            tree_item.setIcon(get_icon("dataset.svg"))
-            dataset_item = QStandardItem(str(node.shape))
+    def num_children(self, node):
+        """返回组的成员总数（包括尚未加载的成员）。"""
+        if self._num_children[node] < 0:
+            count = 0
+            if self._kinds[node] == NODE_GROUP:
+                count = self.hdf[self.path(node)].id.get_num_objs()
+            self._num_children[node] = count
+        return self._num_children[node]
 
-        elif isinstance(node, h5py.Group):
-            tree_item.setIcon(get_icon("folder.svg"))
-            dataset_item = QStandardItem("")
+    def num_attrs(self, node):
+        """返回节点的属性数。"""
+        if self._num_attrs[node] < 0 and self.is_scanning():
+            return 0
+        if self._num_attrs[node] < 0:
+            info = h5py.h5o.get_info(self.hdf.id, self.path(node).encode())
+            self._num_attrs[node] = info.num_attrs
+        return self._num_attrs[node]
 
-        dataset_item.setForeground(QBrush(Qt.darkGray))
+    def shape_text(self, node):
+        """返回数据集形状的显示文本。"""
+        text = self._shapes.get(node)
+        if text is None and self.is_scanning():
+            return ""
+        if text is None:
+            text = str(self.hdf[self.path(node)].shape)
+            self._shapes[node] = text
+        return text
 
-        parent_item.appendRow([tree_item, attrs_item, dataset_item])
-        return tree_item
+    #
+    # QAbstractItemModel接口
+    #
 
-    def handle_expanded(self, index):
-        """动态填充树视图。"""
-        item = self.itemFromIndex(index)
+    def index(self, row, column, parent=QModelIndex()):
+        """创建并返回索引。"""
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+
+        node = self._children[parent.internalId()][row]
+        return self.createIndex(row, column, node)
+
+    def parent(self, childIndex=QModelIndex()):
+        """返回父节点的索引。"""
+        if not childIndex.isValid():
+            return QModelIndex()
 
-        if not item.hasChildren():
+        parent = self._parents[childIndex.internalId()]
+        if parent < 0:
+            return QModelIndex()
+        return self.createIndex(self._rows[parent], 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        """返回已加载的行数。"""
+        if not parent.isValid():
+            return 1
+        if parent.column() > 0:
+            return 0
+        return len(self._children.get(parent.internalId(), ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        """返回列数。"""
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        """组有成员时返回True，即使成员尚未加载。"""
+        if not parent.isValid():
+            return True
+        if parent.column() > 0:
+            return False
+        node = parent.internalId()
+        if self._kinds[node] != NODE_GROUP:
+            return False
+        if self._num_children[node] < 0 and self.is_scanning():
+            # 元数据尚未到达，先假定组不为空
+            return True
+        return self.num_children(node) > 0
+
+    def canFetchMore(self, parent):
+        """如果组中还有未加载的成员，则返回True。"""
+        if not parent.isValid() or parent.column() > 0:
+            return False
+        node = parent.internalId()
+        if self._kinds[node] != NODE_GROUP:
+            return False
+        return len(self._children.get(node, ())) < self.num_children(node)
+
+    def fetchMore(self, parent):
+        """加载下一批子节点。"""
+        if not self.canFetchMore(parent):
             return
 
-        item.setIcon(get_icon("folder-open.svg"))
+        node = parent.internalId()
+        path = self.path(node)
+        start = len(self._children.get(node, ()))
+        stop = min(start + self.FETCH_BATCH, self.num_children(node))
+
+        # 已扫描的成员直接使用扫描得到的元数据
+        records = self._scanned.get(path, [])
+        # 没有扫描的组（软链接、外部链接或再次到达的组）直接从文件读取
+        if self._index_restored and path in self._scanned and path not in self._verified:
+            records = self._verify_index(node, path, records)
+            stop = min(start + self.FETCH_BATCH, self.num_children(node))
+        scanned_stop = min(stop, len(records))
+
+        self.beginInsertRows(parent, start, stop - 1)
+        for i in range(start, scanned_stop):
+            self._add_scanned_node(node, records[i])
+        if scanned_stop < stop:
+            self._fetch_from_file(node, path, max(start, scanned_stop), stop)
+        self.endInsertRows()
+
+    def _verify_index(self, node, path, records):
+        """核对索引中组的成员数，如果索引已过期则丢弃它并重新扫描。"""
+        self._verified.add(path)
+        num_objs = self.hdf[path].id.get_num_objs()
+        if num_objs == len(records):
+            return records
+
+        self._num_children[node] = num_objs
+        self._scanned = {}
+        self.start_scan(use_index=False)
+        return []
+
+    def _fetch_from_file(self, node, path, start, stop):
+        """直接从文件读取组中[start, stop)个成员并添加到节点表。"""
+        group = self.hdf[path]
+        for i in range(start, stop):
+            name = group.id.get_objname_by_idx(i).decode()
+            obj_type = group.id.get_objtype_by_idx(i)
+            if obj_type == h5py.h5g.GROUP:
+                kind = NODE_GROUP
+            elif obj_type == h5py.h5g.DATASET:
+                kind = NODE_DATASET
+            else:
+                # 软链接/外部链接等：解析目标对象以确定类型
+                obj = group.get(name)
+                if isinstance(obj, h5py.Group):
+                    kind = NODE_GROUP
+                elif isinstance(obj, h5py.Dataset):
+                    kind = NODE_DATASET
+                else:
+                    kind = NODE_OTHER
+            self._add_node(node, name, kind)
+
+    def _add_scanned_node(self, parent, record):
+        """根据扫描记录添加节点并填入其元数据。"""
+        node = self._add_node(parent, record[0], record[1])
+        self._set_metadata(node, record)
+        return node
+
+    def _set_metadata(self, node, record):
+        """将扫描记录中的元数据填入节点表。"""
+        self._num_attrs[node] = record[2]
+        self._num_children[node] = record[4]
+        if record[1] == NODE_DATASET:
+            self._shapes[node] = record[3]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """返回有关表头的数据。"""
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
 
-        for row in range(item.rowCount()):
-            child_item = item.child(row, 0)
+    def data(self, index, role=Qt.DisplayRole):
+        """返回用于显示的节点数据。"""
+        if not index.isValid():
+            return None
 
-            if not child_item or child_item.hasChildren():
-                continue
+        node = index.internalId()
+        column = index.column()
+        kind = self._kinds[node]
 
-            path = child_item.data(Qt.UserRole)
-            child_node = self.hdf[path]
+        if role == Qt.UserRole:
+            return self.path(node)
 
-            if isinstance(child_node, h5py.Group):
-                for name, node in child_node.items():
-                    self.add_node(child_item, name, node)
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self._names[node]
+            if column == 1:
+                num_attrs = self.num_attrs(node)
+                return str(num_attrs) if num_attrs > 0 else ""
+            if column == 2:
+                return self.shape_text(node) if kind == NODE_DATASET else ""
+
+        elif role == Qt.ToolTipRole and column == 0:
+            return self.path(node)
+
+        elif role == Qt.DecorationRole and column == 0:
+            if kind == NODE_DATASET:
+                return get_icon("dataset.svg")
+            if kind == NODE_GROUP:
+                if node in self._expanded:
+                    return get_icon("folder-open.svg")
+                return get_icon("folder.svg")
+
+        elif role == Qt.ForegroundRole and column > 0:
+            return QBrush(Qt.darkGray)
+
+        return None
+
+    #
+    # 后台扫描
+    #
+
+    def start_scan(self, thread_pool=None, use_index=True, file_info=None):
+        """从持久化索引恢复元数据，或在线程池中启动后台元数据扫描。
+
+        没有给出thread_pool时使用扫描专用的线程池（见get_scan_pool）。
+
+        file_info为打开文件前由get_file_info()得到的文件信息时直接使用。
+        """
+        from .tree_index import load_tree_index
+        from .tree_scanner import TreeScanner, get_scan_pool
+
+        self.stop_scan()
+        self._index_restored = False
+        if use_index:
+            groups = load_tree_index(self.hdf.filename, file_info)
+            if groups is not None:
+                self._scanned = groups
+                self._index_restored = True
+                return
+
+        self._scanner = TreeScanner(self.hdf.filename, file_info)
+        self._scanner.signals.batch_ready.connect(self.add_scanned_nodes)
+        self._scanner.signals.finished.connect(self.handle_scan_finished)
+        (thread_pool or get_scan_pool()).start(self._scanner)
+
+    def stop_scan(self):
+        """取消正在进行的后台扫描。"""
+        if self._scanner is not None:
+            self._scanner.cancel()
+            self._scanner = None
+
+    def is_scanning(self):
+        """如果后台扫描正在进行，则返回True。"""
+        return self._scanner is not None
+
+    def add_scanned_nodes(self, parent_path, start, records):
+        """接收后台扫描得到的一批组成员元数据。"""
+        listing = self._scanned.setdefault(parent_path, [])
+        del listing[start:]
+        listing.extend(records)
+
+        parent = self._group_nodes.get(parent_path)
+        if parent is None:
+            return
+
+        # 更新已经加载的行
+        children = self._children.get(parent, ())
+        stop = min(start + len(records), len(children))
+        for row in range(start, stop):
+            self._set_metadata(children[row], records[row - start])
+
+        if start < stop:
+            parent_index = self._index_of(parent)
+            self.dataChanged.emit(
+                self.index(start, 1, parent_index),
+                self.index(stop - 1, 2, parent_index),
+                [Qt.DisplayRole],
+            )
+
+    def handle_scan_finished(self, completed):
+        """后台扫描结束。
+
+        扫描完成时所有已加载的行都已收到元数据。扫描出错而未完成时，
+        扫描期间显示为空的属性数和形状此后改为从文件读取，通知视图刷新这些行。
+        """
+        if self._scanner is None or self.sender() is not self._scanner.signals:
+            return
+        self._scanner = None
+        if completed:
+            return
+
+        for parent, children in self._children.items():
+            if children:
+                parent_index = self._index_of(parent)
+                self.dataChanged.emit(
+                    self.index(0, 1, parent_index),
+                    self.index(len(children) - 1, 2, parent_index),
+                    [Qt.DisplayRole],
+                )
+
+    def _index_of(self, node):
+        """返回节点第0列的索引。"""
+        if self._parents[node] < 0:
+            return self.index(0, 0)
+        return self.createIndex(self._rows[node], 0, node)
+
+    #
+    # 槽函数
+    #
+
+    def handle_expanded(self, index):
+        """展开组时更新图标。"""
+        self._expanded.add(index.internalId())
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
 
     def handle_collapsed(self, index):
         """折叠组时更新图标。"""
-        item = self.itemFromIndex(index)
-        item.setIcon(get_icon("folder.svg"))
\ No newline at end of file
+        self._expanded.discard(index.internalId())
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
@@ -0,0 +1,170 @@
+"""
+包含在后台线程中扫描HDF5文件结构元数据的任务。
+"""
+
+from collections import deque
+
+import h5py
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from .tree_index import save_tree_index
+from .tree_model import NODE_DATASET, NODE_GROUP, NODE_OTHER
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.file_signature import get_file_info
+
+# 扫描专用线程池的线程数：扫描大多在等待HDF5的全局锁，
+# 更多线程只会与数据读取争用，并占满全局线程池
+SCAN_THREADS = 2
+
+_scan_pool = None
+
+
+def get_scan_pool():
+    """返回扫描专用的线程池，打开很多文件时扫描也不占用全局线程池。"""
+    global _scan_pool
+    if _scan_pool is None:
+        _scan_pool = QThreadPool()
+        _scan_pool.setMaxThreadCount(SCAN_THREADS)
+    return _scan_pool
+
+
+class TreeScanSignals(QObject):
+    """TreeScanner发出的信号。
+
+    batch_ready(parent_path, start, records)
+        parent_path组中从第start个成员开始的一批成员元数据，
+        records中每项为 (name, kind, num_attrs, shape_text, num_children,
+        dtype_text, chunks)。
+    finished(completed)
+        扫描结束。completed为False表示被取消或出错。
+    """
+
+    batch_ready = Signal(str, int, list)
+    finished = Signal(bool)
+
+
+class TreeScanner(QRunnable):
+    """
+    在QThreadPool中按广度优先顺序遍历HDF5文件的所有组，
+    并将成员元数据分批通过信号发送给TreeModel。
+
+    任务使用自己打开的h5py文件句柄，GUI线程不做任何HDF5访问。
+    只沿硬链接进入子组，并且每个组（按对象地址）只扫描一次，
+    因此指向上层组的软链接或硬链接构成的环不会使扫描无法结束；
+    软链接和外部链接仍作为成员记录，展开时由TreeModel直接从文件读取。
+    成员按名称顺序枚举（H5Literate），与TreeModel.fetchMore中的顺序一致。
+    扫描完成后，结果被写入持久化索引（见tree_index），供下次打开时使用。
+    写入前重新读取文件信息，索引标记的是扫描结束时的文件版本；
+    给出打开文件前得到的file_info而文件在此之后被修改时不写入索引。
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, filename, file_info=None):
+        super().__init__()
+        self.filename = filename
+        self.file_info = file_info
+        self.signals = TreeScanSignals()
+        self.groups = {}
+        # 已扫描或已排队的组的对象地址
+        self._visited = set()
+        self._cancelled = False
+
+    def cancel(self):
+        """请求停止扫描。"""
+        self._cancelled = True
+
+    def run(self):
+        """遍历文件中的所有组。"""
+        completed = False
+        try:
+            with h5py.File(self.filename, "r") as hdf:
+                self._visited = {h5py.h5o.get_info(hdf.id).addr}
+                queue = deque(["/"])
+                while queue and not self._cancelled:
+                    path = queue.popleft()
+                    queue.extend(self._scan_group(hdf, path))
+            completed = not self._cancelled
+            if completed:
+                file_info = get_file_info(self.filename)
+                if self.file_info is None or file_info == self.file_info:
+                    save_tree_index(self.filename, file_info, self.groups)
+        except (OSError, KeyError, RuntimeError):
+            pass
+        finally:
+            self.signals.finished.emit(completed)
+
+    def _scan_group(self, hdf, path):
+        """扫描一个组的成员，返回其子组路径列表。"""
+        group = hdf[path]
+        names = []
+        group.id.links.iterate(names.append)
+
+        subgroups = []
+        batch = []
+        self.groups[path] = []
+        start = 0
+        for name in names:
+            if self._cancelled:
+                return []
+
+            record = self._scan_member(group, name)
+            self.groups[path].append(record)
+            batch.append(record)
+            if record[1] == NODE_GROUP and record[4] > 0 and self._first_visit(group, name):
+                subgroups.append(f"{path.rstrip('/')}/{record[0]}")
+
+            if len(batch) >= self.BATCH_SIZE:
+                self.signals.batch_ready.emit(path, start, batch)
+                start += len(batch)
+                batch = []
+
+        if batch:
+            self.signals.batch_ready.emit(path, start, batch)
+        return subgroups
+
+    def _first_visit(self, group, name):
+        """如果成员是通过硬链接第一次到达的组，则登记并返回True。"""
+        if group.id.links.get_info(name).type != h5py.h5l.TYPE_HARD:
+            return False
+        addr = h5py.h5o.get_info(group.id, name).addr
+        if addr in self._visited:
+            return False
+        self._visited.add(addr)
+        return True
+
+    @staticmethod
+    def _scan_member(group, name):
+        """返回组成员的元数据记录。"""
+        text = name.decode()
+        try:
+            info = h5py.h5o.get_info(group.id, name)
+        except (KeyError, OSError, RuntimeError):
+            # 断开的软链接或外部链接
+            return (text, NODE_OTHER, 0, "", 0, "", None)
+
+        if info.type == h5py.h5o.TYPE_GROUP:
+            num_children = h5py.h5g.open(group.id, name).get_num_objs()
+            return (text, NODE_GROUP, info.num_attrs, "", num_children, "", None)
+
+        if info.type == h5py.h5o.TYPE_DATASET:
+            dataset = h5py.h5d.open(group.id, name)
+            dcpl = dataset.get_create_plist()
+            chunks = None
+            if dcpl.get_layout() == h5py.h5d.CHUNKED:
+                chunks = list(dcpl.get_chunk())
+            return (
+                text,
+                NODE_DATASET,
+                info.num_attrs,
+                str(dataset.shape),
+                0,
+                str(dataset.dtype),
+                chunks,
+            )
+
+        return (text, NODE_OTHER, info.num_attrs, "", 0, "", None)
@@ -2,6 +2,12 @@
 模型相关的工具函数。
 """
 
+import os
+
+import h5py
+import numpy as np
+from PySide6.QtCore import QStandardPaths
+
 
 def get_dims_from_str(dims_as_str):
     """
@@ -51,4 +57,145 @@ def get_dims_from_str(dims_as_str):
 
     dims = tuple(dims)
 
-    return dims
\ No newline at end of file
+    return dims
+
+
+def range_to_slice(r):
+    """
+    将range对象转换为等价的切片，用于索引数据集。
+
+    参数
+    ----------
+    r : range
+        例如 range(100)[slice(2, None, 3)] 得到的 range(2, 100, 3)。
+
+    返回
+    -------
+    切片
+        例如 slice(2, 100, 3)。
+    """
+    stop = r.stop if r.stop >= 0 else None
+    return slice(r.start, stop, r.step)
+
+
+def get_cell_formatter(dtype):
+    """
+    为给定的dtype选择一个批量格式化函数。
+
+    格式化函数接收一个数据块（numpy数组），一次性返回相同形状的字符串数组，
+    避免对每个单元格逐个尝试decode()再回退到str()。
+    复合类型的结果在最后增加一个字段轴，每个字段使用各自的格式化函数，
+    子数组字段的元素被合并为单个单元格文本。
+
+    参数
+    ----------
+    dtype : numpy.dtype
+        数据集的数据类型。
+
+    返回
+    -------
+    函数
+        formatter(block) -> 字符串数组。
+    """
+    if dtype.names:
+        field_formatters = [
+            (name, get_cell_formatter(dtype.fields[name][0].base))
+            for name in dtype.names
+        ]
+
+        def format_compound(block):
+            columns = []
+            for name, formatter in field_formatters:
+                text = formatter(block[name])
+                if text.ndim > block.ndim:
+                    text = join_trailing_cells(text, block.ndim)
+                columns.append(text)
+            return np.stack(columns, axis=-1)
+
+        return format_compound
+
+    if dtype.kind == "S":
+        return lambda block: np.char.decode(block, "utf-8", "replace")
+
+    if dtype.kind == "U":
+        return lambda block: block
+
+    if dtype.kind == "O":
+        if h5py.check_string_dtype(dtype) is not None:
+            # 变长字符串：h5py以bytes对象返回
+            return lambda block: np.char.decode(
+                block.astype(bytes), "utf-8", "replace"
+            )
+        to_str = np.frompyfunc(str, 1, 1)
+        return lambda block: to_str(block).astype(str)
+
+    return lambda block: block.astype(str)
+
+
+def join_trailing_cells(text, ndim):
+    """
+    将字符串数组中ndim之后的轴合并为"[a b c]"形式的单个单元格文本。
+
+    参数
+    ----------
+    text : numpy.ndarray
+        字符串数组，例如RGB图像块格式化后形状为(行, 列, 3)。
+    ndim : 整数
+        保留的前导轴数。
+
+    返回
+    -------
+    numpy.ndarray
+        形状为text.shape[:ndim]的字符串数组。
+    """
+    flat = text.reshape(text.shape[:ndim] + (-1,))
+    joined = np.full(flat.shape[:-1], "[", dtype=str)
+    for i in range(flat.shape[-1]):
+        if i:
+            joined = np.char.add(joined, " ")
+        joined = np.char.add(joined, flat[..., i])
+    return np.char.add(joined, "]")
+
+
+def get_cache_dir(name):
+    """
+    返回用户缓存目录下名为name的子目录，必要时创建它。
+
+    参数
+    ----------
+    name : STR
+        子目录名，例如 "tree_index"。
+
+    返回
+    -------
+    STR
+        目录路径。
+    """
+    base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache", "hdf5tool")
+    path = os.path.join(base, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_selection_shape(shape, dims):
+    """
+    返回用dims索引形状为shape的数据集所得结果的形状，而不读取数据。
+
+    参数
+    ----------
+    shape : tuple
+        数据集的形状。
+    dims : tuple
+        由整数和切片组成的选区。
+
+    返回
+    -------
+    tuple
+        结果的形状，整数索引的轴被去掉。
+    """
+    dims = tuple(dims) + (slice(None),) * (len(shape) - len(dims))
+    return tuple(
+        len(range(n)[s]) for n, s in zip(shape, dims) if isinstance(s, slice)
+    )
@@ -2,31 +2,118 @@
 包含HDF5图像和绘图视图模型。
 """
 
+import weakref
+
 import h5py
-from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt
+import numpy as np
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QThreadPool, Qt, Signal
+
+from .cache import BlockCache, BufferPool
+from .decimation import PyramidBuilder
+from .frame_cache import FrameCache, FramePrefetcher
+from .image_tiles import LARGE_IMAGE_BYTES, TiledImage, TileLoader
+from .levels import sample_levels, to_uint8
+from .mapped_reader import get_mapped, is_mapped, will_need
+from .memory import governor
+from .readers import selection_layout
+from .utils import get_dims_from_str, get_selection_shape
 
 
 class ImageModel(QAbstractItemModel):
     """
     包含HDF5文件中数据集数据的模型，
     以适合绘制为图像的形式。
+
+    update_node和set_dims只确定要读取的选区（self.selection），
+    数据由调用方读取（通常在后台线程中）后通过set_view_data放入模型。
+
+    对于沿第0轴滚动的图像栈，当前帧周围的帧保存在环形缓冲区中，
+    并沿滚动方向在后台预读，滚动时可以直接从缓存中取得帧。
+
+    超过LARGE_IMAGE_BYTES的图像不整体读取：self.selection被换成
+    降采样的概览图，视图按缩放程度请求所需层的分块（self.tiled），
+    分块在后台读取并保存在LRU缓存中，内存占用与屏幕像素数同量级。
+
+    连续存储、未压缩的图像栈直接映射到内存（self.mapped），不使用帧缓存：
+    每一帧都是映射上的视图，预读只提示操作系统读入后面的帧。
+
+    显示范围由抽样计算，按数据集和选区（图像栈则不含帧号）缓存，
+    同一图像栈的所有帧使用相同的范围。数值图像按该范围转换为
+    8位的display_view后显示，视图不需要再对整幅图像计算范围和缩放。
+
+    image_view和display_view不再使用时放回缓冲池（buffers和display_buffers），
+    后台读取和8位转换复用这些数组，因此滚动相同形状的帧时不分配新的内存。
+    display_buffers只在GUI线程中使用，视图仍在显示的数组不会被后台读取覆盖。
+
+    参数
+    ----------
+    hdf : h5py.File
+        HDF5文件。
+    frame_cache_bytes : 整数
+        帧缓存的内存预算（字节）。
+    read_cache : ReadCache, optional
+        文件的共享读取缓存。
     """
 
-    def __init__(self, hdf):
+    # 帧缓存的默认内存预算
+    FRAME_CACHE_BYTES = 256 * 1024 * 1024
+    # 大图像分块缓存的内存预算
+    TILE_CACHE_BYTES = 128 * 1024 * 1024
+    # 映射的图像栈沿滚动方向提示预读的帧数
+    READAHEAD_FRAMES = 16
+
+    # 请求的分块读取完成
+    tile_ready = Signal()
+
+    def __init__(self, hdf, frame_cache_bytes=FRAME_CACHE_BYTES, read_cache=None):
         super().__init__()
 
         self.hdf = hdf
+        self.read_cache = read_cache
         self.node = None
         self.row_count = 0
         self.column_count = 0
         self.ndim = 0
         self.dims = ()
         self.image_view = None
+        self.display_view = None
+        self.display_levels = None
+        self.levels = {}
+        self.selection = None
         self.compound_names = None
+        self.mapped = None
+        self.buffers = BufferPool()
+        self.display_buffers = BufferPool()
+
+        self.frame_cache = FrameCache(frame_cache_bytes)
+        self.prefetcher = None
+        # 上一次显示的帧号和滚动方向
+        self._frame = None
+        self._direction = 1
+
+        self.tiled = None
+        self.tiles = BlockCache(max_bytes=self.TILE_CACHE_BYTES)
+        self.tile_loader = None
+        self._pending_tiles = set()
+
+        governor.register(self, "图像")
+
+    @property
+    def nbytes(self):
+        """模型中的数据和缓存占用的字节数。"""
+        nbytes = _nbytes(self.image_view) + self.frame_cache.nbytes + self.tiles.nbytes
+        if self.display_view is not self.image_view:
+            nbytes += _nbytes(self.display_view)
+        return nbytes
 
     def update_node(self, path):
         """更新当前节点路径。"""
         self.compound_names = None
+        self.cancel_prefetch()
+        self.cancel_tile_loading()
+        self.tiled = None
+        self._frame = None
+        self._direction = 1
 
         self.beginResetModel()
 
@@ -36,14 +123,24 @@ class ImageModel(QAbstractItemModel):
         self.dims = ()
 
         self.node = self.hdf[path]
+        self.mapped = None
 
         self.image_view = None
+        self.display_view = None
+        self.selection = None
+        # 其他数据集的帧大小不同，旧的数组不会再被复用
+        self.buffers.clear()
+        self.display_buffers.clear()
 
         if not isinstance(self.node, h5py.Dataset) or self.node.dtype == "object":
             self.endResetModel()
             return
 
         self.ndim = self.node.ndim
+        self.mapped = get_mapped(self.node)
+        if self.mapped is not None:
+            # 映射的数据由操作系统的页缓存缓存
+            self.frame_cache.clear()
 
         shape = self.node.shape
 
@@ -65,7 +162,7 @@ class ImageModel(QAbstractItemModel):
             self.row_count = shape[-2]
             self.column_count = shape[-1]
             self.dims = tuple([slice(None), slice(None)])
-            self.image_view = self.node[self.dims]
+            self.selection = self.dims
 
         elif self.ndim > 2 and shape[-1] in [3, 4]:
             self.row_count = shape[-3]
@@ -73,16 +170,173 @@ class ImageModel(QAbstractItemModel):
             self.dims = tuple(
                 ([0] * (self.ndim - 3)) + [slice(None), slice(None), slice(None)]
             )
-            self.image_view = self.node[self.dims]
+            self.selection = self.dims
 
         else:
             self.row_count = shape[-2]
             self.column_count = shape[-1]
             self.dims = tuple(([0] * (self.ndim - 2)) + [slice(None), slice(None)])
-            self.image_view = self.node[self.dims]
+            self.selection = self.dims
 
+        self._use_tiles_if_large()
         self.endResetModel()
 
+    def set_view_data(self, data):
+        """放入按self.selection读取的数据。"""
+        self.beginResetModel()
+        self._release_views(data)
+        self.image_view = data
+        self._update_display()
+        self.endResetModel()
+
+        frame = self._get_frame()
+        if frame is not None and data is not None and self.mapped is None:
+            self.frame_cache.put(frame, data)
+
+    def _release_views(self, keep=None):
+        """将image_view和display_view（keep除外）放回缓冲池并清空。"""
+        if self.image_view is not keep:
+            self.buffers.release(self.image_view)
+        if self.display_view is not self.image_view:
+            self.display_buffers.release(self.display_view)
+        self.image_view = None
+        self.display_view = None
+
+    def _get_frame(self):
+        """返回当前选区在图像栈中的帧号，选区不是图像栈中的一帧时返回None。
+
+        同时为该图像栈准备帧缓存（映射的图像栈不使用帧缓存）。
+        """
+        if self.selection is None or self.ndim <= 2 or not isinstance(self.selection[0], int):
+            return None
+        if self.mapped is not None:
+            return self.selection[0] % self.node.shape[0]
+        frame_shape = get_selection_shape(self.node.shape, self.selection)
+        self.frame_cache.reset(
+            (self.node.name, str(self.selection[1:])),
+            frame_shape,
+            self.node.dtype,
+            self.node.shape[0],
+        )
+        return self.selection[0] % self.node.shape[0]
+
+    def load_cached_frame(self):
+        """如果当前选区的帧已被缓存，则将其放入模型并返回True。"""
+        frame = self._get_frame()
+        if frame is None:
+            return False
+        if self.mapped is not None:
+            # 直接显示映射上的视图，不复制
+            self.beginResetModel()
+            self._release_views()
+            self.image_view = self.mapped[self.selection]
+            self._update_display()
+            self.endResetModel()
+            return True
+        out = self.buffers.acquire(*selection_layout(self.node, self.selection))
+        data = self.frame_cache.get(frame, out)
+        if data is None:
+            self.buffers.release(out)
+            return False
+        self.beginResetModel()
+        self._release_views()
+        self.image_view = data
+        self._update_display()
+        self.endResetModel()
+        return True
+
+    def _levels_key(self):
+        """返回缓存显示范围所用的键，图像栈的所有帧共用一个键。"""
+        if self.tiled is not None:
+            return self.tiled.key
+        if self._get_frame() is not None:
+            return (self.node.name, str(self.selection[1:]))
+        return (self.node.name, str(self.selection))
+
+    def _update_display(self):
+        """按缓存的显示范围将image_view转换为8位图像。
+
+        第一次显示时由抽样计算显示范围；非数值图像不转换。
+        """
+        data = self.image_view
+        if data is None or data.dtype.kind not in "biuf":
+            self.display_view = data
+            self.display_levels = None
+            return
+
+        key = self._levels_key()
+        levels = self.levels.get(key)
+        if levels is None:
+            levels = sample_levels(data)
+            self.levels[key] = levels
+        self.display_levels = levels
+        self.display_view = to_uint8(
+            data, levels, self.display_buffers.acquire(data.shape, np.uint8)
+        )
+
+    def to_display(self, data):
+        """按当前的显示范围转换分块等附加数据。"""
+        if self.display_levels is None:
+            return data
+        return to_uint8(data, self.display_levels)
+
+    def has_frame(self, frame):
+        """如果当前图像栈的第frame帧已被缓存，则返回True。"""
+        if self._get_frame() is None:
+            return False
+        return self.mapped is not None or frame in self.frame_cache
+
+    def can_play(self):
+        """如果当前图像栈可以播放，则返回True。
+
+        播放只显示已缓存的帧：单帧超出帧缓存预算（容量为0）且没有
+        映射到内存的图像栈无法预读，播放会一直停在当前帧。
+        """
+        if self._get_frame() is None:
+            return False
+        return self.mapped is not None or self.frame_cache.capacity > 0
+
+    def is_prefetching(self, frame):
+        """如果第frame帧正在等待预读，则返回True。"""
+        return (
+            self.prefetcher is not None
+            and not self.prefetcher.finished
+            and frame in self.prefetcher.frames
+        )
+
+    def prefetch_frames(self, start=None):
+        """沿滚动方向在后台预读start（默认为当前帧）周围尚未缓存的帧。"""
+        self.cancel_prefetch()
+        frame = self._get_frame()
+        if frame is None:
+            return
+        if self._frame is not None and frame != self._frame:
+            self._direction = 1 if frame > self._frame else -1
+        self._frame = frame
+
+        if start is not None:
+            # 从start开始预读时start本身也需要读取
+            frame = start - self._direction
+        if self.mapped is not None:
+            if self._direction > 0:
+                will_need(self.node, frame + 1, frame + 1 + self.READAHEAD_FRAMES)
+            else:
+                will_need(self.node, frame - self.READAHEAD_FRAMES, frame)
+            return
+        frames = self.frame_cache.window(frame, self.node.shape[0], self._direction)
+        frames = [i for i in frames if i not in self.frame_cache]
+        if frames:
+            self.prefetcher = FramePrefetcher(
+                self.frame_cache, self.node, self.selection, frames
+            )
+            QThreadPool.globalInstance().start(self.prefetcher)
+
+    def cancel_prefetch(self):
+        """取消正在进行的预读。"""
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+            self.prefetcher = None
+
     def parent(self, childIndex=QModelIndex()):
         """创建并返回索引。"""
         return QModelIndex()
@@ -132,24 +386,26 @@ class ImageModel(QAbstractItemModel):
         self.row_count = None
         self.column_count = None
         self.dims = []
-        self.image_view = None
+        self._release_views()
+        self.selection = None
+        self.cancel_tile_loading()
+        self.tiled = None
 
-        from src.models.utils import get_dims_from_str
         self.dims = get_dims_from_str(dims)
 
         if len(self.dims) >= 2 and self.node.dtype != "object":
-            self.image_view = self.node[self.dims]
-            shape = self.image_view.shape
-            if self.image_view.ndim == 2:
+            shape = get_selection_shape(self.node.shape, self.dims)
+            if len(shape) == 2:
+                self.selection = self.dims
                 self.row_count = shape[-2]
                 self.column_count = shape[-1]
 
-            elif self.image_view.ndim == 3 and shape[-1] in [3, 4]:
+            elif len(shape) == 3 and shape[-1] in [3, 4]:
+                self.selection = self.dims
                 self.row_count = shape[-3]
                 self.column_count = shape[-2]
 
             else:
-                self.image_view = None
                 self.row_count = 1
                 self.column_count = 1
 
@@ -157,27 +413,151 @@ class ImageModel(QAbstractItemModel):
             self.row_count = 1
             self.column_count = 1
 
+        self._use_tiles_if_large()
         self.endResetModel()
 
+    def _use_tiles_if_large(self):
+        """图像超过LARGE_IMAGE_BYTES或内存预算时改为读取概览图，其余按分块读取。"""
+        if self.selection is None:
+            return
+        nbytes = governor.selection_cost(self.node, self.selection)
+        if nbytes > LARGE_IMAGE_BYTES or not governor.fits(nbytes):
+            self.tiled = TiledImage(self.node, self.selection, governor.budget())
+            self.selection = self.tiled.overview_selection
+
+    @property
+    def image_shape(self):
+        """以原图像素为单位的图像形状 (行数, 列数)。"""
+        if self.tiled is not None:
+            return self.tiled.shape
+        if self.image_view is None:
+            return (0, 0)
+        return self.image_view.shape[:2]
+
+    def value_at(self, y, x):
+        """返回原图中(y, x)处的像素值，使用已读取的最精细的数据。"""
+        if self.tiled is None:
+            return self.image_view[y, x]
+        overview = self.tiled.overview_level
+        for level in range(overview):
+            tile = self.tiled.tiles_in_rect(level, y, x, y + 1, x + 1)[0]
+            data = self.tiles.get(self.tiled.key + tile)
+            if data is not None:
+                y0, x0 = self.tiled.tile_rect(*tile)[:2]
+                return data[(y - y0) >> level, (x - x0) >> level]
+        return self.image_view[y >> overview, x >> overview]
+
+    def get_tile(self, tile):
+        """返回已读取的分块数据，尚未读取时返回None。"""
+        return self.tiles.get(self.tiled.key + tile)
+
+    def request_tiles(self, tiles):
+        """在后台读取尚未缓存的分块。
+
+        之前请求但已不再需要的分块被取消，
+        每读完一个分块发出一次tile_ready信号。
+        """
+        key = self.tiled.key
+        missing = [tile for tile in tiles if key + tile not in self.tiles]
+        if {key + tile for tile in missing} <= self._pending_tiles:
+            return
+
+        self.cancel_tile_loading()
+        self.tile_loader = TileLoader(self.tiled, missing, self.read_cache)
+        self.tile_loader.signals.loaded.connect(self.handle_tile_loaded)
+        self.tile_loader.signals.finished.connect(self.handle_tiles_finished)
+        self._pending_tiles = {key + tile for tile in missing}
+        QThreadPool.globalInstance().start(self.tile_loader)
+
+    def cancel_tile_loading(self):
+        """取消正在进行的分块读取。"""
+        if self.tile_loader is not None:
+            self.tile_loader.cancel()
+            self.tile_loader = None
+        self._pending_tiles = set()
+
+    def handle_tile_loaded(self, key, data):
+        """保存读取完成的分块。"""
+        self.tiles.put(key, data)
+        self._pending_tiles.discard(key)
+        if self.tiled is not None and key[:2] == self.tiled.key:
+            self.tile_ready.emit()
+
+    def handle_tiles_finished(self, keys):
+        """分块读取任务结束，未读取的分块可以被重新请求。"""
+        if self.tile_loader is not None and self.sender() is self.tile_loader.signals:
+            self.tile_loader = None
+            self._pending_tiles.difference_update(keys)
+
 
 class PlotModel(QAbstractItemModel):
     """
     包含HDF5文件数据集数据的模型，
     以适合绘制为y(x)的形式，其中x通常是索引。
+
+    与ImageModel一样，数据通过self.selection和set_view_data分两步加载。
+
+    较长的一维序列第一次被绘制时，在后台线程中为其建立最小/最大值金字塔，
+    金字塔按数据集路径、选区、缩减的桶长度和列名保存在LRU缓存中。
+    同一模型由多个选项卡中的PlotView共用，每个视图用自己绘制时
+    记下的view_key查询金字塔，而不是模型当前的view_key。
+
+    视图在新数据放入之前仍在绘制旧的plot_view，因此旧数组在视图改为
+    绘制新数据后（见recycle）才放回缓冲池（buffers），供下一次后台读取复用；
+    仍被其他选项卡的视图（见attach_view）绘制的数组留到它们更新之后。
+
+    超出内存预算的选区沿第一个切片轴分成长度为bucket的桶，后台读取时
+    逐块缩减为每个桶的最小值和最大值（见read_minmax），尖峰不会丢失；
+    第i个点在原数据中的下标由x_positions()给出。
+
+    参数
+    ----------
+    hdf : h5py.File
+        HDF5文件。
+    read_cache : ReadCache, optional
+        文件的共享读取缓存。
     """
 
-    def __init__(self, hdf):
+    # 建立金字塔的最短序列长度，更短的序列直接降采样已足够快
+    PYRAMID_MIN_LENGTH = 1 << 16
+
+    # 金字塔建立完成
+    pyramid_ready = Signal()
+
+    def __init__(self, hdf, read_cache=None):
         super().__init__()
 
         self.hdf = hdf
+        self.read_cache = read_cache
         self.node = None
         self.row_count = 0
         self.column_count = 0
         self.ndim = 0
         self.dims = ()
         self.plot_view = None
+        self.selection = None
         self.compound_names = None
 
+        self.buffers = BufferPool()
+        # 已被替换、等待视图更新后回收的plot_view
+        self._retired = []
+        # 使用本模型的视图，它们的data属性是正在绘制的数组
+        self._views = weakref.WeakSet()
+
+        # plot_view对应的(数据集路径, 选区)
+        self.view_key = None
+        self.pyramids = BlockCache(max_bytes=256 * 1024 * 1024)
+        self._pending_pyramids = set()
+        self.bucket = 1
+        self.x_indices = None
+
+        governor.register(self, "绘图")
+
+    @property
+    def nbytes(self):
+        """模型中的数据和金字塔占用的字节数。"""
+        return _nbytes(self.plot_view) + self.pyramids.nbytes
+
     def update_node(self, path):
         """更新当前节点路径。"""
         self.beginResetModel()
@@ -188,7 +568,11 @@ class PlotModel(QAbstractItemModel):
         self.ndim = 0
         self.dims = ()
         self.plot_view = None
+        self.selection = None
         self.compound_names = None
+        # 其他数据集的数组大小不同，不再复用
+        self._retired.clear()
+        self.buffers.clear()
 
         if not isinstance(self.node, h5py.Dataset) or self.node.dtype == "object":
             self.endResetModel()
@@ -212,7 +596,8 @@ class PlotModel(QAbstractItemModel):
 
             if self.compound_names:
                 self.column_count = len(self.compound_names)
-                self.plot_view = self.node[self.dims[0]]
+                self.selection = self.dims
+                self._decimate_if_large()
                 self.endResetModel()
                 return
 
@@ -231,9 +616,98 @@ class PlotModel(QAbstractItemModel):
             self.column_count = shape[-1]
             self.dims = tuple(([0] * (self.ndim - 2)) + [slice(None), slice(None)])
 
-        self.plot_view = self.node[self.dims]
+        self.selection = self.dims
+        self._decimate_if_large()
+        self.endResetModel()
+
+    def _decimate_if_large(self):
+        """选区超出内存预算时设置最小/最大值缩减的桶长度。
+
+        每个桶缩减为两个点，桶长度取降采样倍数的两倍，结果不超出预算。
+        """
+        self.bucket = 1
+        self.x_indices = None
+        if self.selection is None:
+            return
+        step = governor.reduction(governor.selection_cost(self.node, self.selection))
+        axes = [i for i, s in enumerate(self.selection) if isinstance(s, slice)]
+        if step == 1 or not axes:
+            return
+        self.bucket = 2 * step
+        self.x_indices = range(self.node.shape[axes[0]])[self.selection[axes[0]]]
+
+    def x_positions(self, length):
+        """返回缩减后前length个点在原数据中的下标。
+
+        第k个桶的两个点分别放在桶的第一个和最后一个下标处。
+        """
+        points = np.arange(length)
+        positions = (points // 2) * self.bucket + (points % 2) * (self.bucket - 1)
+        positions = np.minimum(positions, len(self.x_indices) - 1)
+        return self.x_indices.start + self.x_indices.step * positions
+
+    def set_view_data(self, data):
+        """放入按self.selection读取的数据。
+
+        调用方随后必须用新数据更新视图，视图更新后调用recycle()。
+        """
+        self.beginResetModel()
+        self._retire_view()
+        self.plot_view = data
+        self.view_key = (self.node.name, str(self.selection), self.bucket)
         self.endResetModel()
 
+    def attach_view(self, view):
+        """登记使用本模型的视图，其data属性引用的数组不会被回收。"""
+        self._views.add(view)
+
+    def recycle(self):
+        """将不再有视图绘制的旧数组放回缓冲池。"""
+        # 正在建立的金字塔仍在读取旧的序列，这时不回收
+        if self._pending_pyramids:
+            return
+        drawn = [view.data for view in self._views]
+        retired = []
+        for array in self._retired:
+            if any(array is d for d in drawn):
+                retired.append(array)
+            else:
+                self.buffers.release(array)
+        self._retired = retired
+
+    def _retire_view(self):
+        """清空plot_view，旧数组等到视图不再使用后回收。"""
+        if self.plot_view is not None:
+            self._retired.append(self.plot_view)
+        self.plot_view = None
+
+    def get_pyramid(self, view_key, name, y):
+        """返回按view_key读取的数据中名为name的序列y的金字塔。
+
+        view_key是视图绘制时记下的self.view_key。
+        如果金字塔尚未建立，则在后台开始建立并返回None，
+        建立完成后发出pyramid_ready信号。
+        """
+        if len(y) < self.PYRAMID_MIN_LENGTH or y.ndim != 1 or y.dtype.kind not in "biuf":
+            return None
+
+        key = view_key + (name,)
+        pyramid = self.pyramids.get(key)
+        if pyramid is not None and pyramid.length != len(y):
+            pyramid = None
+        if pyramid is None and key not in self._pending_pyramids:
+            self._pending_pyramids.add(key)
+            builder = PyramidBuilder(key, y)
+            builder.signals.finished.connect(self.handle_pyramid_built)
+            QThreadPool.globalInstance().start(builder)
+        return pyramid
+
+    def handle_pyramid_built(self, key, pyramid):
+        """保存建立完成的金字塔。"""
+        self._pending_pyramids.discard(key)
+        self.pyramids.put(key, pyramid)
+        self.pyramid_ready.emit()
+
     def parent(self, childIndex=QModelIndex()):
         """创建并返回索引。"""
         return QModelIndex()
@@ -283,9 +757,9 @@ class PlotModel(QAbstractItemModel):
         self.row_count = None
         self.column_count = None
         self.dims = ()
-        self.plot_view = None
+        self._retire_view()
+        self.selection = None
 
-        from src.models.utils import get_dims_from_str
         self.dims = get_dims_from_str(dims)
 
         if len(self.dims) >= 1 and self.node.dtype != "object":
@@ -296,28 +770,36 @@ class PlotModel(QAbstractItemModel):
                 return
 
             if not self.compound_names:
-                self.plot_view = self.node[self.dims]
-                shape = self.plot_view.shape
+                shape = get_selection_shape(self.node.shape, self.dims)
                 self.row_count = shape[0]
 
-                if self.plot_view.ndim == 1:
+                if len(shape) == 1:
+                    self.selection = self.dims
                     self.column_count = 1
 
-                elif self.plot_view.ndim == 2:
+                elif len(shape) == 2:
+                    self.selection = self.dims
                     self.column_count = shape[1]
 
                 else:
-                    self.plot_view = None
                     self.column_count = 1
 
             else:
                 # 对于复合数据类型，直接使用整个数据视图
-                self.plot_view = self.node[self.dims[0]]
-                self.row_count = self.plot_view.shape[0]
+                self.selection = self.dims[:1]
+                self.row_count = get_selection_shape(
+                    self.node.shape, self.selection
+                )[0]
                 self.column_count = len(self.compound_names)
 
         else:
             self.row_count = 1
             self.column_count = 1
 
-        self.endResetModel()
\ No newline at end of file
+        self._decimate_if_large()
+        self.endResetModel()
+
+
+def _nbytes(data):
+    """返回数组占用的字节数，None和文件映射上的视图为0。"""
+    return 0 if data is None or is_mapped(data) else data.nbytes
@@ -4,14 +4,25 @@
 
 from .hdf5_widget import HDF5Widget
 from .plot_dialog import PlotSettingsDialog
-from .image_view import ImageView
-from .plot_view import PlotView
+from .preferences_dialog import PreferencesDialog
 from .export_utils import ExportUtils
 
 __all__ = [
     'HDF5Widget',
     'PlotSettingsDialog',
+    'PreferencesDialog',
     'ImageView',
     'PlotView',
     'ExportUtils'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """依赖pyqtgraph的视图在第一次被访问时才导入。"""
+    if name == 'ImageView':
+        from .image_view import ImageView
+        return ImageView
+    if name == 'PlotView':
+        from .plot_view import PlotView
+        return PlotView
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,9 +3,12 @@
 """
 
 import os
-import pandas as pd
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QFileDialog, QMessageBox
+from PySide6.QtCore import Qt, QThreadPool
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.csv_export import CsvExportTask
 
 
 class ExportUtils:
@@ -35,7 +38,7 @@ class ExportUtils:
             return
 
         if not path:
-            node_path = hdf_widget.tree_model.itemFromIndex(current_index).data(Qt.UserRole)
+            node_path = hdf_widget.tree_model.data(current_index, Qt.UserRole)
             if not node_path:
                 QMessageBox.warning(hdf_widget, "警告", "无法获取数据集路径！")
                 return
@@ -52,49 +55,46 @@ class ExportUtils:
         if not path:  # 用户取消了保存
             return
 
-        try:
-            # 获取表格数据
-            data = data_model.data_view
-            rows = data_model.row_count
-            cols = data_model.column_count
-
-            # 创建DataFrame
-            if data_model.compound_names:
-                # 复合数据类型
-                column_names = data_model.compound_names
-                df_data = {}
-                for i, col_name in enumerate(column_names):
-                    if data.ndim == 0:
-                        df_data[col_name] = [data[col_name]]
-                    else:
-                        df_data[col_name] = [data[row][col_name] for row in range(rows)]
-                df = pd.DataFrame(df_data)
-            else:
-                # 简单数据类型
-                if data.ndim == 0:
-                    # 标量值
-                    df = pd.DataFrame([[data]])
-                elif data.ndim == 1:
-                    # 一维数组
-                    df = pd.DataFrame(data.reshape(-1, 1))
-                else:
-                    # 二维数组
-                    df = pd.DataFrame(data)
+        # 任务保存表格当前选择的快照，在后台线程中流式写出
+        task = CsvExportTask(data_model, path)
+        dialog = QProgressDialog("正在导出CSV...", "取消", 0, 100, hdf_widget)
+        dialog.setWindowTitle("导出CSV")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.setValue(0)
 
-            # 导出到CSV，确保正确处理中文
-            df.to_csv(path, index=False, encoding='utf-8-sig')
+        def handle_finished():
+            dialog.close()
+            hdf_widget.export_task = None
             QMessageBox.information(
                 hdf_widget,
                 "导出成功",
                 f"数据已成功导出到:\n{path}"
             )
-        except Exception as e:
+
+        def handle_failed(message):
+            dialog.close()
+            hdf_widget.export_task = None
             QMessageBox.critical(
                 hdf_widget,
                 "导出失败",
-                f"导出数据时发生错误:\n{str(e)}"
+                f"导出数据时发生错误:\n{message}"
             )
-    
+
+        def handle_canceled():
+            task.cancel()
+            hdf_widget.export_task = None
+
+        task.signals.progress.connect(dialog.setValue)
+        task.signals.finished.connect(handle_finished)
+        task.signals.failed.connect(handle_failed)
+        dialog.canceled.connect(handle_canceled)
+
+        hdf_widget.export_task = task
+        QThreadPool.globalInstance().start(task)
+
     @staticmethod
     def export_plot_image(plot_view, parent_widget, path=None):
         """导出当前绘图为图片。
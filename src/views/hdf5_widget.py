@@ -4,13 +4,13 @@
 
 import h5py
 import os
-import psutil
-from PySide6.QtCore import QModelIndex, Qt, QSettings
+from PySide6.QtCore import QModelIndex, Qt, QSettings, QThreadPool
 from PySide6.QtGui import QAction
 from PySide6.QtWidgets import (
     QAbstractItemView, QCheckBox, QComboBox, QDialog,
     QFileDialog, QGroupBox, QHBoxLayout, QLabel, QLineEdit, QMessageBox,
-    QPushButton, QScrollBar, QSpinBox, QTabBar, QTableView, QTabWidget,
+    QProgressBar, QProgressDialog, QPushButton, QScrollBar, QSpinBox, QTabBar,
+    QTableView, QTabWidget,
     QTreeView, QVBoxLayout, QWidget, QFormLayout, QMenu, QScrollArea,
     QHeaderView, QSizePolicy, QGridLayout
 )
@@ -22,15 +22,22 @@ from src.models import (
     AttributesTableModel, DatasetTableModel, DataTableModel,
     DimsTableModel, PlotModel, TreeModel, ImageModel
 )
+from src.models.mapped_reader import release_file
+from src.models.read_cache import ReadCache
+from src.models.readers import DatasetLoader
+from src.models.statistics import StatisticsTask
+from src.models.statistics_cache import StatisticsCache
 from .plot_dialog import PlotSettingsDialog
-from .image_view import ImageView
-from .plot_view import PlotView
 from .export_utils import ExportUtils
 
 
 class HDF5Widget(QWidget):
-    """主HDF5视图容器小部件。"""
-    def __init__(self, hdf):
+    """主HDF5视图容器小部件。
+
+    file_info为打开文件前由get_file_info()得到的文件信息（如启动时验证文件的结果），
+    给出时恢复结构索引不再重新读取文件。
+    """
+    def __init__(self, hdf, file_info=None):
         super().__init__()
         self.hdf = hdf
         self.plot_views = {}
@@ -39,10 +46,14 @@ class HDF5Widget(QWidget):
         # 初始化模型
         self.tree_model = TreeModel(self.hdf)
         self.attrs_model = AttributesTableModel(self.hdf)
-        self.dataset_model = DatasetTableModel(self.hdf)
+        # 列统计结果的缓存，同时为数据集描述符面板提供最小值、最大值和均值
+        self.statistics_cache = StatisticsCache()
+        # 表格、绘图和图像模型共用的读取缓存
+        self.read_cache = ReadCache()
+        self.dataset_model = DatasetTableModel(self.hdf, self.statistics_cache)
         self.dims_model = DimsTableModel(self.hdf)
-        self.data_model = DataTableModel(self.hdf)
-        self.plot_model = PlotModel(self.hdf)
+        self.data_model = DataTableModel(self.hdf, self.read_cache)
+        self.plot_model = PlotModel(self.hdf, self.read_cache)
         self.image_model = None  # 将在需要时初始化
 
         # 设置主文件树视图
@@ -201,11 +212,25 @@ class HDF5Widget(QWidget):
         self.tabs.tabBar().setTabButton(0, QTabBar.RightSide, None)
         self.tabs.tabCloseRequested.connect(self.handle_close_tab)
 
+        # 后台读取数据时显示的进度条
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setVisible(False)
+
         # 创建主布局
         layout = QVBoxLayout()
         layout.addWidget(self.tabs)
+        layout.addWidget(self.load_progress)
         self.setLayout(layout)
 
+        # 正在进行的后台数据读取任务，以及读取完成后接收数据的模型和回调
+        self.loader = None
+        self.loading_model = None
+        self.loading_callback = None
+        # 正在进行的CSV导出和列统计任务
+        self.export_task = None
+        self.statistics_task = None
+
         # 保存每个选项卡的当前dims状态，以便在
         # 更改选项卡时可以恢复
         self.tab_dims = {id(self.tabs.widget(0)): list(self.dims_model.shape)}
@@ -213,14 +238,12 @@ class HDF5Widget(QWidget):
         # 以便在更改选项卡时可以恢复。
         self.tab_node = {}
 
-        # 如果加载节点将消耗大于self.memory_ratio_limit的可用内存的较大比例，
-        # 将出现警告对话框，以便用户可以选择加载
-        # 节点或取消加载。
-        self.memory_ratio_limit = 0.3
-
         # 最后，初始化视图的信号
         self.init_signals()
 
+        # 在后台线程中扫描文件结构元数据，树视图逐步填充
+        self.tree_model.start_scan(file_info=file_info)
+
     def init_signals(self):
         """初始化视图信号。"""
         # 当选择树节点时更新表视图
@@ -236,23 +259,120 @@ class HDF5Widget(QWidget):
 
     def close_file(self):
         """关闭hdf5文件并清理。"""
+        self.cancel_background_tasks()
+        self.read_cache.clear()
+        self.release_mapped_file()
         self.hdf.close()
 
+    def release_mapped_file(self):
+        """释放文件的内存映射，使文件不再被锁定（见mapped_reader）。"""
+        release_file(self.hdf.filename)
+
+    def cancel_background_tasks(self):
+        """取消此文件的所有后台任务。"""
+        self.tree_model.stop_scan()
+        self.cancel_loading()
+        if self.image_model is not None:
+            self.image_model.cancel_prefetch()
+        if self.export_task is not None:
+            self.export_task.cancel()
+            self.export_task = None
+        if self.statistics_task is not None:
+            self.statistics_task.cancel()
+            self.statistics_task = None
+
+    def load_view_data(self, model, callback):
+        """在后台读取模型选区的数据。
+
+        读取完成后数据被放入模型，然后调用callback更新视图。
+        之前尚未完成的读取被取消。
+        """
+        self.cancel_loading()
+        if model.selection is None:
+            callback()
+            return
+
+        self.loader = DatasetLoader(
+            model.node, model.selection, model.buffers, model.read_cache,
+            getattr(model, "bucket", 1),
+        )
+        self.loading_model = model
+        self.loading_callback = callback
+        self.loader.signals.progress.connect(self.handle_load_progress)
+        self.loader.signals.loaded.connect(self.handle_data_loaded)
+        self.loader.signals.failed.connect(self.handle_load_failed)
+        self.load_progress.setValue(0)
+        self.load_progress.setVisible(True)
+        QThreadPool.globalInstance().start(self.loader)
+
+    def load_image_frame(self, image_view):
+        """显示图像模型当前选区的数据。
+
+        图像栈中已缓存的帧立即显示，否则在后台读取；
+        然后沿滚动方向预读后面的帧。
+        """
+        if self.image_model.load_cached_frame():
+            self.cancel_loading()
+            image_view.update_image()
+        else:
+            self.load_view_data(self.image_model, image_view.update_image)
+        self.image_model.prefetch_frames()
+
+    def cancel_loading(self):
+        """取消正在进行的后台数据读取。"""
+        if self.loader is not None:
+            self.loader.cancel()
+        self.loader = None
+        self.loading_model = None
+        self.loading_callback = None
+        self.load_progress.setVisible(False)
+
+    def _is_current_loader(self):
+        """如果信号来自当前的读取任务，则返回True。"""
+        return self.loader is not None and self.sender() is self.loader.signals
+
     #
     # 槽函数
     #
 
+    def handle_load_progress(self, percent):
+        """更新读取进度。"""
+        if self._is_current_loader():
+            self.load_progress.setValue(percent)
+
+    def handle_data_loaded(self, data):
+        """将读取的数据放入模型并更新视图。"""
+        if not self._is_current_loader():
+            return
+        model, callback = self.loading_model, self.loading_callback
+        self.loader = None
+        self.cancel_loading()
+        model.set_view_data(data)
+        callback()
+
+    def handle_load_failed(self, message):
+        """读取数据出错。"""
+        if not self._is_current_loader():
+            return
+        model, callback = self.loading_model, self.loading_callback
+        self.loader = None
+        self.cancel_loading()
+        model.set_view_data(None)
+        callback()
+        QMessageBox.warning(self, "错误", f"读取数据时出错: {message}")
+
     def handle_dims_data_changed(self, topLeft, bottomRight, roles):
         """设置要在表中显示的维度。"""
         id_cw = id(self.tabs.currentWidget())
         if isinstance(self.tabs.currentWidget(), QTableView):
+            self.cancel_loading()
             self.data_model.set_dims(self.dims_model.shape)
-        elif isinstance(self.tabs.currentWidget(), PlotView):
+        elif _is_plot_view(self.tabs.currentWidget()):
             self.plot_model.set_dims(self.dims_model.shape)
-            self.plot_views[id_cw].update_plot()
-        elif isinstance(self.tabs.currentWidget(), ImageView):
+            self.load_view_data(self.plot_model, self.plot_views[id_cw].update_plot)
+        elif _is_image_view(self.tabs.currentWidget()):
             self.image_model.set_dims(self.dims_model.shape)
-            self.image_views[id_cw].update_image()
+            self.load_image_frame(self.image_views[id_cw])
         self.tab_dims[id_cw] = list(self.dims_model.shape)
 
     def handle_selection_changed(self, selected, deselected):
@@ -261,29 +381,21 @@ class HDF5Widget(QWidget):
         刷新关联表中的数据
         视图。
         """
+        # 新的选择使之前尚未完成的读取失去意义
+        self.cancel_loading()
+
         index = selected.indexes()[0]
-        path = self.tree_model.itemFromIndex(index).data(Qt.UserRole)
+        path = self.tree_model.data(index, Qt.UserRole)
+        # 数据集总是可以打开：超出内存预算的视图由模型自行降级
+        # （表格分页、绘图降采样、图像分块显示），见models.memory
         is_path_dataset = isinstance(self.hdf[path], h5py.Dataset)
-        if is_path_dataset:
-            memory_ratio = self.calculate_memory_ratio(path)
-            continue_loading = self.check_node_size(memory_ratio, path)
-            if not continue_loading:
-                # 用户选择不加载节点
-                if not deselected.isEmpty():
-                    index = deselected.indexes()[0]
-                else:
-                    index = QModelIndex()
-                self.tree_view.selectionModel().blockSignals(True)
-                self.tree_view.setCurrentIndex(index)
-                self.tree_view.selectionModel().blockSignals(False)
-                return
 
         self.attrs_model.update_node(path)
         self.attrs_view.scrollToTop()
         self.dataset_model.update_node(path)
         self.dataset_view.scrollToTop()
         self.dims_model.update_node(
-            path, now_on_PlotView=isinstance(self.tabs.currentWidget(), PlotView)
+            path, now_on_PlotView=_is_plot_view(self.tabs.currentWidget())
         )
         # 更新绘图设置视图
         self.update_plot_settings_view(path)
@@ -331,13 +443,13 @@ class HDF5Widget(QWidget):
                 self.data_model.update_node(path)
             self.data_view.scrollToTop()
 
-        elif isinstance(self.tabs.currentWidget(), ImageView):
+        elif _is_image_view(self.tabs.currentWidget()):
             self.image_model.update_node(path)
-            self.image_views[id_cw].update_image()
+            self.load_image_frame(self.image_views[id_cw])
 
-        elif isinstance(self.tabs.currentWidget(), PlotView):
+        elif _is_plot_view(self.tabs.currentWidget()):
             self.plot_model.update_node(path)
-            self.plot_views[id_cw].update_plot()
+            self.load_view_data(self.plot_model, self.plot_views[id_cw].update_plot)
 
     def handle_tab_changed(self):
         """保留每个选项卡的dims并在选项卡更改时
@@ -356,7 +468,7 @@ class HDF5Widget(QWidget):
     def add_image(self):
         """添加选项卡以查看hdf5文件中数据集的图像。"""
         c_index = self.tab_node[id(self.tabs.currentWidget())]
-        path = self.tree_model.itemFromIndex(c_index).data(Qt.UserRole)
+        path = self.tree_model.data(c_index, Qt.UserRole)
         
         # 检查数据是否适合图像显示
         dataset = self.hdf[path]
@@ -371,17 +483,19 @@ class HDF5Widget(QWidget):
             
         # 初始化图像模型
         if self.image_model is None:
-            self.image_model = ImageModel(self.hdf)
+            self.image_model = ImageModel(self.hdf, read_cache=self.read_cache)
             
         # 更新图像模型
         self.image_model.update_node(path)
         
         # 创建图像视图
+        from .image_view import ImageView
         image_view = ImageView(self.image_model, self.dims_model)
         image_view.update_image()
+        self.load_image_frame(image_view)
         
         # 添加到选项卡
-        self.dims_model.update_node(path, now_on_PlotView=True)
+        self.dims_model.update_node(path)
         id_image = id(image_view)
         self.image_views[id_image] = image_view
         self.tab_dims[id_image] = list(self.dims_model.shape)
@@ -414,17 +528,19 @@ class HDF5Widget(QWidget):
             
             # 初始化图像模型
             if self.image_model is None:
-                self.image_model = ImageModel(self.hdf)
+                self.image_model = ImageModel(self.hdf, read_cache=self.read_cache)
             
             # 更新图像模型以显示新创建的图像
             self.image_model.update_node(target_name)
             
             # 创建图像视图
+            from .image_view import ImageView
             image_view = ImageView(self.image_model, self.dims_model)
             image_view.update_image()
+            self.load_image_frame(image_view)
             
             # 添加到选项卡
-            self.dims_model.update_node(target_name, now_on_PlotView=True)
+            self.dims_model.update_node(target_name)
             id_image = id(image_view)
             self.image_views[id_image] = image_view
             self.tab_dims[id_image] = list(self.dims_model.shape)
@@ -441,7 +557,7 @@ class HDF5Widget(QWidget):
     def add_plot(self):
         """添加选项卡以查看hdf5文件中数据集的绘图。"""
         c_index = self.tab_node[id(self.tabs.currentWidget())]
-        path = self.tree_model.itemFromIndex(c_index).data(Qt.UserRole)
+        path = self.tree_model.data(c_index, Qt.UserRole)
 
         # 使用默认设置创建绘图
         settings = {
@@ -479,8 +595,10 @@ class HDF5Widget(QWidget):
         """使用指定设置添加绘图选项卡。"""
         self.dims_model.update_node(path, now_on_PlotView=True)
         self.plot_model.update_node(path)
+        from .plot_view import PlotView
         pv = PlotView(self.plot_model, self.dims_model, settings)
         pv.update_plot()
+        self.load_view_data(self.plot_model, pv.update_plot)
         id_pv = id(pv)
         self.plot_views[id_pv] = pv
         self.tab_dims[id_pv] = list(self.dims_model.shape)
@@ -499,7 +617,7 @@ class HDF5Widget(QWidget):
             QMessageBox.warning(self, "警告", "请先选择要绘制的数据集！")
             return
 
-        path = self.tree_model.itemFromIndex(current_index).data(Qt.UserRole)
+        path = self.tree_model.data(current_index, Qt.UserRole)
 
         # 获取设置
         x_col_index = self.x_combo.currentIndex()
@@ -538,6 +656,8 @@ class HDF5Widget(QWidget):
     def handle_close_tab(self, index):
         """关闭选项卡。"""
         widget = self.tabs.widget(index)
+        # 读取完成时的回调可能属于要关闭的视图
+        self.cancel_loading()
         self.tabs.removeTab(index)
         self.tab_dims.pop(id(widget))
         self.tab_node.pop(id(widget))
@@ -684,7 +804,7 @@ class HDF5Widget(QWidget):
         
         # 获取当前活动的绘图视图
         current_widget = self.tabs.currentWidget()
-        if not isinstance(current_widget, PlotView):
+        if not _is_plot_view(current_widget):
             QMessageBox.warning(self, "导出失败", "请先切换到绘图选项卡")
             return
         
@@ -884,7 +1004,7 @@ class HDF5Widget(QWidget):
         # 更新对话框中的列信息
         current_index = self.tree_view.currentIndex()
         if current_index.isValid():
-            path = self.tree_model.itemFromIndex(current_index).data(Qt.UserRole)
+            path = self.tree_model.data(current_index, Qt.UserRole)
             dataset = self.hdf[path]
             
             if isinstance(dataset, h5py.Dataset):
@@ -1088,186 +1208,105 @@ class HDF5Widget(QWidget):
 
     def show_column_max_values(self):
         """显示每一列的最大值及其所在行号。"""
-        current_index = self.tree_view.currentIndex()
-        if not current_index.isValid():
-            QMessageBox.warning(self, "警告", "请先选择要查看的数据集！")
-            return
-        
-        path = self.tree_model.itemFromIndex(current_index).data(Qt.UserRole)
-        dataset = self.hdf[path]
-        
-        if not isinstance(dataset, h5py.Dataset):
-            QMessageBox.warning(self, "警告", "请选择数据集而非组！")
-            return
-        
-        try:
-            # 获取数据
-            data = dataset[:]
-            
-            # 获取列名
-            if hasattr(dataset, 'dtype') and dataset.dtype.names:
-                column_names = list(dataset.dtype.names)
-            else:
-                if dataset.ndim == 1:
-                    column_names = ["数据"]
-                else:
-                    column_names = [f"列{i+1}" for i in range(dataset.shape[1])]
-            
-            # 计算每一列的最大值和所在行号
-            max_values = []
-            if dataset.dtype.names:
-                # 复合数据类型
-                for col_name in column_names:
-                    if data.ndim == 0:
-                        max_val = data[col_name]
-                        max_row = 0
-                    else:
-                        max_val = data[col_name].max()
-                        max_row = data[col_name].argmax()
-                    max_values.append((col_name, max_val, max_row))
-            else:
-                # 简单数据类型
-                if dataset.ndim == 1:
-                    max_val = data.max()
-                    max_row = data.argmax()
-                    max_values.append((column_names[0], max_val, max_row))
-                else:
-                    for i, col_name in enumerate(column_names):
-                        max_val = data[:, i].max()
-                        max_row = data[:, i].argmax()
-                        max_values.append((col_name, max_val, max_row))
-            
-            # 显示结果
-            result_text = "每一列的最大值及其所在行号：\n"
-            for col_name, max_val, max_row in max_values:
-                result_text += f"{col_name}: {max_val:.6e} (行号: {max_row})\n"
-            
-            QMessageBox.information(self, "最大值", result_text)
-            
-        except Exception as e:
-            QMessageBox.warning(self, "错误", f"计算最大值时出错: {str(e)}")
-    
+        self.run_column_statistics(self._show_column_max_values)
+
     def show_column_min_values(self):
         """显示每一列的最小值及其所在行号。"""
+        self.run_column_statistics(self._show_column_min_values)
+
+    def run_column_statistics(self, callback):
+        """在后台单遍统计当前数据集的每一列。
+
+        如果统计缓存中已有结果，则直接调用callback(statistics)；
+        否则数据集按块流式读取，统计期间显示可取消的进度对话框，
+        完成后保存结果、刷新数据集描述符并调用callback(statistics)。
+        """
         current_index = self.tree_view.currentIndex()
         if not current_index.isValid():
             QMessageBox.warning(self, "警告", "请先选择要查看的数据集！")
             return
-        
-        path = self.tree_model.itemFromIndex(current_index).data(Qt.UserRole)
+
+        path = self.tree_model.data(current_index, Qt.UserRole)
         dataset = self.hdf[path]
-        
+
         if not isinstance(dataset, h5py.Dataset):
             QMessageBox.warning(self, "警告", "请选择数据集而非组！")
             return
-        
-        try:
-            # 获取数据
-            data = dataset[:]
-            
-            # 获取列名
-            if hasattr(dataset, 'dtype') and dataset.dtype.names:
-                column_names = list(dataset.dtype.names)
+
+        statistics = self.statistics_cache.get(dataset)
+        if statistics is not None:
+            callback(statistics)
+            return
+
+        task = StatisticsTask(dataset)
+        dialog = QProgressDialog("正在统计...", "取消", 0, 100, self)
+        dialog.setWindowTitle("统计")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.setValue(0)
+
+        def handle_finished(statistics):
+            dialog.close()
+            self.statistics_task = None
+            self.statistics_cache.put(dataset, statistics)
+            if self.dataset_model.node == dataset:
+                self.dataset_model.update_node(path)
+            callback(statistics)
+
+        def handle_failed(message):
+            dialog.close()
+            self.statistics_task = None
+            QMessageBox.warning(self, "错误", f"统计时出错: {message}")
+
+        def handle_canceled():
+            task.cancel()
+            self.statistics_task = None
+
+        task.signals.progress.connect(dialog.setValue)
+        task.signals.finished.connect(handle_finished)
+        task.signals.failed.connect(handle_failed)
+        dialog.canceled.connect(handle_canceled)
+
+        self.statistics_task = task
+        QThreadPool.globalInstance().start(task)
+
+    def _show_column_max_values(self, statistics):
+        """显示统计结果中每一列的最大值。"""
+        result_text = "每一列的最大值及其所在行号：\n"
+        for i, col_name in enumerate(statistics.names):
+            if statistics.count[i] == 0:
+                result_text += f"{col_name}: 无数值数据\n"
             else:
-                if dataset.ndim == 1:
-                    column_names = ["数据"]
-                else:
-                    column_names = [f"列{i+1}" for i in range(dataset.shape[1])]
-            
-            # 计算每一列的最小值和所在行号
-            min_values = []
-            if dataset.dtype.names:
-                # 复合数据类型
-                for col_name in column_names:
-                    if data.ndim == 0:
-                        min_val = data[col_name]
-                        min_row = 0
-                    else:
-                        min_val = data[col_name].min()
-                        min_row = data[col_name].argmin()
-                    min_values.append((col_name, min_val, min_row))
+                max_val = statistics.max[i]
+                max_row = statistics.argmax[i]
+                result_text += f"{col_name}: {max_val:.6e} (行号: {max_row})\n"
+
+        QMessageBox.information(self, "最大值", result_text)
+
+    def _show_column_min_values(self, statistics):
+        """显示统计结果中每一列的最小值。"""
+        result_text = "每一列的最小值及其所在行号：\n"
+        for i, col_name in enumerate(statistics.names):
+            if statistics.count[i] == 0:
+                result_text += f"{col_name}: 无数值数据\n"
             else:
-                # 简单数据类型
-                if dataset.ndim == 1:
-                    min_val = data.min()
-                    min_row = data.argmin()
-                    min_values.append((column_names[0], min_val, min_row))
-                else:
-                    for i, col_name in enumerate(column_names):
-                        min_val = data[:, i].min()
-                        min_row = data[:, i].argmin()
-                        min_values.append((col_name, min_val, min_row))
-            
-            # 显示结果
-            result_text = "每一列的最小值及其所在行号：\n"
-            for col_name, min_val, min_row in min_values:
+                min_val = statistics.min[i]
+                min_row = statistics.argmin[i]
                 result_text += f"{col_name}: {min_val:.6e} (行号: {min_row})\n"
-            
-            QMessageBox.information(self, "最小值", result_text)
-            
-        except Exception as e:
-            QMessageBox.warning(self, "错误", f"计算最小值时出错: {str(e)}")
-
-    def calculate_memory_ratio(self, path):
-        """计算内存比例。
-        为所选数据集找到一个关键维度，dim_crit，以字节为单位
-        然后计算并返回memory_ratio：关键维度的比例
-        以字节为单位到系统上的可用内存。
-        参数
-        ----------
-        path : STR
-            self.hdf中数据集的路径。
-        返回
-        -------
-        浮点数
-            所选数据集的关键维度（以字节为单位）的比例
-            到系统上的可用内存。
-        """
-        node = self.hdf[path]
-        if node.ndim in [0, 1, 2]:
-            dim_crit = node.nbytes
-        elif node.ndim > 2 and node.shape[-1] in [3, 4]:
-            size = node.shape[-3] * node.shape[-2] * node.shape[-1]
-            dim_crit = node[tuple([0] * node.ndim)].nbytes * size
-        else:
-            size = node.shape[-2] * node.shape[-1]
-            dim_crit = node[tuple([0] * node.ndim)].nbytes * size
-        memory_ratio = dim_crit / psutil.virtual_memory().free
-        return memory_ratio
-
-    def check_node_size(self, memory_ratio, path):
-        """检查memory_ratio > self.memory_ratio_limit。
-        如果memory_ratio > self.memory_ratio_limit，则
-        出现QMessageBox.warning，通知用户
-        加载节点将消耗可用内存的百分比。用户可以
-        选择继续加载节点，或取消并返回到
-        树中的先前选择。
-        参数
-        ----------
-        memory_ratio : 浮点数
-            所选数据集的关键维度（以字节为单位）的比例
-            到系统上的可用内存。
-        path : STR
-            self.hdf中数据集的路径。
-        返回
-        -------
-        布尔值
-            如果memory_ratio <= self.memory_ratio_limit，则返回True
-            如果memory_ratio > self.memory_ratio_limit，如果用户按下对话框上的"是"，选择继续
-            加载节点，则返回True。如果用户按下"否"
-            在对话框上，选择取消加载节点并返回到
-            树中的先前选择，则返回False。
-        """
-        if memory_ratio > self.memory_ratio_limit:
-            msg = f"加载 {path} 将消耗 {int(100*memory_ratio):d}%"
-            msg1 = " 的可用内存。"
-            msg2 = "\n继续加载吗？"
-            button = QMessageBox.warning(
-                self,
-                "内存警告",
-                "".join([msg, msg1, msg2]),
-                buttons=QMessageBox.Yes | QMessageBox.No,
-                defaultButton=QMessageBox.No,
-            )
-            return button == QMessageBox.Yes
-        return True
\ No newline at end of file
+
+        QMessageBox.information(self, "最小值", result_text)
+
+
+# 绘图和图像视图依赖pyqtgraph，在第一次添加这类选项卡时才导入
+def _is_plot_view(widget):
+    """如果widget是PlotView，则返回True。尚未导入plot_view时不导入它。"""
+    module = sys.modules.get(f"{__package__}.plot_view")
+    return module is not None and isinstance(widget, module.PlotView)
+
+
+def _is_image_view(widget):
+    """如果widget是ImageView，则返回True。尚未导入image_view时不导入它。"""
+    module = sys.modules.get(f"{__package__}.image_view")
+    return module is not None and isinstance(widget, module.ImageView)
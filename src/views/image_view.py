@@ -2,8 +2,11 @@
 包含图像视图类。
 """
 
-from PySide6.QtCore import QModelIndex, Qt
-from PySide6.QtWidgets import QAbstractItemView, QScrollBar, QVBoxLayout
+from PySide6.QtCore import QElapsedTimer, QModelIndex, QRectF, Qt, QTimer
+from PySide6.QtWidgets import (
+    QAbstractItemView, QCheckBox, QHBoxLayout, QLabel, QScrollBar, QSpinBox,
+    QStyle, QToolButton, QVBoxLayout, QWidget
+)
 import pyqtgraph as pg
 
 
@@ -13,7 +16,19 @@ class ImageView(QAbstractItemView):
     如果hdf5文件的节点具有ndim > 2，则显示的图像可以
     通过更改切片（DimsTableModel）进行更改。提供了滚动条
     也可以用于滚动第一个轴中的图像。
+
+    图像栈还可以按目标帧率播放。播放位置由经过的时间决定，
+    只显示已缓存的帧：帧来不及读取时被丢弃，而不会阻塞界面，
+    实际帧率显示在状态栏中。
+
+    大图像（ImageModel.tiled）先显示概览图，缩放或平移停止后，
+    按视图的缩放程度在概览图上叠加所需层的分块。
     """
+
+    # 状态栏中实际帧率的更新间隔（毫秒）
+    FPS_REPORT_INTERVAL = 1000
+    # 视图范围改变后更新分块前等待的时间（毫秒）
+    TILE_DELAY = 50
     def __init__(self, model, dims_model):
         super().__init__()
         self.setModel(model)
@@ -36,11 +51,55 @@ class ImageView(QAbstractItemView):
         self.viewbox.addItem(self.image_item)
         self.image_item.setOpts(axisOrder="row-major")
 
+        # 大图像中叠加在概览图上的分块图像项
+        self.tile_items = {}
+        self.tile_timer = QTimer(self)
+        self.tile_timer.setSingleShot(True)
+        self.tile_timer.setInterval(self.TILE_DELAY)
+
         # 创建用于移动图像帧的滚动条
         self.scrollbar = QScrollBar(Qt.Horizontal)
+
+        # 播放控制
+        self.play_button = QToolButton()
+        self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+        self.play_button.setToolTip("播放/暂停")
+        self.fps_spinbox = QSpinBox()
+        self.fps_spinbox.setRange(1, 120)
+        self.fps_spinbox.setValue(25)
+        self.fps_spinbox.setSuffix(" fps")
+        self.fps_spinbox.setToolTip("目标帧率")
+        self.stride_spinbox = QSpinBox()
+        self.stride_spinbox.setRange(1, 1000)
+        self.stride_spinbox.setValue(1)
+        self.stride_spinbox.setToolTip("每次前进的帧数")
+        self.loop_checkbox = QCheckBox("循环")
+        self.loop_checkbox.setChecked(True)
+
+        self.playback_bar = QWidget()
+        playback_layout = QHBoxLayout(self.playback_bar)
+        playback_layout.setContentsMargins(2, 2, 2, 2)
+        playback_layout.addWidget(self.play_button)
+        playback_layout.addWidget(QLabel("帧率:"))
+        playback_layout.addWidget(self.fps_spinbox)
+        playback_layout.addWidget(QLabel("步长:"))
+        playback_layout.addWidget(self.stride_spinbox)
+        playback_layout.addWidget(self.loop_checkbox)
+        playback_layout.addStretch()
+
+        self.play_timer = QTimer(self)
+        self.play_timer.setTimerType(Qt.PreciseTimer)
+        self.play_clock = QElapsedTimer()
+        self.play_start = 0
+        self.play_tick = 0
+        self.shown_frames = 0
+        self.dropped_frames = 0
+        self.report_clock = QElapsedTimer()
+
         layout = QVBoxLayout()
         layout.addWidget(graphics_layout_widget)
         layout.addWidget(self.scrollbar)
+        layout.addWidget(self.playback_bar)
         layout.setSpacing(0)
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
@@ -50,6 +109,16 @@ class ImageView(QAbstractItemView):
         """初始化鼠标和滚动条信号。"""
         self.image_item.scene().sigMouseMoved.connect(self.handle_mouse_moved)
         self.scrollbar.valueChanged.connect(self.handle_scroll)
+        # 拖动滚动条时暂停播放
+        self.scrollbar.sliderPressed.connect(self.stop_playback)
+        self.play_button.clicked.connect(self.toggle_playback)
+        self.fps_spinbox.valueChanged.connect(self.restart_playback)
+        self.stride_spinbox.valueChanged.connect(self.restart_playback)
+        self.play_timer.timeout.connect(self.handle_play_timer)
+        self.viewbox.sigRangeChanged.connect(self.handle_view_changed)
+        self.viewbox.sigResized.connect(self.handle_view_changed)
+        self.tile_timer.timeout.connect(self.update_tiles)
+        self.model().tile_ready.connect(self.update_tiles)
 
     def update_image(self):
         """更新显示的图像。"""
@@ -60,9 +129,22 @@ class ImageView(QAbstractItemView):
                 self.scrollbar.blockSignals(True)
                 self.scrollbar.setVisible(False)
                 self.scrollbar.blockSignals(False)
+            self.set_playback_available(False)
+            self.clear_tiles()
             return
 
-        self.image_item.setImage(self.model().image_view)
+        if self.model().display_levels is not None:
+            # 已按缓存的显示范围转换为8位，不需要再计算范围
+            self.image_item.setImage(
+                self.model().display_view, autoLevels=False, levels=(0, 255)
+            )
+        else:
+            self.image_item.setImage(self.model().image_view)
+        # 概览图按原图像素坐标显示
+        rows, columns = self.model().image_shape
+        self.image_item.setRect(QRectF(0, 0, columns, rows))
+        self.clear_tiles()
+        self.update_tiles()
         if not self.viewbox.isVisible():
             self.viewbox.setVisible(True)
         if not self.scrollbar.isVisible():
@@ -77,15 +159,18 @@ class ImageView(QAbstractItemView):
                     self.scrollbar.blockSignals(True)
                     self.scrollbar.setSliderPosition(self.model().dims[0])
                     self.scrollbar.blockSignals(False)
+                self.set_playback_available(self.model().can_play())
             except TypeError:
                 if self.scrollbar.isVisible():
                     self.scrollbar.blockSignals(True)
                     self.scrollbar.setVisible(False)
                     self.scrollbar.blockSignals(False)
+                self.set_playback_available(False)
         else:
             self.scrollbar.blockSignals(True)
             self.scrollbar.setVisible(False)
             self.scrollbar.blockSignals(False)
+            self.set_playback_available(False)
 
     def handle_scroll(self, value):
         """在滚动时更改图像帧。"""
@@ -94,20 +179,174 @@ class ImageView(QAbstractItemView):
         self.dims_model.endResetModel()
         self.dims_model.dataChanged.emit(QModelIndex(), QModelIndex(), [])
 
+    def handle_view_changed(self, *args):
+        """视图范围改变时延迟更新分块，避免在拖动过程中反复读取。"""
+        if self.model().tiled is not None:
+            self.tile_timer.start()
+
+    def update_tiles(self):
+        """显示视图中可见的分块，并请求读取尚未读取的分块。
+
+        选择分辨率不低于屏幕的最粗一层；概览图已足够时不显示分块。
+        """
+        model = self.model()
+        tiled = model.tiled
+        if tiled is None or model.image_view is None:
+            self.clear_tiles()
+            return
+        if not self.isVisible():
+            # 隐藏的选项卡不请求分块，模型为所有图像选项卡共用
+            return
+
+        rect = self.viewbox.viewRect()
+        scale = max(
+            rect.width() / max(self.viewbox.width(), 1),
+            rect.height() / max(self.viewbox.height(), 1),
+        )
+        level = tiled.level_for(scale)
+        tiles = []
+        if level < tiled.overview_level:
+            tiles = tiled.tiles_in_rect(
+                level, rect.top(), rect.left(), rect.bottom(), rect.right()
+            )
+        model.request_tiles(tiles)
+
+        # 分块使用与概览图相同的显示范围
+        levels = self.image_item.levels
+        for tile in list(self.tile_items):
+            if tile not in tiles:
+                self.viewbox.removeItem(self.tile_items.pop(tile))
+        for tile in tiles:
+            data = model.get_tile(tile)
+            if data is None or tile in self.tile_items:
+                continue
+            item = pg.ImageItem()
+            item.setOpts(axisOrder="row-major")
+            item.setImage(model.to_display(data), autoLevels=False, levels=levels)
+            y0, x0, y1, x1 = tiled.tile_rect(*tile)
+            item.setRect(QRectF(x0, y0, x1 - x0, y1 - y0))
+            item.setZValue(1)
+            self.viewbox.addItem(item)
+            self.tile_items[tile] = item
+
+    def clear_tiles(self):
+        """移除所有分块图像项。"""
+        for item in self.tile_items.values():
+            self.viewbox.removeItem(item)
+        self.tile_items.clear()
+
+    def set_playback_available(self, available):
+        """显示或隐藏播放控制，隐藏时停止播放。"""
+        if not available:
+            self.stop_playback()
+        self.playback_bar.setVisible(available)
+
+    def is_playing(self):
+        """如果正在播放，则返回True。"""
+        return self.play_timer.isActive()
+
+    def toggle_playback(self):
+        """开始或暂停播放。"""
+        if self.is_playing():
+            self.stop_playback()
+        else:
+            self.start_playback()
+
+    def start_playback(self):
+        """从当前帧开始按目标帧率播放。"""
+        if self.model().node is None or self.model().ndim <= 2:
+            return
+        last = self.model().node.shape[0] - 1
+        self.play_start = self.scrollbar.value()
+        if self.play_start >= last and not self.loop_checkbox.isChecked():
+            self.play_start = 0
+        self.play_tick = 0
+        self.shown_frames = 0
+        self.dropped_frames = 0
+        self.play_clock.start()
+        self.report_clock.start()
+        self.play_timer.start(max(1, round(1000 / self.fps_spinbox.value())))
+        self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+
+    def stop_playback(self):
+        """暂停播放。"""
+        if not self.is_playing():
+            return
+        self.play_timer.stop()
+        self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+        # 窗口关闭时视图可能已脱离主窗口
+        status = getattr(self.window(), "status", None)
+        if status is not None:
+            status.showMessage("")
+
+    def restart_playback(self):
+        """帧率或步长改变后从当前帧重新计时。"""
+        if self.is_playing():
+            self.start_playback()
+
+    def handle_play_timer(self):
+        """前进到按经过的时间应显示的帧。
+
+        目标帧已缓存时立即显示；否则丢弃这一帧，保持当前图像，
+        并从目标帧开始预读，而不等待读取完成。
+        """
+        model = self.model()
+        if not model.can_play():
+            # 帧缓存已被清空或不能容纳帧
+            self.set_playback_available(False)
+            return
+        tick = self.play_clock.elapsed() * self.fps_spinbox.value() // 1000
+        if tick <= self.play_tick:
+            return
+        # 计时器被延迟时跳过的帧也计为丢弃
+        self.dropped_frames += tick - self.play_tick - 1
+        self.play_tick = tick
+
+        count = model.node.shape[0]
+        frame = self.play_start + tick * self.stride_spinbox.value()
+        if frame >= count:
+            if self.loop_checkbox.isChecked():
+                frame %= count
+            else:
+                frame = count - 1
+                self.stop_playback()
+
+        if frame == self.scrollbar.value():
+            pass
+        elif model.has_frame(frame):
+            self.scrollbar.setValue(frame)
+            self.shown_frames += 1
+        else:
+            self.dropped_frames += 1
+            if not model.is_prefetching(frame):
+                model.prefetch_frames(frame)
+
+        if self.is_playing() and self.report_clock.elapsed() >= self.FPS_REPORT_INTERVAL:
+            fps = 1000 * self.shown_frames / self.report_clock.elapsed()
+            self.window().status.showMessage(
+                f"播放: 第{self.scrollbar.value()}帧, 实际帧率 {fps:.1f} fps"
+                f" (目标 {self.fps_spinbox.value()} fps, 丢弃 {self.dropped_frames}帧)"
+            )
+            self.shown_frames = 0
+            self.dropped_frames = 0
+            self.report_clock.restart()
+
+    def hideEvent(self, event):
+        """切换到其他选项卡时暂停播放。"""
+        self.stop_playback()
+        super().hideEvent(event)
+
     def handle_mouse_moved(self, pos):
         """当鼠标在图像场景中移动时，
         更新光标位置。
         """
         if self.viewbox.isVisible():
-            try:
-                max_y, max_x = self.image_item.image.shape
-            except ValueError:
-                max_y, max_x = self.image_item.image.shape[:2]
+            max_y, max_x = self.model().image_shape
             scene_pos = self.viewbox.mapSceneToView(pos)
             x = int(scene_pos.x())
             y = int(scene_pos.y())
             if 0 <= x < max_x and 0 <= y < max_y:
-                iv = self.model().image_view[y, x]
+                iv = self.model().value_at(y, x)
                 msg1 = f"X={x} Y={y}, 值="
                 try:
                     msg2 = f"{iv:.3e}"
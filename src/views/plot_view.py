@@ -3,21 +3,45 @@
 """
 
 import h5py
-from PySide6.QtCore import QModelIndex, Qt
+import numpy as np
+from PySide6.QtCore import QModelIndex, Qt, QTimer
 from PySide6.QtGui import QFont
 from PySide6.QtWidgets import QAbstractItemView, QScrollBar, QVBoxLayout
 import pyqtgraph as pg
 
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.decimation import is_monotonic, minmax_indices, visible_range
+
 
 class PlotView(QAbstractItemView):
     """
     显示关联PlotModel的绘图视图。
     可以显示y(x)图，其中x可以是索引或数据集中的任意列。
+
+    曲线只绘制按像素宽度降采样后的点（每个桶保留最小值和最大值），
+    缩放或平移时按新的视图范围重新降采样，
+    因此每次重绘的工作量取决于屏幕宽度而不是数据长度。
+    长序列的降采样使用PlotModel提供的最小/最大值金字塔。
+
+    同一PlotModel由多个选项卡共用：视图在绘制时记下数组（data）和
+    模型的view_key（data_key），之后按自己的数据查询金字塔，
+    模型也不会回收仍在绘制的数组。
     """
+
+    # 视图宽度未知（例如尚未显示）时使用的桶数
+    DEFAULT_BUCKETS = 1000
     def __init__(self, model, dims_model, settings=None):
         super().__init__()
         self.setModel(model)
         self.dims_model = dims_model
+        model.pyramid_ready.connect(self.handle_view_changed)
+        model.attach_view(self)
+        # 正在绘制的数组及其在模型中的(数据集路径, 选区, 桶长度)
+        self.data = None
+        self.data_key = None
         # 绘图设置
         self.settings = settings if settings else {
             'x_column': 0,  # 默认第一列作为X轴
@@ -35,6 +59,13 @@ class PlotView(QAbstractItemView):
 
         # 创建用于移动图像帧的滚动条
         self.scrollbar = QScrollBar(Qt.Horizontal)
+
+        # 视图范围连续改变时合并为一次降采样
+        self.decimation_timer = QTimer(self)
+        self.decimation_timer.setSingleShot(True)
+        self.decimation_timer.setInterval(20)
+        self.decimation_timer.timeout.connect(self.update_decimation)
+
         layout = QVBoxLayout()
         layout.addWidget(graphics_layout_widget)
         layout.addWidget(self.scrollbar)
@@ -48,14 +79,25 @@ class PlotView(QAbstractItemView):
         self.symbolBrush = (0, 0, 255)
         self.symbolPen = "k"
 
+        # 当前绘制的曲线，见set_series
+        self.series = []
+        self.max_points = self.settings['points']
+
     def init_signals(self):
         """初始化鼠标和滚动条信号。"""
         self.plot_item.scene().sigMouseMoved.connect(self.handle_mouse_moved)
         self.scrollbar.valueChanged.connect(self.handle_scroll)
+        view_box = self.plot_item.getViewBox()
+        view_box.sigXRangeChanged.connect(self.handle_view_changed)
+        view_box.sigResized.connect(self.handle_view_changed)
 
     def update_plot(self):
         """更新显示的绘图。"""
+        self.data = self.model().plot_view
+        self.data_key = self.model().view_key
+        self.model().recycle()
         if isinstance(self.model().plot_view, type(None)):
+            self.series = []
             self.plot_item.setVisible(False)
             self.scrollbar.blockSignals(True)
             self.scrollbar.setVisible(False)
@@ -120,54 +162,18 @@ class PlotView(QAbstractItemView):
         y_cols = self.settings['y_columns']
         max_points = self.settings['points']
 
+        # 收集要绘制的曲线：(x数据或None表示索引, y数据, 名称, 颜色)
+        series = []
         if c_n:
             # 复合数据类型的情况
             if len(c_n) == 1:
                 # 只有一列数据，绘制与索引的关系
-                x_data = list(range(len(self.model().plot_view[c_n[0]])))
-                y_data = self.model().plot_view[c_n[0]]
-
-                # 限制点数 - 只减少显示的点数，但保持线的连续性
-                if len(x_data) > max_points:
-                    step = len(x_data) // max_points
-                    # 绘制完整的线
-                    self.plot_item.plot(
-                        x_data,
-                        y_data,
-                        pen=colors[0],
-                        name=c_n[0],
-                    )
-                    # 只显示部分点，不添加图例
-                    x_plot = x_data[::step]
-                    y_plot = y_data[::step]
-                    # 绘制点
-                    self.plot_item.plot(
-                        x_plot,
-                        y_plot,
-                        pen=None,
-                        symbol='o',
-                        symbolSize=5,
-                        symbolBrush=colors[0],
-                        symbolPen='k',
-                    )
-                else:
-                    # 数据量不大，直接绘制点线图
-                    self.plot_item.plot(
-                        x_data,
-                        y_data,
-                        pen=colors[0],
-                        symbol='o',
-                        symbolSize=5,
-                        symbolBrush=colors[0],
-                        symbolPen='k',
-                        name=c_n[0],
-                    )
+                series.append((None, self.model().plot_view[c_n[0]], c_n[0], colors[0]))
             else:
                 # 多列数据，使用设置中的列
                 if x_col == -1:  # 索引选项（在HDF5Widget中设置x_col=-1表示索引）
                     # 使用索引作为X轴数据
-                    data_length = len(self.model().plot_view[c_n[0]])
-                    x_data = list(range(data_length))
+                    x_data = None
                 else:
                     # 注意：x_col是实际的列索引，不需要减1
                     x_data = self.model().plot_view[c_n[x_col]]
@@ -176,91 +182,18 @@ class PlotView(QAbstractItemView):
                 for i, y_col in enumerate(y_cols):
                     if y_col < len(c_n):
                         y_data = self.model().plot_view[c_n[y_col]]
-                        color_idx = i % len(colors)
-
-                        # 限制点数 - 只减少显示的点数，但保持线的连续性
-                        if len(x_data) > max_points:
-                            step = len(x_data) // max_points
-                            # 绘制完整的线
-                            self.plot_item.plot(
-                                x_data,
-                                y_data,
-                                pen=colors[color_idx],
-                                name=c_n[y_col],
-                            )
-                            # 只显示部分点，不添加图例
-                            x_plot = x_data[::step]
-                            y_plot = y_data[::step]
-                            # 绘制点
-                            self.plot_item.plot(
-                                x_plot,
-                                y_plot,
-                                pen=None,
-                                symbol='o',
-                                symbolSize=5,
-                                symbolBrush=colors[color_idx],
-                                symbolPen='k',
-                            )
-                        else:
-                            # 数据量不大，直接绘制点线图
-                            self.plot_item.plot(
-                                x_data,
-                                y_data,
-                                pen=colors[color_idx],
-                                symbol='o',
-                                symbolSize=5,
-                                symbolBrush=colors[color_idx],
-                                symbolPen='k',
-                                name=c_n[y_col],
-                            )
+                        series.append((x_data, y_data, c_n[y_col], colors[i % len(colors)]))
         else:
             # 简单数据类型的情况
             data = self.model().plot_view
             if data.ndim == 1:
                 # 一维数据，绘制与索引的关系
-                x_data = list(range(len(data)))
-                y_data = data
-
-                # 限制点数 - 只减少显示的点数，但保持线的连续性
-                if len(x_data) > max_points:
-                    step = len(x_data) // max_points
-                    # 绘制完整的线
-                    self.plot_item.plot(
-                        x_data,
-                        y_data,
-                        pen=colors[0],
-                        name="数据",
-                    )
-                    # 只显示部分点，不添加图例
-                    x_plot = x_data[::step]
-                    y_plot = y_data[::step]
-                    # 绘制点
-                    self.plot_item.plot(
-                        x_plot,
-                        y_plot,
-                        pen=None,
-                        symbol='o',
-                        symbolSize=5,
-                        symbolBrush=colors[0],
-                        symbolPen='k',
-                    )
-                else:
-                    # 数据量不大，直接绘制点线图
-                    self.plot_item.plot(
-                        x_data,
-                        y_data,
-                        pen=colors[0],
-                        symbol='o',
-                        symbolSize=5,
-                        symbolBrush=colors[0],
-                        symbolPen='k',
-                        name="数据",
-                    )
+                series.append((None, data, "数据", colors[0]))
             elif data.ndim == 2 and data.shape[1] >= 2:
                 # 二维数据，使用设置中的列
                 if x_col == -1:  # 索引选项（在HDF5Widget中设置x_col=-1表示索引）
                     # 使用索引作为X轴数据
-                    x_data = list(range(data.shape[0]))
+                    x_data = None
                 else:
                     x_data = data[:, x_col]
 
@@ -268,54 +201,20 @@ class PlotView(QAbstractItemView):
                 for i, y_col in enumerate(y_cols):
                     if y_col < data.shape[1]:
                         y_data = data[:, y_col]
-                        color_idx = i % len(colors)
-
-                        # 限制点数 - 只减少显示的点数，但保持线的连续性
-                        if len(x_data) > max_points:
-                            step = len(x_data) // max_points
-                            # 绘制完整的线
-                            self.plot_item.plot(
-                                x_data,
-                                y_data,
-                                pen=colors[color_idx],
-                                name=f"列{y_col+1}",
-                            )
-                            # 只显示部分点，不添加图例
-                            x_plot = x_data[::step]
-                            y_plot = y_data[::step]
-                            # 绘制点
-                            self.plot_item.plot(
-                                x_plot,
-                                y_plot,
-                                pen=None,
-                                symbol='o',
-                                symbolSize=5,
-                                symbolBrush=colors[color_idx],
-                                symbolPen='k',
-                            )
-                        else:
-                            # 数据量不大，直接绘制点线图
-                            self.plot_item.plot(
-                                x_data,
-                                y_data,
-                                pen=colors[color_idx],
-                                symbol='o',
-                                symbolSize=5,
-                                symbolBrush=colors[color_idx],
-                                symbolPen='k',
-                                name=f"列{y_col+1}",
-                            )
+                        series.append((x_data, y_data, f"列{y_col+1}", colors[i % len(colors)]))
             else:
                 # 其他情况，直接绘制数据
-                self.plot_item.plot(
-                    data,
-                    pen=colors[0],
-                    symbol='o',
-                    symbolSize=5,
-                    symbolBrush=colors[0],
-                    symbolPen='k',
-                    name="数据",
-                )
+                series.append((None, data.reshape(-1), "数据", colors[0]))
+
+        bucket = self.model().bucket
+        if bucket != 1:
+            # 数据是按桶缩减后读取的，x坐标换算回原数据的下标
+            series = [
+                (self.model().x_positions(len(y)) if x is None else x, y, name, color)
+                for x, y, name, color in series
+            ]
+
+        self.set_series(series, max_points)
 
         # 设置X轴和Y轴标签
         # 优先使用自定义标签
@@ -348,6 +247,10 @@ class PlotView(QAbstractItemView):
         custom_title = self.settings.get('custom_title', '')
         if custom_title:
             self.plot_item.setTitle(custom_title)
+        elif bucket != 1:
+            self.plot_item.setTitle(
+                f"{self.model().node.name.split('/')[-1]} (数据过大，每{bucket}个点显示最小值和最大值)"
+            )
         else:
             self.plot_item.setTitle(self.model().node.name.split("/")[-1])
         self.plot_item.titleLabel.item.setFont(QFont("Arial", 14, QFont.Bold))
@@ -367,6 +270,75 @@ class PlotView(QAbstractItemView):
             "left", y_label, **{"font-size": "14pt", "font": "Arial"}
         )
 
+    def set_series(self, series, max_points):
+        """添加要绘制的曲线。
+
+        参数
+        ----------
+        series : list
+            每项为 (x数据或None, y数据, 名称, 颜色)，x为None表示使用索引。
+        max_points : 整数
+            每条曲线最多显示的标记点数。
+        """
+        self.series = []
+        self.max_points = max_points
+        for x_data, y_data, name, color in series:
+            if x_data is not None:
+                x_data = np.asarray(x_data)
+            self.series.append({
+                "name": name,
+                "x": x_data,
+                "y": np.asarray(y_data),
+                "monotonic": x_data is None or is_monotonic(x_data),
+                "line": self.plot_item.plot(pen=color, name=name),
+                "markers": self.plot_item.plot(
+                    pen=None,
+                    symbol='o',
+                    symbolSize=5,
+                    symbolBrush=color,
+                    symbolPen='k',
+                ),
+            })
+        self.update_decimation()
+
+    def update_decimation(self):
+        """按当前视图范围和宽度重新降采样所有曲线。"""
+        if not self.series:
+            return
+
+        view_box = self.plot_item.getViewBox()
+        width = int(view_box.width())
+        buckets = width if width > 1 else self.DEFAULT_BUCKETS
+        x_min, x_max = view_box.viewRange()[0]
+        auto_x = view_box.autoRangeEnabled()[0]
+
+        for item in self.series:
+            x_data, y_data = item["x"], item["y"]
+            pyramid = self.model().get_pyramid(self.data_key, item["name"], y_data)
+            if auto_x or not item["monotonic"]:
+                # 自动范围下需要完整的数据范围，否则视图会随数据收缩
+                start, stop = 0, len(y_data)
+            else:
+                start, stop = visible_range(x_data, len(y_data), x_min, x_max)
+
+            # 线：每个像素一个桶；标记：总数不超过max_points
+            for key, count in (("line", buckets), ("markers", self.max_points // 2)):
+                if pyramid is not None:
+                    indices = pyramid.indices(y_data, start, stop, max(count, 1))
+                else:
+                    indices = minmax_indices(y_data, start, stop, max(count, 1))
+                x_plot = indices if x_data is None else x_data[indices]
+                item[key].setData(x_plot, y_data[indices])
+
+    def handle_view_changed(self, *args):
+        """视图范围或大小改变后重新降采样。
+
+        隐藏的选项卡不重新降采样：它的数据可能已被模型回收，
+        切换回来时会重新读取。
+        """
+        if self.isVisible():
+            self.decimation_timer.start()
+
     def handle_scroll(self, value):
         """在滚动时更改图像帧。"""
         self.dims_model.beginResetModel()
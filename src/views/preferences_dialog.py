@@ -0,0 +1,86 @@
+"""
+包含首选项对话框类。
+"""
+
+from PySide6.QtCore import QSettings
+from PySide6.QtWidgets import (
+    QComboBox, QDialog, QDialogButtonBox, QFormLayout, QGroupBox, QSpinBox,
+    QVBoxLayout
+)
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.file_access import DEFAULT_DRIVER, FILE_DRIVERS
+
+# 文件驱动在对话框中的名称
+DRIVER_NAMES = {
+    "sec2": "按需读取 (sec2)",
+    "core": "整个读入内存 (core)",
+}
+
+
+def load_file_access_settings():
+    """从设置文件读取 (文件驱动, 页缓冲字节数)。"""
+    settings = QSettings()
+    driver = settings.value("file_access/driver", DEFAULT_DRIVER)
+    if driver not in FILE_DRIVERS:
+        driver = DEFAULT_DRIVER
+    page_buffer_mb = settings.value("file_access/page_buffer_mb", 0, type=int)
+    return driver, page_buffer_mb * 1024 * 1024
+
+
+class PreferencesDialog(QDialog):
+    """首选项对话框，设置之后打开的文件使用的文件驱动和页缓冲。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("首选项")
+        self.setModal(True)
+
+        self.settings = QSettings()
+        self.init_ui()
+        self.load_settings()
+
+    def init_ui(self):
+        """初始化用户界面。"""
+        layout = QVBoxLayout()
+
+        access_group = QGroupBox("文件访问（对之后打开的文件生效）")
+        access_layout = QFormLayout()
+
+        self.driver_combo = QComboBox()
+        for driver in FILE_DRIVERS:
+            self.driver_combo.addItem(DRIVER_NAMES[driver], driver)
+        self.driver_combo.setToolTip("core驱动在打开时读入整个文件，超出内存预算的文件仍按需读取")
+        access_layout.addRow("文件驱动:", self.driver_combo)
+
+        self.page_buffer_spinbox = QSpinBox()
+        self.page_buffer_spinbox.setRange(0, 4096)
+        self.page_buffer_spinbox.setSuffix(" MB")
+        self.page_buffer_spinbox.setSpecialValueText("不使用")
+        self.page_buffer_spinbox.setToolTip("只对以分页存储策略创建的文件有效")
+        access_layout.addRow("页缓冲:", self.page_buffer_spinbox)
+
+        access_group.setLayout(access_layout)
+        layout.addWidget(access_group)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.setLayout(layout)
+
+    def load_settings(self):
+        """显示当前的设置。"""
+        driver, page_buffer_size = load_file_access_settings()
+        self.driver_combo.setCurrentIndex(self.driver_combo.findData(driver))
+        self.page_buffer_spinbox.setValue(page_buffer_size // (1024 * 1024))
+
+    def accept(self):
+        """保存设置并关闭对话框。"""
+        self.settings.setValue("file_access/driver", self.driver_combo.currentData())
+        self.settings.setValue("file_access/page_buffer_mb", self.page_buffer_spinbox.value())
+        super().accept()